@@ -0,0 +1,189 @@
+"""
+end-to-end 벤치마크: 가짜 CSV 생성 -> csv2recap.recap_csv_files -> csv2mysql.process_directory -> search.main
+Ollama는 benchmarks/fake_ollama.py, Milvus와 BGE-M3는 benchmarks/fake_vector_store.py로 대신하므로
+GPU, Ollama, Milvus 없이 MySQL만 있으면 실행할 수 있습니다. 단계별 시간과 처리량을 출력합니다.
+--catalog embedded는 가짜 Milvus 대신 vector_catalog.EmbeddedCatalog(CATALOG_BACKEND=embedded)를 사용합니다.
+
+    python3 benchmarks/e2e_bench.py --files 4 --rows 500000 --latency 0.05
+    python3 benchmarks/e2e_bench.py --out /tmp/bench_transport --archive      # 압축 파일을 LOAD DATA LOCAL로 로딩
+    python3 benchmarks/e2e_bench.py --skip-mysql --report bench.json          # 생성 + 요약/embedding만
+
+MySQL 접속은 search.py와 같은 MYSQL_HOST / MYSQL_USER / MYSQL_PASSWORD / MYSQL_PORT 환경 변수를 사용합니다.
+--archive 없이 디렉토리를 로딩하려면 --out이 MySQL secure_file_priv 디렉토리 안이어야 합니다 (LOAD DATA INFILE).
+프로그램들의 출력은 --log 파일에 저장합니다.
+"""
+import io
+import os
+import sys
+import ast
+import json
+import time
+import argparse
+import statistics
+from contextlib import contextmanager, redirect_stdout
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+import synth_csv
+import fake_ollama
+import fake_vector_store
+import metrics
+
+QUERIES = [
+    "2024년1월 지하철 강남 승차총승객수는?",
+    "2024년 1월 버스 노선별 승하차 인원",
+    "2024년2월 지하철 역별 하차총승객수",
+    "망포역 승차총승객수 합계",
+]
+
+
+class Report:
+    def __init__(self, log):
+        self.log = log
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name, **info):
+        """
+        name 단계의 시간을 재고 그동안의 stdout은 log 파일로 보냅니다.
+        info에 files / rows / mb를 넣으면 초당 처리량도 계산합니다.
+        """
+        print(f"▶ {name} ...", flush=True)
+        t0 = time.perf_counter()
+        try:
+            with redirect_stdout(self.log):
+                yield info
+        finally:
+            seconds = time.perf_counter() - t0
+            info["seconds"] = round(seconds, 3)
+            for key in ("files", "rows", "mb"):
+                if key in info:
+                    info[f"{key}_per_s"] = round(info[key] / seconds, 2)
+            self.stages[name] = info
+            self.log.flush()
+            print(f"  {name}: {info['seconds']:.2f}s  " + "  ".join(f"{k}={v}" for k, v in info.items() if k != "seconds"))
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def run_queries(search, queries, log):
+    """search.main을 질문마다 실행하고 전체 시간과 단계별 timings_ms의 중앙값을 반환합니다."""
+    walls, stages, errors = [], {}, 0
+    for query in queries:
+        buf = io.StringIO()
+        t0 = time.perf_counter()
+        try:
+            with redirect_stdout(buf):
+                search.main([query])
+        except Exception as e:
+            errors += 1
+            buf.write(f"ERROR: {e}\n")
+        walls.append((time.perf_counter() - t0) * 1000)
+        log.write(buf.getvalue())
+        for line in buf.getvalue().splitlines():
+            if line.startswith("[timings ms]"):
+                for name, ms in ast.literal_eval(line[len("[timings ms]"):].strip()).items():
+                    stages.setdefault(name, []).append(ms)
+    return {
+        "queries": len(queries),
+        "errors": errors,
+        "p50_ms": round(percentile(walls, 0.5), 1),
+        "p95_ms": round(percentile(walls, 0.95), 1),
+        "qps": round(len(queries) / (sum(walls) / 1000), 2),
+        "stage_p50_ms": {name: round(statistics.median(v), 1) for name, v in stages.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=os.getenv("BENCH_DIR", "/var/lib/mysql-files/bench_transport"),
+                        help="CSV를 만들 디렉토리 (이름이 database/collection 이름)")
+    parser.add_argument("--files", type=int, default=2)
+    parser.add_argument("--rows", type=int, default=100_000, help="파일당 행 수")
+    parser.add_argument("--cols", type=int, default=6, help="파일당 column 수")
+    parser.add_argument("--archive", action="store_true", help="<out>.tar.gz를 만들어 압축 파일 그대로 로딩")
+    parser.add_argument("--latency", type=float, default=0.05, help="가짜 Ollama 응답 지연(초)")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--catalog", choices=["milvus", "embedded"], default="milvus",
+                        help="milvus: in-process 가짜 pymilvus, embedded: vector_catalog.EmbeddedCatalog")
+    parser.add_argument("--queries", type=int, default=8, help="search.main 실행 횟수 (QUERIES를 반복)")
+    parser.add_argument("--skip-mysql", action="store_true", help="process_directory와 search는 실행하지 않음")
+    parser.add_argument("--report", help="결과를 JSON으로 저장")
+    parser.add_argument("--log", default=os.path.join(os.getenv("TMPDIR", "/tmp"), "e2e_bench.log"))
+    args = parser.parse_args()
+
+    log = open(args.log, "w", encoding="utf-8")
+    report = Report(log)
+
+    with report.stage("generate") as info:
+        created = synth_csv.generate(args.out, args.files, args.rows, args.cols)
+        total_bytes = sum(size for _, _, size in created)
+        info.update(files=len(created), rows=args.rows * len(created), mb=round(total_bytes / 1e6, 1))
+    source = synth_csv.make_archive(args.out) if args.archive else args.out
+    dataset = os.path.basename(os.path.normpath(args.out))
+
+    llm = fake_ollama.FakeOllama(latency=args.latency, jitter=args.jitter).start()
+    # 환경 변수는 module을 import할 때 읽으므로 import 전에 설정
+    os.environ["OLLAMA_HOST"] = llm.url
+    os.environ["OLLAMA_URL"] = llm.url
+    os.environ["MILVUS_COLLECTION"] = dataset
+    os.environ["MYSQL_DB"] = dataset
+    os.environ.setdefault("TYPE_CACHE", "0")       # 매번 타입 추론 시간을 측정
+    if args.catalog == "embedded":
+        os.environ["CATALOG_BACKEND"] = "embedded"
+        os.environ.setdefault("CATALOG_DIR", os.path.join(os.getenv("TMPDIR", "/tmp"), "e2e_bench_catalog"))
+    model = fake_vector_store.install(milvus=args.catalog == "milvus")
+
+    import csv2recap
+    import csv2mysql
+    import search
+    import vector_catalog
+    import llm_client
+
+    try:
+        with report.stage("recap") as info:
+            csv2recap.recap_csv_files(source, incremental=False)
+            info.update(files=len(created), vectors=vector_catalog.open_catalog(dataset).count())
+
+        if not args.skip_mysql:
+            config = search.load_config()
+            csv2mysql.MYSQL_CONFIG.update(host=config["mysql_host"], user=config["mysql_user"],
+                                          password=config["mysql_password"], port=config["mysql_port"])
+            with report.stage("ingest") as info:
+                results = csv2mysql.process_directory(source, incremental=False)
+                info.update(rows=args.rows * len(created), mb=round(total_bytes / 1e6, 1))
+                if results:
+                    info["failed"] = sum(1 for r in results.values() if not r["ok"])
+
+            queries = [QUERIES[i % len(QUERIES)] for i in range(args.queries)]
+            with report.stage("search") as info:
+                info.update(run_queries(search, queries, log))
+    finally:
+        llm.stop()
+        log.close()
+
+    summary = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("report", "log")},
+        "stages": report.stages,
+        "ollama": llm.stats(),
+        "llm_client": llm_client.stats(),
+        "embedding": {"encode_calls": model.calls, "texts": model.texts},
+    }
+    if metrics.enabled:
+        # METRICS=1: LLM/embedding/Milvus/LOAD DATA/SQL 단계별 span과 counter
+        summary["metrics"] = metrics.summary()
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    print(f"log: {args.log}")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
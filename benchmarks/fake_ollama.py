@@ -0,0 +1,200 @@
+"""
+Ollama HTTP API 흉내 server (벤치마크용). GPU 없이 csv2mysql / csv2recap / search.py를 끝까지 실행할 수 있도록
+프롬프트 종류를 보고 정해진 형식의 답을 돌려줍니다.
+
+    python3 benchmarks/fake_ollama.py --port 11435 --latency 0.2
+    OLLAMA_HOST=http://127.0.0.1:11435 OLLAMA_URL=http://127.0.0.1:11435 python3 main.py
+
+  POST /api/generate  타입 추론 (column 하나 / JSON batch), 파일 요약
+  POST /api/chat      search.py의 table 추가 여부 판단, SQL 생성
+응답 전에 latency초 (+ 0~jitter초) 기다리고, 요청 수와 기다린 시간을 stats()로 알려 줍니다.
+"stream"이 true(Ollama 기본값)이면 답을 몇 글자씩 NDJSON chunk로 나눠 보냅니다 (llm_client의 stream 처리용).
+"""
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+INT_PATTERN = re.compile(r"^-?\d{1,9}$")
+DATE_PATTERN = re.compile(r"^(19|20)\d{2}(0[1-9]|1[0-2])(0[1-9]|[12]\d|3[01])$")
+MONTH_PATTERN = re.compile(r"^(19|20)\d{2}(0[1-9]|1[0-2])$")
+
+
+def guess_type(column, values):
+    """LLM 대신 값 모양으로 정한 타입 (TYPE_RULES 형식: DATE(%Y%m%d), INT, VARCHAR(n))"""
+    values = [str(v).strip() for v in values if str(v).strip() not in ("", "nan")]
+    if values and all(DATE_PATTERN.match(v) for v in values):
+        return "DATE(%Y%m%d)"
+    if values and all(MONTH_PATTERN.match(v) for v in values) and re.search(r"(년월|연월)", column):
+        return "DATE(%Y%m)"
+    if values and all(INT_PATTERN.match(v) for v in values):
+        return "INT"
+    return f"VARCHAR({max([len(v) for v in values] + [1]) * 2})"
+
+
+def answer_generate(body):
+    prompt = body.get("prompt", "")
+    if body.get("format") == "json":
+        # ask_column_types_batch: 첫 줄이 {column: [값들]} JSON
+        samples = json.JSONDecoder().raw_decode(prompt)[0]
+        return json.dumps({col: guess_type(col, values) for col, values in samples.items()}, ensure_ascii=False)
+    if "Mysql로 변환할 때" in prompt:
+        # ask_column_type: "<값들>. \n  문자열들은 csv file의 한 열이다. <column>는 ..."
+        m = re.search(r"한 열이다\. (.+?)는 이들", prompt)
+        values = prompt.split(". \n", 1)[0].split()
+        return guess_type(m.group(1) if m else "", values)
+    # csv2recap 요약
+    m = re.search(r"\n\n (.+?) (?:이름으로된 csv|table)", prompt)
+    name = m.group(1) if m else "csv"
+    header = prompt.split("\n", 1)[0].split()
+    return f"{name}: 서울 교통 승하차 인원 데이터. 열: {', '.join(header)}"
+
+
+def _table_schemas(content):
+    start = content.find("TABLE_SCHEMAS")
+    if start < 0:
+        return {}
+    start = content.index("{", start)
+    return json.JSONDecoder().raw_decode(content[start:])[0]
+
+
+def answer_chat(body):
+    system = body["messages"][0]["content"]
+    user = body["messages"][-1]["content"]
+    if '"tables"' in system:
+        # 한 번에 선택: 후보 중 score가 가장 높은 table
+        candidates = json.loads(user.split("CANDIDATE_TABLES", 1)[1].split(":\n", 1)[1])
+        tables = [candidates[0]["filename"]] if candidates else []
+        return json.dumps({"tables": tables, "need_more": False, "reason": "fake", "milvus_queries": []},
+                          ensure_ascii=False)
+    if "need_more" in system:
+        return json.dumps({"need_more": False, "reason": "fake", "milvus_query": ""})
+    # SQL 생성: 첫 table의 첫 문자열 column별 첫 숫자 column 합계
+    schemas = _table_schemas(user)
+    table, columns = next(iter(schemas.items()))
+    fields = [(c.get("Field"), (c.get("Type") or "").lower()) for c in columns]
+    numeric = [f for f, t in fields if t.startswith(("int", "bigint", "decimal", "double", "float"))]
+    text = [f for f, t in fields if t.startswith(("varchar", "char", "text"))]
+    if numeric and text:
+        sql = (f"SELECT `{text[0]}`, SUM(`{numeric[0]}`) AS total FROM `{table}` "
+               f"GROUP BY `{text[0]}` ORDER BY total DESC LIMIT 200")
+    else:
+        sql = f"SELECT COUNT(*) AS n FROM `{table}`"
+    return json.dumps({"sql": sql, "notes": "fake"}, ensure_ascii=False)
+
+
+class FakeOllama:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.counts = {}
+        self.waited = 0.0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = None
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", "0"))) or b"{}")
+                if self.path == "/api/generate":
+                    kind = "generate_json" if body.get("format") == "json" else "generate"
+                    text = answer_generate(body)
+                    reply = {"model": body.get("model"), "response": text, "done": True}
+                elif self.path == "/api/chat":
+                    kind = "chat"
+                    text = answer_chat(body)
+                    reply = {"model": body.get("model"), "message": {"role": "assistant", "content": text}, "done": True}
+                else:
+                    self.send_error(404)
+                    return
+                delay = fake.latency + random.random() * fake.jitter
+                time.sleep(delay)
+                reply.update(prompt_eval_count=len(json.dumps(body)) // 4, eval_count=len(text) // 2)
+                with fake._lock:
+                    fake.counts[kind] = fake.counts.get(kind, 0) + 1
+                    fake.waited += delay
+
+                if body.get("stream", True):
+                    self._send_stream(reply, text)
+                    return
+                data = json.dumps(reply, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, reply, text, size=4):
+                """text를 size 글자씩 chunk로, 마지막 chunk에 done과 token 수 (chunked transfer encoding)"""
+                field = "message" if "message" in reply else "response"
+                lines = []
+                for i in range(0, len(text), size):
+                    piece = text[i:i + size]
+                    chunk = {"model": reply["model"], "done": False}
+                    chunk[field] = {"role": "assistant", "content": piece} if field == "message" else piece
+                    lines.append(chunk)
+                last = dict(reply, done_reason="stop")
+                last[field] = {"role": "assistant", "content": ""} if field == "message" else ""
+                lines.append(last)
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for chunk in lines:
+                        data = json.dumps(chunk, ensure_ascii=False).encode("utf-8") + b"\n"
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # client가 JSON을 다 받고 먼저 연결을 닫음
+                    self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self):
+        with self._lock:
+            return {"requests": dict(self.counts), "latency_s": round(self.waited, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.0, help="응답마다 기다리는 시간(초)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="latency에 더하는 0~jitter초 random 시간")
+    args = parser.parse_args()
+    fake = FakeOllama(args.host, args.port, args.latency, args.jitter)
+    print(f"fake ollama on {fake.url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(fake.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Milvus와 BGE-M3 대신 쓰는 in-process vector store와 hashing embedding (벤치마크용)
+
+    import fake_vector_store
+    fake_vector_store.install()   # csv2recap / search를 import하기 전에 호출
+    import csv2recap, search
+
+install()은 이 module을 sys.modules["pymilvus"]로 등록하고 embedding 모델 자리에 FakeBGEM3를 넣습니다.
+csv2recap이 쓰는 ORM API(connections, Collection, utility ...)와 search.py가 쓰는 MilvusClient.hybrid_search만 구현합니다.
+검색은 모든 행과 거리를 계산하는 brute force이고, score는 Milvus WeightedRanker처럼
+dense L2 거리와 sparse IP를 arctan으로 0~1로 바꿔 가중합합니다.
+"""
+import re
+import sys
+import json
+import zlib
+import threading
+
+import numpy as np
+
+DENSE_DIM = 1024
+SPARSE_VOCAB = 250002   # BGE-M3 tokenizer 크기
+
+_collections = {}
+_lock = threading.RLock()
+
+
+# --- embedding ---
+def _tokens(text):
+    return re.findall(r"[0-9A-Za-z]+|[가-힣]", text)
+
+
+class FakeBGEM3:
+    """BGEM3FlagModel.encode()와 같은 형식: 글자/단어 hash로 만든 dense 벡터와 {token id: weight} sparse"""
+
+    def __init__(self, dim=DENSE_DIM):
+        self.dim = dim
+        self.calls = 0
+        self.texts = 0
+
+    def encode(self, texts, return_dense=True, return_sparse=True, **kwargs):
+        self.calls += 1
+        self.texts += len(texts)
+        dense = np.zeros((len(texts), self.dim), dtype=np.float32)
+        sparse = []
+        for i, text in enumerate(texts):
+            weights = {}
+            tokens = _tokens(text)
+            for a, b in zip(tokens, tokens[1:] + [""]):
+                dense[i, zlib.crc32((a + b).encode("utf-8")) % self.dim] += 1.0
+                key = str(zlib.crc32(a.encode("utf-8")) % SPARSE_VOCAB)
+                weights[key] = min(weights.get(key, 0.0) + 0.1, 0.5)
+            norm = np.linalg.norm(dense[i])
+            if norm:
+                dense[i] /= norm
+            sparse.append(weights)
+        return {"dense_vecs": dense, "lexical_weights": sparse}
+
+
+# --- pymilvus ORM (csv2recap) ---
+class MilvusException(Exception):
+    pass
+
+
+class DataType:
+    INT64 = "INT64"
+    VARCHAR = "VARCHAR"
+    FLOAT_VECTOR = "FLOAT_VECTOR"
+    SPARSE_FLOAT_VECTOR = "SPARSE_FLOAT_VECTOR"
+
+
+class FieldSchema:
+    def __init__(self, name, dtype, is_primary=False, auto_id=False, **kwargs):
+        self.name = name
+        self.dtype = dtype
+        self.is_primary = is_primary
+        self.auto_id = auto_id
+
+
+class CollectionSchema:
+    def __init__(self, fields, description=""):
+        self.fields = fields
+        self.description = description
+
+
+class connections:
+    @staticmethod
+    def connect(alias="default", **kwargs):
+        pass
+
+
+class utility:
+    @staticmethod
+    def has_collection(name):
+        return name in _collections
+
+    @staticmethod
+    def drop_collection(name):
+        _collections.pop(name, None)
+
+    @staticmethod
+    def load_state(name):
+        return _LoadState("Loaded" if _collections[name].loaded else "NotLoad")
+
+
+class _LoadState:
+    def __init__(self, name):
+        self.name = name
+
+
+class _Index:
+    def __init__(self, field_name, params):
+        self.field_name = field_name
+        self.index_name = field_name
+        self.params = params
+
+
+class _Store:
+    def __init__(self, schema):
+        self.columns = [f.name for f in schema.fields if not (f.is_primary and f.auto_id)]
+        self.rows = []   # {field: value}
+        self.next_id = 1
+        self.indexes = {}   # field -> index params
+        self.loaded = False
+
+
+class Collection:
+    def __init__(self, name, schema=None):
+        with _lock:
+            if name not in _collections:
+                if schema is None:
+                    raise ValueError(f"collection not found: {name}")
+                _collections[name] = _Store(schema)
+        self.name = name
+        self.store = _collections[name]
+
+    @property
+    def num_entities(self):
+        return len(self.store.rows)
+
+    def insert(self, entities):
+        with _lock:
+            for values in zip(*entities):
+                row = dict(zip(self.store.columns, values), id=self.store.next_id)
+                self.store.next_id += 1
+                self.store.rows.append(row)
+
+    def delete(self, expr):
+        # csv2recap이 쓰는 형식만: filename in ["a", "b"]
+        m = re.match(r"\s*filename\s+in\s+(\[.*\])\s*$", expr, re.S)
+        if not m:
+            raise ValueError(f"unsupported expr: {expr}")
+        names = set(json.loads(m.group(1)))
+        if not self.store.loaded:
+            # Milvus와 같이 load되지 않은 collection의 filter 식 delete는 거절
+            raise MilvusException(f"collection not loaded: {self.name}")
+        with _lock:
+            self.store.rows = [r for r in self.store.rows if r["filename"] not in names]
+
+    def flush(self):
+        pass
+
+    @property
+    def indexes(self):
+        return [_Index(field, params) for field, params in self.store.indexes.items()]
+
+    def create_index(self, field_name, index_params=None, **kwargs):
+        self.store.indexes[field_name] = index_params
+
+    def drop_index(self, index_name=None, **kwargs):
+        self.store.indexes.pop(index_name, None)
+
+    def load(self):
+        if "dense_vector" not in self.store.indexes:
+            raise MilvusException(f"index not found: {self.name}")
+        self.store.loaded = True
+
+    def release(self):
+        self.store.loaded = False
+
+
+# --- MilvusClient (search.py) ---
+class AnnSearchRequest:
+    def __init__(self, data, anns_field, param, limit, **kwargs):
+        self.data = data
+        self.anns_field = anns_field
+        self.param = param
+        self.limit = limit
+
+
+class WeightedRanker:
+    def __init__(self, *weights):
+        self.weights = weights
+
+
+def _scores(req, rows):
+    query = req.data[0]
+    if req.anns_field == "dense_vector":
+        matrix = np.stack([np.asarray(r["dense_vector"], dtype=np.float32) for r in rows])
+        dist = np.linalg.norm(matrix - np.asarray(query, dtype=np.float32), axis=1) ** 2
+        return 1.0 - 2.0 * np.arctan(dist) / np.pi
+    ip = np.array([sum(w * r["sparse_vector"].get(k, 0.0) for k, w in query.items()) for r in rows])
+    return 2.0 * np.arctan(ip) / np.pi
+
+
+class MilvusClient:
+    def __init__(self, uri=None, **kwargs):
+        self.uri = uri
+
+    def hybrid_search(self, collection_name, reqs, ranker, limit=10, output_fields=None, **kwargs):
+        with _lock:
+            rows = list(_collections[collection_name].rows)
+        if not rows:
+            return [[]]
+        total = np.zeros(len(rows))
+        for req, weight in zip(reqs, ranker.weights):
+            scores = _scores(req, rows)
+            # 요청마다 limit개 후보만 rerank에 참여 (Milvus와 같음)
+            top = np.argsort(-scores)[:req.limit]
+            mask = np.zeros(len(rows), dtype=bool)
+            mask[top] = True
+            total += np.where(mask, scores * weight, 0.0)
+        order = [i for i in np.argsort(-total) if total[i] > 0][:limit]
+        fields = output_fields or []
+        return [[
+            {"id": rows[i]["id"], "distance": float(total[i]), "score": float(total[i]),
+             "entity": {f: rows[i].get(f) for f in fields}}
+            for i in order
+        ]]
+
+    def list_indexes(self, collection_name, field_name=None):
+        return [f for f in _collections[collection_name].indexes if field_name in (None, f)]
+
+    def describe_index(self, collection_name, index_name):
+        params = _collections[collection_name].indexes[index_name]
+        # MilvusClient처럼 params를 펼친 dict
+        return dict(params.get("params", {}), index_type=params["index_type"], metric_type=params["metric_type"],
+                    field_name=index_name, index_name=index_name)
+
+    def close(self):
+        pass
+
+
+def install(model=None, milvus=True):
+    """
+    pymilvus import를 이 module로 바꾸고 embedding 모델을 FakeBGEM3로 바꿉니다. 반환: 사용하는 모델
+    milvus=False이면 embedding 모델만 바꿉니다 (CATALOG_BACKEND=embedded).
+    """
+    if milvus:
+        sys.modules["pymilvus"] = sys.modules[__name__]
+    import embedding
+    embedding._model = model or FakeBGEM3()
+    return embedding._model
+
+
+def stats():
+    with _lock:
+        return {name: len(store.rows) for name, store in _collections.items()}
@@ -0,0 +1,104 @@
+"""
+read_csv_smart() 벤치마크: 이전 방식(줄 수 세기 + skiprows callable)과 한 번에 읽는 reservoir sampling 방식 비교
+
+    python3 benchmarks/read_csv_smart_bench.py --rows 5000000
+"""
+import os
+import sys
+import csv
+import time
+import random
+import argparse
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import csv2recap
+
+
+def read_csv_smart_legacy(file_path, encoding='utf-8'):
+    """이전 구현: 파일을 한 번 읽어 줄 수를 세고, skiprows callable로 다시 읽음"""
+    with open(file_path, 'r', encoding=encoding) as f:
+        reader = csv.reader(f)
+        try:
+            header = next(reader)
+            col_count = len(header)
+        except StopIteration:
+            return pd.DataFrame()
+        row_count = sum(1 for row in f)
+
+    if col_count <= 10:
+        limit_threshold = 100
+    elif 10 < col_count <= 30:
+        limit_threshold = 30
+    else:
+        limit_threshold = 10
+
+    if row_count <= limit_threshold:
+        return pd.read_csv(file_path, encoding=encoding)
+
+    target_sample_size = max(int(row_count * 0.01), 1)
+    final_count = min(target_sample_size, limit_threshold)
+    indices_to_keep = set(random.sample(range(1, row_count + 1), final_count))
+
+    def skip_logic(x):
+        if x == 0:
+            return False
+        return x not in indices_to_keep
+
+    return pd.read_csv(file_path, skiprows=skip_logic, encoding=encoding)
+
+
+def make_csv(path, rows, seed=0):
+    """교통카드 승하차 형태의 합성 CSV"""
+    rng = random.Random(seed)
+    stations = ["망포", "수원", "강남", "서울역", "홍대입구", "잠실", "신도림", "사당"]
+    lines = ["사용일자,노선명,역명,승차총승객수,하차총승객수,등록일자\n"]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(lines[0])
+        buf = []
+        for i in range(rows):
+            day = 20240601 + i % 30
+            buf.append(f"{day},{rng.randint(1, 9)}호선,{rng.choice(stations)},{rng.randint(0, 99999)},{rng.randint(0, 99999)},{day + 3}\n")
+            if len(buf) >= 100000:
+                f.writelines(buf)
+                buf = []
+        f.writelines(buf)
+
+
+def timed(fn, *args, repeat=3, **kwargs):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        df = fn(*args, **kwargs)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--file", help="합성 파일 대신 사용할 CSV 파일")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.file
+        if path is None:
+            path = os.path.join(tmp, "bench.csv")
+            make_csv(path, args.rows)
+        size_mb = os.path.getsize(path) / 1e6
+
+        legacy, n_legacy = timed(read_csv_smart_legacy, path, repeat=args.repeat)
+        new, n_new = timed(csv2recap.read_csv_smart, path, seed=0, repeat=args.repeat)
+
+    print(f"file: {size_mb:.1f} MB")
+    print(f"legacy (count + skiprows callable): {legacy:.3f}s, {n_legacy} rows")
+    print(f"reservoir (mmap single pass)     : {new:.3f}s, {n_new} rows")
+    print(f"speedup: {legacy / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+search.py / csv2recap 시작 시간 벤치마크: 각 명령을 새 Python 프로세스로 실행해 걸린 시간을 잽니다.
+
+    python3 benchmarks/startup_bench.py --repeat 5
+    python3 benchmarks/startup_bench.py --with-model    # BGE-M3 로딩 시간도 측정
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMANDS = {
+    "import search": [sys.executable, "-c", "import search"],
+    "import csv2recap": [sys.executable, "-c", "import csv2recap"],
+    "search.py --help": [sys.executable, "search.py", "--help"],
+    "search.py --dry-run": [sys.executable, "search.py", "--dry-run"],
+}
+MODEL_COMMANDS = {
+    "embedding.get_model()": [sys.executable, "-c", "import embedding; embedding.get_model()"],
+}
+
+
+def measure(cmd, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    return times[0], times[len(times) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--with-model", action="store_true")
+    args = parser.parse_args()
+
+    commands = dict(COMMANDS)
+    if args.with_model:
+        commands.update(MODEL_COMMANDS)
+
+    for name, cmd in commands.items():
+        best, median = measure(cmd, args.repeat if name not in MODEL_COMMANDS else 1)
+        print(f"{name:<24} best {best:.3f}s  median {median:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
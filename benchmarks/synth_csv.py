@@ -0,0 +1,128 @@
+"""
+서울 교통 데이터와 비슷한 가짜 CSV 생성기 (벤치마크용)
+
+    python3 benchmarks/synth_csv.py /var/lib/mysql-files/bench_transport --files 4 --rows 1000000
+    python3 benchmarks/synth_csv.py /tmp/bench_transport --cols 30 --archive   # bench_transport.tar.gz도 생성
+
+파일은 두 종류를 번갈아 만듭니다.
+  CARD_SUBWAY_MONTH_<연월>.csv : 사용일자, 노선명, 역명, 승차총승객수, 하차총승객수, 등록일자 (+ 추가 column)
+  <연도>년_버스노선별_정류장별_시간대별_승하차_인원_정보(<월>월).csv : 사용년월, 노선번호, 노선명, 표준버스정류장ID,
+      버스정류장ARS번호, 역명, 00시승차총승객수, 00시하차총승객수, ... (--cols 개수만큼)
+"""
+import os
+import time
+import tarfile
+import argparse
+
+import numpy as np
+import pandas as pd
+
+SUBWAY_LINES = ["1호선", "2호선", "3호선", "4호선", "5호선", "6호선", "7호선", "8호선", "9호선", "분당선", "신분당선",
+                "경의선", "공항철도 1호선", "수인선"]
+STATIONS = ["서울역", "시청", "종각", "강남", "역삼", "선릉", "삼성", "잠실", "홍대입구", "신촌", "망포", "영통", "수원",
+            "사당", "교대", "고속터미널", "왕십리", "건대입구", "성수", "여의도", "노량진", "영등포", "구로", "신도림"]
+BUS_ROUTES = ["101", "146", "262", "341", "470", "601", "740", "N61", "9701", "7016", "마포08", "강남01"]
+CHUNK_ROWS = 200_000
+
+
+def _station_names(rng, n):
+    base = rng.choice(len(STATIONS), n)
+    suffix = rng.integers(0, 40, n)
+    names = np.array(STATIONS, dtype=object)[base]
+    # 같은 이름만 반복되지 않도록 일부는 번호를 붙임 (역명 cardinality를 현실적으로)
+    return np.where(suffix < 30, names, names + suffix.astype(str))
+
+
+def subway_chunk(rng, n, month, extra_cols):
+    days = rng.integers(1, 29, n)
+    data = {
+        "사용일자": month * 100 + days,
+        "노선명": np.array(SUBWAY_LINES, dtype=object)[rng.integers(0, len(SUBWAY_LINES), n)],
+        "역명": _station_names(rng, n),
+        "승차총승객수": rng.poisson(3000, n),
+        "하차총승객수": rng.poisson(2900, n),
+        "등록일자": month * 100 + np.minimum(days + 3, 28),
+    }
+    for i in range(extra_cols):
+        data[f"비고{i + 1}"] = rng.integers(0, 1000, n)
+    return pd.DataFrame(data)
+
+
+def bus_chunk(rng, n, month, total_cols):
+    data = {
+        "사용년월": np.full(n, month),
+        "노선번호": np.array(BUS_ROUTES, dtype=object)[rng.integers(0, len(BUS_ROUTES), n)],
+        "노선명": None,
+        "표준버스정류장ID": rng.integers(100000000, 124000000, n),
+        "버스정류장ARS번호": np.char.zfill(rng.integers(1, 25000, n).astype(str), 5),
+        "역명": _station_names(rng, n),
+    }
+    data["노선명"] = data["노선번호"] + "(종점~기점)"
+    hour = 0
+    while len(data) < total_cols:
+        data[f"{hour % 24:02d}시승차총승객수"] = rng.poisson(20, n)
+        if len(data) < total_cols:
+            data[f"{hour % 24:02d}시하차총승객수"] = rng.poisson(20, n)
+        hour += 1
+    return pd.DataFrame(data)
+
+
+def generate(out_dir, files=2, rows=100_000, cols=6, seed=0, start_month=202401):
+    """
+    out_dir에 CSV files개를 만듭니다. 반환: [(파일 경로, 행 수, byte 수)]
+    cols는 파일당 column 수 (지하철 파일은 6 이상, 버스 파일은 최소 6).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    created = []
+    month = start_month
+    for i in range(files):
+        if i % 2 == 0:
+            path = os.path.join(out_dir, f"CARD_SUBWAY_MONTH_{month}.csv")
+            make = lambda n: subway_chunk(rng, n, month, max(cols - 6, 0))
+        else:
+            path = os.path.join(out_dir, f"{month // 100}년_버스노선별_정류장별_시간대별_승하차_인원_정보({month % 100}월).csv")
+            make = lambda n: bus_chunk(rng, n, month, max(cols, 6))
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            written = 0
+            while written < rows:
+                n = min(CHUNK_ROWS, rows - written)
+                make(n).to_csv(f, index=False, header=written == 0)
+                written += n
+        created.append((path, rows, os.path.getsize(path)))
+        if i % 2 == 1:
+            month = month + 89 if month % 100 == 12 else month + 1
+    return created
+
+
+def make_archive(out_dir):
+    """out_dir의 CSV를 <out_dir>.tar.gz로 묶습니다 (csv2mysql/csv2recap에 압축 파일을 그대로 넘기는 경우)."""
+    archive = os.path.normpath(out_dir) + ".tar.gz"
+    with tarfile.open(archive, "w:gz") as tar:
+        tar.add(out_dir, arcname=os.path.basename(os.path.normpath(out_dir)))
+    return archive
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out_dir")
+    parser.add_argument("--files", type=int, default=2)
+    parser.add_argument("--rows", type=int, default=100_000, help="파일당 행 수")
+    parser.add_argument("--cols", type=int, default=6, help="파일당 column 수")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--archive", action="store_true", help="<out_dir>.tar.gz도 생성")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    created = generate(args.out_dir, args.files, args.rows, args.cols, args.seed)
+    elapsed = time.perf_counter() - t0
+    total = sum(size for _, _, size in created)
+    for path, rows, size in created:
+        print(f"{os.path.basename(path)}: {rows} rows, {size / 1e6:.1f} MB")
+    print(f"generated {total / 1e6:.1f} MB in {elapsed:.1f}s ({total / 1e6 / elapsed:.1f} MB/s)")
+    if args.archive:
+        print(f"archive: {make_archive(args.out_dir)}")
+
+
+if __name__ == "__main__":
+    main()
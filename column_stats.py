@@ -0,0 +1,139 @@
+import re
+import pandas as pd
+
+# --- Configuration ---
+SCAN_CHUNK_ROWS = 200000       # 한 번에 메모리에 올리는 행 수
+VARCHAR_MAX_CHARS = 4000       # 이보다 긴 값이 있으면 TEXT 사용
+INT_MIN, INT_MAX = -2147483648, 2147483647
+BIGINT_MIN, BIGINT_MAX = -9223372036854775808, 9223372036854775807
+
+INT_PATTERN = r'[+-]?\d+'
+NULL_TOKEN = '\\N'   # LOAD DATA에서 NULL로 읽히는 값
+
+
+class ColumnStats:
+    """파일 전체에 대한 한 column의 통계"""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.empty = 0           # 빈 문자열 (int/double column에서는 LOAD DATA가 실패함)
+        self.max_chars = 0
+        self.max_bytes = 0
+        self.all_int = True
+        self.all_numeric = True
+        self.min = None
+        self.max = None
+
+    def update(self, values):
+        values = values[values != NULL_TOKEN]
+        self.rows += len(values)
+        if len(values) == 0:
+            return
+
+        char_len = values.str.len()
+        self.max_chars = max(self.max_chars, int(char_len.max()))
+        # ASCII만 있으면 byte 길이 = 문자 길이, 한글 등이 있으면 utf-8로 인코딩해서 계산
+        if values.str.isascii().all():
+            self.max_bytes = max(self.max_bytes, int(char_len.max()))
+        else:
+            self.max_bytes = max(self.max_bytes, int(values.str.encode('utf-8').str.len().max()))
+
+        empty = values == ""
+        self.empty += int(empty.sum())
+
+        # 한 번 숫자가 아닌 값이 나오면 이후 chunk는 숫자 검사를 하지 않음
+        if not self.all_numeric:
+            return
+        numeric = pd.to_numeric(values, errors='coerce')
+        if empty.any() or numeric.isna().any():
+            self.all_int = self.all_numeric = False
+            self.min = self.max = None
+            return
+        if self.all_int and not values.str.fullmatch(INT_PATTERN).all():
+            self.all_int = False
+        # 정수 column은 int64로 파싱되므로 정확한 값으로 비교, int64를 넘는 값은 float로 남아 BIGINT 범위 검사에서 걸러짐
+        lo, hi = numeric.min(), numeric.max()
+        if numeric.dtype.kind in 'iu':
+            lo, hi = int(lo), int(hi)
+        else:
+            lo, hi = float(lo), float(hi)
+        self.min = lo if self.min is None else min(self.min, lo)
+        self.max = hi if self.max is None else max(self.max, hi)
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "empty": self.empty,
+            "max_chars": self.max_chars,
+            "max_bytes": self.max_bytes,
+            "all_int": self.all_int and self.rows > 0,
+            "all_numeric": self.all_numeric and self.rows > 0,
+            "min": self.min,
+            "max": self.max,
+        }
+
+
+def scan_csv_columns(file_path, encoding='utf-8', chunk_rows=SCAN_CHUNK_ROWS):
+    """
+    CSV 파일 전체를 chunk 단위로 한 번 읽어 column별 최대 문자/byte 길이, 숫자 여부, 최소/최대값을 구합니다.
+    메모리는 chunk_rows 행 만큼만 사용합니다.
+    """
+    stats = None
+    reader = pd.read_csv(
+        file_path, encoding=encoding, dtype=str, keep_default_na=False,
+        index_col=False, chunksize=chunk_rows,
+    )
+    for chunk in reader:
+        if stats is None:
+            stats = [ColumnStats(col) for col in chunk.columns]
+        for i, st in enumerate(stats):
+            st.update(chunk.iloc[:, i])
+    return {st.name: st.as_dict() for st in (stats or [])}
+
+
+def _varchar_for(st):
+    size = max(st["max_chars"], 1)
+    return "TEXT" if size > VARCHAR_MAX_CHARS else f"VARCHAR({size})"
+
+
+def refine_types(column_names, sql_types, stats):
+    """
+    get_optimal_types()가 정한 타입을 파일 전체 통계로 보정해서 LOAD DATA가 처음부터 성공하도록 합니다.
+    - int: 정수가 아닌 값이 있으면 DOUBLE 또는 VARCHAR, INT 범위를 넘으면 BIGINT
+    - float/double: 숫자가 아닌 값이 있으면 VARCHAR
+    - varchar(n): 실제 최대 길이가 n보다 크면 최대 길이로 확장
+    날짜 column(STR_TO_DATE로 변환)과 TEXT는 그대로 둡니다.
+    """
+    refined = []
+    for name, dtype in zip(column_names, sql_types):
+        st = stats.get(name)
+        base = dtype.split("(")[0].strip().lower()
+        if st is None or st["rows"] == 0:
+            refined.append(dtype)
+            continue
+
+        if base in ("int", "bigint"):
+            if st["all_int"]:
+                if INT_MIN <= st["min"] and st["max"] <= INT_MAX:
+                    refined.append(dtype)
+                elif BIGINT_MIN <= st["min"] and st["max"] <= BIGINT_MAX:
+                    refined.append("BIGINT")
+                else:
+                    refined.append("DOUBLE")
+            elif st["all_numeric"]:
+                refined.append("DOUBLE")
+            else:
+                refined.append(_varchar_for(st))
+        elif base in ("float", "double", "decimal"):
+            refined.append(dtype if st["all_numeric"] else _varchar_for(st))
+        elif base == "varchar":
+            m = re.search(r"\((\d+)\)", dtype)
+            size = int(m.group(1)) if m else 0
+            refined.append(dtype if st["max_chars"] <= size else _varchar_for(st))
+        else:
+            refined.append(dtype)
+
+        if refined[-1] != dtype:
+            print(f"🔧 full scan: column '{name}' {dtype} -> {refined[-1]}")
+    return refined
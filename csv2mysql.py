@@ -1,7 +1,23 @@
 import os
+import json
+import numpy as np
 import pandas as pd
-import ollama
 import mysql.connector
+import mysql.connector.pooling
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import type_cache
+import column_stats
+import manifest
+import index_advisor
+import series
+import rollup
+import sources
+import metrics
+import llm_client
 
 import re
 
@@ -106,20 +122,86 @@ MYSQL_CONFIG = {
     'allow_local_infile': True  # Required for LOAD DATA LOCAL
 }
 
-def get_optimal_types(df):
-    """Sends 20 lines to Ollama to get comma-separated MySQL types."""
+# FULL_SCAN=1 이면 LOAD DATA 전에 파일 전체를 한 번 읽어 column 타입을 보정 (retry loop는 안전장치로만 남음)
+FULL_SCAN = os.getenv("FULL_SCAN", "0") == "1"
+
+TYPE_MODEL = "gpt-oss:20b"
+# serial: column 하나당 1회 호출, batch: 모든 column을 JSON 프롬프트 1회로, concurrent: column별 호출을 worker pool로 병렬 실행
+TYPE_INFERENCE_MODE = os.getenv("TYPE_INFERENCE_MODE", "serial")
+TYPE_INFERENCE_WORKERS = int(os.getenv("TYPE_INFERENCE_WORKERS", "4"))
+
+TYPE_RULES = "제목에 연월일, 시간, date 등이 포함되면  타입으로 DATE, DATETIME, TIME등을 사용하라. date, datetime, time, timestamp를  선택할 때는 문자열들을 근거로 년,월, 일 순서를  파악하고 타입 다음에 시간 형식도 같이 출력하라.  연도월일 순서이면 (%Y%m%d), 일이 없으면 (%Y%m),  연도-월-일 순이면 (%Y-%m-%d)를 출력하고, 월-일-년도 순서이면 (%m-%d-%Y) 로 출력한다.  추가로 primary, field 이름, 설명이나 comment는 넣지 마라. VARCHAR type은 반드시 크기를 지정하라. TINYINT, SMALLINT, MEDIUMINT 대신에 INT를 사용하라. "
+
+
+def _clean_type_answer(text):
+    return str(text).strip().replace("\n", "").replace(" ", "")
+
+
+def ask_column_type(values, column):
+    """한 column의 값들을 Ollama에 보내 resolve_token_type()으로 정제된 타입을 반환합니다."""
+    prompt = f"{values}. \n  문자열들은 csv file의 한 열이다. {column}는 이들 문자열의 제목인데  Mysql로 변환할 때 적당한 타입만 표시하라.  " + TYPE_RULES
+
+    response = llm_client.generate(TYPE_MODEL, prompt, options={'temperature': 0}, purpose="column_type")
+    typ = _clean_type_answer(response['response'])
+    print(typ)
+    return resolve_token_type(typ)
+
+
+def ask_column_types_batch(df):
+    """
+    모든 column을 하나의 JSON 프롬프트로 보내 {column: 타입} 답변을 받습니다.
+    답변이 JSON이 아니거나 빠진 column이 있으면 해당 column만 ask_column_type()으로 다시 묻습니다.
+    """
+    columns = df.columns.tolist()
+    samples = {col: df[col].astype(str).tolist() for col in columns}
+    prompt = (
+        f"{json.dumps(samples, ensure_ascii=False)}\n"
+        "위 JSON은 csv file의 열 제목과 그 열의 문자열들이다. 각 열을 Mysql로 변환할 때 적당한 타입만 표시하라. "
+        + TYPE_RULES +
+        "반드시 {\"열 제목\": \"타입\"} 형태의 JSON object 하나만 출력하고 모든 열 제목을 포함하라."
+    )
+
+    # format='json': 첫 JSON object가 끝나면 stream을 끊음 (llm_client)
+    response = llm_client.generate(TYPE_MODEL, prompt, format='json', options={'temperature': 0},
+                                   purpose="column_types_batch")
+    try:
+        answer = json.loads(response['response'])
+    except json.JSONDecodeError:
+        print("JSON 답변 파싱 실패, column 단위로 다시 요청합니다.")
+        answer = {}
+    if not isinstance(answer, dict):
+        answer = {}
+
+    resolved = []
+    for i, col in enumerate(columns):
+        if col in answer:
+            typ = _clean_type_answer(answer[col])
+            print(typ)
+            resolved.append(resolve_token_type(typ))
+        else:
+            resolved.append(ask_column_type(df.iloc[:, i].to_string(header=False, index=False), col))
+    return resolved
+
+
+def ask_column_types_concurrent(df, max_workers=TYPE_INFERENCE_WORKERS):
+    """column별 프롬프트를 크기가 제한된 thread pool로 동시에 보냅니다. 결과 순서는 column 순서와 같습니다."""
     columns = df.columns.tolist()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(ask_column_type, df.iloc[:, i].to_string(header=False, index=False), columns[i])
+            for i in range(len(columns))
+        ]
+        return [f.result() for f in futures]
+
+
+def build_type_statements(columns, resolved):
+    """resolve_token_type() 결과들로 (types, fields, set_stm)을 만듭니다."""
     results = []
     var_name = "@temp"
     fields = "("
     set_stm = ""
     for i in range(len(columns)):
-        prompt = f"{df.iloc[:, i].to_string(header=False, index=False)}. \n  문자열들은 csv file의 한 열이다. {columns[i]}는 이들 문자열의 제목인데  Mysql로 변환할 때 적당한 타입만 표시하라.  제목에 연월일, 시간, date 등이 포함되면  타입으로 DATE, DATETIME, TIME등을 사용하라. date, datetime, time, timestamp를  선택할 때는 문자열들을 근거로 년,월, 일 순서를  파악하고 타입 다음에 시간 형식도 같이 출력하라.  연도월일 순서이면 (%Y%m%d), 일이 없으면 (%Y%m),  연도-월-일 순이면 (%Y-%m-%d)를 출력하고, 월-일-년도 순서이면 (%m-%d-%Y) 로 출력한다.  추가로 primary, field 이름, 설명이나 comment는 넣지 마라. VARCHAR type은 반드시 크기를 지정하라. TINYINT, SMALLINT, MEDIUMINT 대신에 INT를 사용하라. "
-
-        response = ollama.generate(model="gpt-oss:20b", prompt=prompt, options={'temperature': 0})
-        typ =  response['response'].strip().replace("\n", "").replace(" ", "")
-        print(typ)
-        ret = resolve_token_type(typ)
+        ret = resolved[i]
         if ret is None:
             results.append("TEXT") 
             fields += columns[i] + ','
@@ -142,7 +224,827 @@ def get_optimal_types(df):
     return results, fields[:-1]+")\n", set_stm[:-1]
 
 
-def process_directory(directory):
+# --- Local type profiler ---
+# TYPE_PROFILER=1 이면 샘플만으로 타입이 분명한 column은 LLM에 묻지 않고 바로 결정합니다.
+TYPE_PROFILER = os.getenv("TYPE_PROFILER", "0") == "1"
+PROFILE_MIN_ROWS = 3          # 비어있지 않은 값이 이보다 적으면 판단하지 않음
+PROFILE_MAX_VARCHAR = 255     # 이보다 긴 문자열은 text
+INT_MAX = 2147483647
+
+DATE_HEADER_PATTERN = r'(연월일|년월일|일자|날짜|일시|date)'
+DATE_FORMATS = [
+    # (값 정규식, strptime 형식, 제목 힌트가 필요한지)  YYYYMMDD는 숫자와 구별이 안되므로 제목 힌트가 있어야 함
+    (r'\d{8}', '%Y%m%d', True),
+    (r'\d{4}-\d{2}-\d{2}', '%Y-%m-%d', False),
+    (r'\d{2}-\d{2}-\d{4}', '%m-%d-%Y', False),
+]
+
+
+def _sample_strings(series):
+    """결측값을 제외한 샘플 값을 문자열 Series로 반환합니다. 정수만 담긴 float column은 정수 문자열로 바꿉니다."""
+    values = series.dropna()
+    if pd.api.types.is_float_dtype(values) and np.all(np.mod(values.to_numpy(), 1) == 0):
+        values = values.astype('int64')
+    values = values.astype(str).str.strip()
+    return values[values != ""]
+
+
+def profile_column_type(series, column):
+    """
+    pandas/NumPy 벡터 연산으로 column 타입을 판단합니다.
+    resolve_token_type()이 반환하는 형식(int, double, varchar(n), text, date(%Y%m%d) ...)으로 반환하고,
+    확신할 수 없으면 None을 반환해 LLM에 맡깁니다.
+    """
+    values = _sample_strings(series)
+    if len(values) < PROFILE_MIN_ROWS:
+        return None
+
+    # 1. 날짜: 형식 정규식과 실제 날짜 파싱이 모두 100% 일치해야 함
+    date_header = re.search(DATE_HEADER_PATTERN, str(column), re.IGNORECASE) is not None
+    for pattern, fmt, needs_header in DATE_FORMATS:
+        if needs_header and not date_header:
+            continue
+        if values.str.fullmatch(pattern).all():
+            parsed = pd.to_datetime(values, format=fmt, errors='coerce')
+            if parsed.notna().all():
+                return f"date({fmt})"
+
+    # 2. 숫자: 모든 값이 숫자로 파싱되어야 함
+    numeric = pd.to_numeric(values, errors='coerce')
+    numeric_rate = numeric.notna().mean()
+    if numeric_rate == 1.0:
+        if values.str.fullmatch(r'[+-]?\d+').all():
+            # 0으로 시작하는 코드(예: 0012)는 숫자로 바꾸면 값이 바뀜
+            if values.str.fullmatch(r'[+-]?0\d+').any():
+                return None
+            if np.abs(numeric.to_numpy(dtype=np.float64)).max() > INT_MAX:
+                return None
+            return "int"
+        if values.str.fullmatch(r'[+-]?(\d+\.?\d*|\.\d+)').all():
+            return "double"
+        return None   # 지수 표기 등은 LLM에 맡김
+    if date_header or values.str.contains(':').any():
+        return None   # 시간/날짜처럼 보이는 문자열은 LLM에 맡김
+
+    # 3. 문자열: 숫자와 문자가 섞였거나 문자만 있는 column
+    max_len = int(values.str.len().max())
+    if max_len > PROFILE_MAX_VARCHAR:
+        return "text"
+    return f"varchar({max(16, max_len * 2)})"
+
+
+def profile_types(df):
+    """column별 profile_column_type() 결과 리스트. None인 column만 LLM으로 보냅니다."""
+    return [profile_column_type(df.iloc[:, i], col) for i, col in enumerate(df.columns.tolist())]
+
+
+# --- Type inference cache ---
+# TYPE_CACHE=1 이면 사용, TYPE_CACHE_INVALIDATE=1 이면 시작할 때 cache를 비움
+TYPE_CACHE = os.getenv("TYPE_CACHE", "0") == "1"
+TYPE_CACHE_INVALIDATE = os.getenv("TYPE_CACHE_INVALIDATE", "0") == "1"
+_type_cache = None
+_type_cache_lock = threading.Lock()
+
+
+def get_type_cache():
+    """모델과 프롬프트 hash를 namespace로 하는 TypeCache. 프롬프트나 모델이 바뀌면 이전 항목은 조회되지 않습니다."""
+    global _type_cache
+    with _type_cache_lock:
+        if _type_cache is None:
+            namespace = hashlib.sha1(f"{TYPE_MODEL}\x00{TYPE_RULES}".encode("utf-8")).hexdigest()[:16]
+            _type_cache = type_cache.TypeCache(namespace, invalidate=TYPE_CACHE_INVALIDATE)
+    return _type_cache
+
+
+def get_optimal_types(df, mode=None, max_workers=None, use_profiler=None, use_cache=None):
+    """
+    Sends 20 lines to Ollama to get MySQL types.
+    mode: "serial"(기본), "batch", "concurrent". 세 모드 모두 같은 (types, fields, set_stm)을 반환합니다.
+    use_profiler가 켜져 있으면 profile_types()로 결정되지 않은 column만,
+    use_cache가 켜져 있으면 그 중 type cache에 없는 column만 Ollama에 묻습니다.
+    """
+    mode = mode or TYPE_INFERENCE_MODE
+    use_profiler = TYPE_PROFILER if use_profiler is None else use_profiler
+    use_cache = TYPE_CACHE if use_cache is None else use_cache
+    columns = df.columns.tolist()
+
+    resolved = profile_types(df) if use_profiler else [None] * len(columns)
+    pending = [i for i in range(len(columns)) if resolved[i] is None]
+    if use_profiler:
+        print(f"profiler: {len(columns) - len(pending)}/{len(columns)} columns, LLM: {len(pending)} columns")
+
+    cache = get_type_cache() if use_cache else None
+    if cache is not None:
+        samples = {i: _sample_strings(df.iloc[:, i]).tolist() for i in pending}
+        missed = []
+        for i in pending:
+            hit, ret = cache.get(columns[i], samples[i])
+            if hit:
+                resolved[i] = ret
+            else:
+                missed.append(i)
+        print(f"type cache: {len(pending) - len(missed)} hits, {len(missed)} misses")
+        metrics.count("type_cache.hits", len(pending) - len(missed))
+        metrics.count("type_cache.misses", len(missed))
+        pending = missed
+
+    if pending:
+        pending_df = df.iloc[:, pending]
+        if mode == "batch":
+            answers = ask_column_types_batch(pending_df)
+        elif mode == "concurrent":
+            answers = ask_column_types_concurrent(pending_df, max_workers or TYPE_INFERENCE_WORKERS)
+        else:
+            answers = [
+                ask_column_type(pending_df.iloc[:, j].to_string(header=False, index=False), pending_df.columns[j])
+                for j in range(len(pending))
+            ]
+        for i, ret in zip(pending, answers):
+            resolved[i] = ret
+            if cache is not None:
+                cache.put(columns[i], samples[i], ret)
+
+    return build_type_statements(columns, resolved)
+
+
+def infer_file_schema(file_path, full_scan=False):
+    """
+    샘플 20줄로 타입을 정하고 (full_scan이면 파일 전체 통계로 보정) LOAD DATA에 필요한 정보를 반환합니다.
+    file_path는 압축 파일 안의 CSV(sources.Source)여도 됩니다.
+    """
+    if isinstance(file_path, sources.Source):
+        table_name = file_path.table_name
+    else:
+        table_name = os.path.splitext(os.path.basename(file_path))[0]
+
+    # 2. Read first 20 lines for LLM
+    with sources.open_csv(file_path) as f:
+        df_sample = pd.read_csv(f, nrows=20, index_col=False)
+
+    # 3. Get Types from Ollama
+    column_names = df_sample.columns.tolist()
+    with metrics.span("type_inference", mode=TYPE_INFERENCE_MODE):
+        sql_types, fields, set_stm = get_optimal_types(df_sample)
+    print(f"LLM returns {sql_types}")
+
+    # Validation: ensure LLM returned enough types for the columns
+    if len(sql_types) != len(column_names):
+        # Fallback to VARCHAR if LLM response length mismatches
+        sql_types = ["TEXT"] * len(column_names)
+
+    # 파일 전체의 최대 길이, 숫자 여부, 최소/최대값으로 타입 보정
+    if full_scan:
+        with metrics.span("column_scan"), sources.open_csv(file_path) as f:
+            stats = column_stats.scan_csv_columns(f)
+        sql_types = column_stats.refine_types(column_names, sql_types, stats)
+
+    return {
+        "table_name": table_name,
+        "column_names": column_names,
+        "sql_types": sql_types,
+        "fields": fields,
+        "set_stm": set_stm,
+    }
+
+
+def build_load_query(file_path, table_name, fields, set_stm="", ignore_lines=1, local=False):
+    # Note: replace backslashes for Windows compatibility in SQL string
+    formatted_path = file_path.replace('\\', '/')
+    set_clause = f"SET {set_stm}" if set_stm else ""
+    return f"""
+    LOAD DATA {'LOCAL ' if local else ''}INFILE '{formatted_path}'
+    INTO TABLE `{table_name}`
+    FIELDS TERMINATED BY ','
+    ENCLOSED BY '\"'
+    LINES TERMINATED BY '\\n'
+    IGNORE {ignore_lines} ROWS
+    {fields}
+    {set_clause};
+    """
+
+
+def create_table(cursor, schema):
+    # 4. Create Table Script
+    table_name = schema["table_name"]
+    col_definitions = [f"`{name}` {dtype}" for name, dtype in zip(schema["column_names"], schema["sql_types"])]
+    create_query = f"CREATE TABLE IF NOT EXISTS `{table_name}` ({', '.join(col_definitions)});"
+
+    cursor.execute(f"DROP TABLE IF EXISTS `{table_name}`")
+    cursor.execute(create_query)
+
+
+def load_direct(conn, cursor, schema, file_path, ignore_lines=1, recreate=True):
+    """
+    strict mode LOAD DATA. 1406, 1265, 1366 에러가 나면 column을 ALTER하고 다시 로딩합니다.
+    recreate=False이면 기존 table에 ignore_lines 이후의 행만 추가합니다.
+    """
+    table_name = schema["table_name"]
+    if recreate:
+        create_table(cursor, schema)
+
+    # 5. Load Data via LOAD DATA INFILE
+    load_query = build_load_query(file_path, table_name, schema["fields"], schema["set_stm"], ignore_lines)
+    print(load_query)
+    attempt = 1
+    while True:
+        try:
+            print(f"[{attempt}차 시도] 데이터 로딩 시작...")
+            with metrics.span("mysql.load_data", mode="direct") as sp:
+                cursor.execute(load_query)
+                sp.set(rows=cursor.rowcount, table=table_name)
+            conn.commit()
+            print("✅ 데이터 로딩 성공!")
+            break
+
+        except mysql.connector.Error as err:
+            if err.errno in (1406, 1265, 1366):
+                metrics.count("mysql.alter_retries", errno=err.errno)
+            # 1406 에러: Data too long for column 'column_name'
+            if err.errno == 1406:
+                error_msg = str(err)
+                print(f"❌ 에러 발생: {error_msg}")
+
+                # 에러 메시지에서 컬럼명 추출 (예: Data too long for column 'email' at row 1)
+                match = re.search(r"column '(.+?)'", error_msg)
+                if match:
+                    col_name = match.group(1)
+                 
+                    # 1. 현재 VARCHAR 크기 확인
+                    cursor.execute(f"""
+                        SELECT CHARACTER_MAXIMUM_LENGTH 
+                        FROM information_schema.COLUMNS 
+                        WHERE  
+                        TABLE_NAME = '{table_name}' 
+                        AND COLUMN_NAME = '{col_name}'
+                    """)
+                    current_size = cursor.fetchone()[0]
+                 
+                    if current_size is None:
+                        print("사이즈를 확인할 수 없는 컬럼 타입입니다.")
+                        break
+
+                    # 2. 크기를 2배로 확장
+                    new_size = current_size * 2
+                    print(f"🔧 컬럼 '{col_name}' 크기 변경: {current_size} -> {new_size}")
+                 
+                    alter_query = f"ALTER TABLE `{table_name}` MODIFY {col_name} VARCHAR({new_size})"
+                    cursor.execute(alter_query)
+        
+                    attempt += 1
+                    continue # 루프 재시작 (재시도)
+                else:
+                    print("컬럼명을 추출하지 못했습니다.")
+                    raise
+            elif err.errno == 1265:   # Data truncated for column 'column_name'
+                error_msg = str(err)
+                print(f"❌ 에러 발생: {error_msg}")
+
+                # 에러 메시지에서 컬럼명 추출 (예: Data truncated for column 'email' at row 428)
+                match = re.search(r"column '(.+?)'", error_msg)
+                if match:
+                    col_name = match.group(1)
+                    # error where usually character data is given to int type, for example, 100A
+                    print(f"🔧 컬럼 '{col_name}' type change:  int -> varchar(10)")
+
+                    alter_query = f"ALTER TABLE `{table_name}` MODIFY {col_name} VARCHAR(10)"
+                    cursor.execute(alter_query)
+        
+                    attempt += 1
+                    continue # 루프 재시작 (재시도)
+            elif err.errno == 1366:   # Incorrect integer value: 'N61' for column 'column_name'
+                error_msg = str(err)
+                print(f"❌ 에러 발생: {error_msg}")
+
+                # 에러 메시지에서 컬럼명 추출 (예: Incorrect integer value: 'N61' for column '노선번호'
+                match = re.search(r"column '(.+?)'", error_msg)
+                if match:
+                    col_name = match.group(1)
+                    # for example, N61
+                    print(f"🔧 컬럼 '{col_name}' type change:  int -> varchar(10)")
+
+                    alter_query = f"ALTER TABLE `{table_name}` MODIFY {col_name} VARCHAR(10)"
+                    cursor.execute(alter_query)
+        
+                    attempt += 1
+                    continue # 루프 재시작 (재시도)
+            else:
+                print(f"기타 MySQL 에러: {err}")
+                raise
+    # end of while loop
+
+
+def _widen_column(cursor, table_name, col_name):
+    """
+    LOCAL 로딩 warning의 column을 넓힙니다: VARCHAR이면 크기 2배, 숫자/날짜 column이면 VARCHAR(10)
+    (load_direct의 1406 / 1265, 1366 처리와 같음). 넓힐 수 없으면 False.
+    """
+    cursor.execute(
+        "SELECT DATA_TYPE, CHARACTER_MAXIMUM_LENGTH FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+        (table_name, col_name),
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return False
+    data_type, current_size = row
+    if data_type in ("varchar", "char"):
+        new_type = f"VARCHAR({current_size * 2})"
+    elif data_type in ("text", "mediumtext", "longtext"):
+        return False
+    else:
+        new_type = "VARCHAR(10)"
+    print(f"🔧 컬럼 '{col_name}' type change:  {data_type}({current_size or ''}) -> {new_type}")
+    cursor.execute(f"ALTER TABLE `{table_name}` MODIFY `{col_name}` {new_type}")
+    return True
+
+
+def load_stream(conn, cursor, schema, source):
+    """
+    압축 파일 안의 CSV(sources.Source)를 풀면서 LOAD DATA LOCAL INFILE로 로딩합니다 (임시 파일 없음).
+    LOCAL은 strict mode에서도 1406/1265/1366이 에러가 아니라 warning이 되므로 SHOW WARNINGS로 확인하고,
+    잘린 column이 있으면 table을 비우고 column을 넓혀 다시 로딩합니다.
+    """
+    table_name = schema["table_name"]
+    create_table(cursor, schema)
+
+    attempt = 1
+    while True:
+        print(f"[{attempt}차 시도] {source} 로딩 시작...")
+        with sources.local_infile(source) as pipe_path, metrics.span("mysql.load_data", mode="local") as sp:
+            cursor.execute(build_load_query(pipe_path, table_name, schema["fields"], schema["set_stm"], local=True))
+            sp.set(rows=cursor.rowcount, table=table_name)
+            cursor.execute("SHOW WARNINGS")
+            warnings = cursor.fetchall()
+
+        truncated = None
+        for _, code, message in warnings:
+            if code in (1406, 1265, 1366):
+                match = re.search(r"column '(.+?)'", message)
+                if match:
+                    print(f"❌ warning {code}: {message}")
+                    truncated = match.group(1)
+                    break
+        if truncated is None:
+            conn.commit()
+            for _, code, message in warnings[:5]:
+                print(f"⚠️ warning {code}: {message}")
+            print("✅ 데이터 로딩 성공!")
+            return
+
+        metrics.count("mysql.alter_retries", errno=code)
+        cursor.execute(f"TRUNCATE TABLE `{table_name}`")
+        if not _widen_column(cursor, table_name, truncated):
+            raise ValueError(f"{table_name}: column '{truncated}' cannot be widened")
+        attempt += 1
+
+
+def process_archive(archive_path, full_scan=False, on_table_loaded=None):
+    """
+    .tar.gz/.zip/.gz 안의 CSV를 풀지 않고 stream으로 로딩합니다. database 이름은 확장자를 뺀 압축 파일 이름입니다.
+    member의 변경 여부를 알 수 없으므로 manifest(INCREMENTAL)와 SERIES_MODE는 사용하지 않고 매번 전체를 로딩합니다.
+    """
+    db_name = sources.dataset_name(archive_path)
+    conn = mysql.connector.connect(**MYSQL_CONFIG)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{db_name}` DEFAULT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+        cursor.execute(f"USE `{db_name}`")
+        cursor.execute("SET SESSION sql_mode = 'STRICT_ALL_TABLES'")
+
+        loaded = []
+        for source in sources.list_sources(archive_path):
+            try:
+                schema = infer_file_schema(source, full_scan)
+                load_stream(conn, cursor, schema, source)
+            except Exception as e:
+                print(f"❌ {source.name}: {e}")
+                continue
+            plan = {"status": "new", "schema": schema, "ignore_lines": 1, "recreate": True}
+            loaded.append(plan)
+            if on_table_loaded is not None:
+                on_table_loaded(schema["table_name"])
+        refresh_rollups(db_name, loaded)
+        advise_indexes(db_name, [plan["schema"]["table_name"] for plan in loaded])
+        if _type_cache is not None:
+            print(f"type cache stats: {_type_cache.stats()}")
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# --- Staging load ---
+# LOAD_MODE=staging 이면 모든 column이 MEDIUMTEXT인 staging table에 한 번만 로딩하고
+# INSERT ... SELECT로 타입 변환, 변환할 수 없는 행은 <table>__reject 에 저장
+LOAD_MODE = os.getenv("LOAD_MODE", "direct")
+STAGING_SUFFIX = "__staging"
+REJECT_SUFFIX = "__reject"
+
+NUMERIC_REGEXP = "^[+-]?([0-9]+[.]?[0-9]*|[.][0-9]+)([eE][+-]?[0-9]+)?$"
+INT_RANGES = {
+    "int": ("-2147483648", "2147483647"),
+    "bigint": ("-9223372036854775808", "9223372036854775807"),
+}
+
+
+def parse_set_expressions(fields, set_stm):
+    """
+    get_optimal_types()가 만든 fields/set_stm에서 column별 변환식을 꺼냅니다.
+    예) " 사용일자 = STR_TO_DATE(@temp0, '%Y%m%d')" -> {"사용일자": ("@temp0", "STR_TO_DATE(@temp0, '%Y%m%d')")}
+    """
+    exprs = {}
+    # 식은 ","로 이어져 있으므로 column 이름은 문자열 시작이나 "," 바로 뒤에서부터 (앞 식의 ","를 포함하지 않음)
+    for m in re.finditer(r"(?:^|,)\s*([^,=]+?)\s*=\s*(STR_TO_DATE\((@temp\d+), '[^']*'\))", set_stm):
+        exprs[m.group(1).strip()] = (m.group(3), m.group(2))
+    return exprs
+
+
+def conversion_sql(column, dtype, set_exprs):
+    """
+    staging column 하나에 대한 (변환식, 유효성 조건)을 반환합니다.
+    빈 문자열은 숫자/날짜 column에서 NULL로 변환합니다.
+    """
+    col = f"`{column}`"
+    base = dtype.split("(")[0].strip().lower()
+    empty = f"({col} IS NULL OR {col} = '')"
+
+    if column in set_exprs:
+        temp_var, expr = set_exprs[column]
+        fmt = expr[expr.index("'"):expr.rindex("'") + 1]
+        return expr.replace(temp_var, f"NULLIF({col}, '')"), f"({empty} OR STR_TO_DATE({col}, {fmt}) IS NOT NULL)"
+    if base in INT_RANGES:
+        lo, hi = INT_RANGES[base]
+        valid = (
+            f"({empty} OR ({col} REGEXP '^[+-]?[0-9]{{1,19}}$' "
+            f"AND CAST({col} AS DECIMAL(65,0)) BETWEEN {lo} AND {hi}))"
+        )
+        return f"NULLIF({col}, '')", valid
+    if base in ("float", "double", "decimal"):
+        return f"NULLIF({col}, '')", f"({empty} OR {col} REGEXP '{NUMERIC_REGEXP}')"
+    if base == "varchar":
+        m = re.search(r"\((\d+)\)", dtype)
+        size = int(m.group(1)) if m else 0
+        return col, f"({col} IS NULL OR CHAR_LENGTH({col}) <= {size})"
+    if base == "text":
+        return col, f"({col} IS NULL OR LENGTH({col}) <= 65535)"
+    # date/time 등 형식이 없는 타입은 MySQL 변환에 맡김
+    return f"NULLIF({col}, '')", "TRUE"
+
+
+def load_staging(conn, cursor, schema, file_path, ignore_lines=1, recreate=True):
+    """
+    staging table에 한 번만 LOAD DATA를 하고 set 기반으로 변환합니다.
+    변환에 실패한 행은 다시 로딩하지 않고 reject table에 실패한 column 이름과 함께 남깁니다.
+    recreate=False이면 기존 table과 reject table에 ignore_lines 이후의 행만 추가합니다.
+    """
+    table_name = schema["table_name"]
+    column_names = schema["column_names"]
+    staging = table_name + STAGING_SUFFIX
+    reject = table_name + REJECT_SUFFIX
+    if recreate:
+        create_table(cursor, schema)
+
+    text_cols = ", ".join(f"`{name}` MEDIUMTEXT" for name in column_names)
+    cursor.execute(f"DROP TABLE IF EXISTS `{staging}`")
+    cursor.execute(f"CREATE TABLE `{staging}` ({text_cols})")
+    if recreate:
+        cursor.execute(f"DROP TABLE IF EXISTS `{reject}`")
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS `{reject}` ({text_cols}, reject_columns TEXT, "
+        "rejected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    )
+
+    staging_fields = "(" + ",".join(f"`{name}`" for name in column_names) + ")"
+    load_query = build_load_query(file_path, staging, staging_fields, ignore_lines=ignore_lines)
+    print(load_query)
+    with metrics.span("mysql.load_data", mode="staging") as sp:
+        cursor.execute(load_query)
+        sp.set(rows=cursor.rowcount, table=staging)
+
+    set_exprs = parse_set_expressions(schema["fields"], schema["set_stm"])
+    conversions = [conversion_sql(name, dtype, set_exprs) for name, dtype in zip(column_names, schema["sql_types"])]
+    all_valid = " AND ".join(valid for _, valid in conversions)
+    target_cols = ", ".join(f"`{name}`" for name in column_names)
+    reject_reason = ", ".join(
+        f"IF({valid}, NULL, '{name}')" for name, (_, valid) in zip(column_names, conversions)
+    )
+
+    # 유효성 조건으로 이미 걸렀으므로 변환 중 경고가 에러가 되지 않도록 strict mode를 잠시 끔
+    cursor.execute("SET SESSION sql_mode = ''")
+    try:
+        with metrics.span("mysql.staging_convert") as sp:
+            cursor.execute(
+                f"INSERT INTO `{table_name}` ({target_cols}) "
+                f"SELECT {', '.join(expr for expr, _ in conversions)} FROM `{staging}` WHERE {all_valid}"
+            )
+            loaded = cursor.rowcount
+            sp.set(rows=loaded, table=table_name)
+        cursor.execute(
+            f"INSERT INTO `{reject}` ({target_cols}, reject_columns) "
+            f"SELECT {target_cols}, CONCAT_WS(',', {reject_reason}) FROM `{staging}` WHERE NOT ({all_valid})"
+        )
+        rejected = cursor.rowcount
+        metrics.count("mysql.rejected_rows", rejected)
+    finally:
+        cursor.execute("SET SESSION sql_mode = 'STRICT_ALL_TABLES'")
+
+    cursor.execute(f"DROP TABLE IF EXISTS `{staging}`")
+    if rejected == 0 and recreate:
+        cursor.execute(f"DROP TABLE IF EXISTS `{reject}`")
+    conn.commit()
+    print(f"✅ 데이터 로딩 성공! rows={loaded}, rejected={rejected}" + (f" -> `{reject}`" if rejected else ""))
+
+
+# --- Parallel ingestion ---
+# INGEST_WORKERS > 1 이면 MySQL connection pool로 여러 파일을 동시에 로딩하고,
+# 다음 파일들의 타입 추론(INFER_WORKERS 개)을 앞 파일들의 LOAD DATA와 겹쳐서 실행
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))
+INFER_WORKERS = int(os.getenv("INFER_WORKERS", "2"))
+
+
+# --- Incremental ingestion ---
+# INCREMENTAL=1 이면 manifest에 기록된 파일 중 바뀌지 않은 파일은 건너뛰고, 뒤에 행만 추가된 파일은 추가된 부분만 로딩
+# (기본 0: 실행할 때마다 모든 파일을 다시 로딩)
+INCREMENTAL = os.getenv("INCREMENTAL", "0") == "1"
+# INDEX_ADVISOR=1 이면 로딩이 끝난 table에 날짜/자주 조회하는 column의 secondary index를 만듦 (index_advisor.py, 기본 0: schema를 바꾸지 않음)
+INDEX_ADVISOR = os.getenv("INDEX_ADVISOR", "0") == "1"
+
+
+def advise_indexes(db_name, tables):
+    """로딩한 table에 index_advisor의 secondary index를 만듭니다. 실패해도 로딩 결과에는 영향이 없습니다."""
+    if not INDEX_ADVISOR or not tables:
+        return
+    try:
+        conn = mysql.connector.connect(database=db_name, **MYSQL_CONFIG)
+        cursor = conn.cursor()
+        with metrics.span("index_advisor"):
+            index_advisor.advise(cursor, db_name, set(tables))
+        cursor.close()
+        conn.close()
+    except Exception as e:
+        print(f"⚠️ index advisor: {e}")
+
+
+def refresh_rollups(db_name, plans):
+    """
+    로딩한 table의 rollup을 갱신합니다 (ROLLUP=1). 월별 series는 로딩한 달만, append된 파일은 rollup의
+    마지막 기간부터 다시 집계합니다.
+    실패해도 로딩 결과에는 영향이 없고, 한 table의 rollup이 실패해도 나머지 table은 계속 갱신합니다.
+    """
+    if not rollup.ROLLUP or not plans:
+        return
+    try:
+        conn = mysql.connector.connect(database=db_name, **MYSQL_CONFIG)
+        cursor = conn.cursor()
+        declared = rollup.load_declared()
+    except Exception as e:
+        print(f"⚠️ rollup: {e}")
+        return
+    rebuilt = set()   # 전체를 다시 만든 table은 같은 실행의 다른 달을 다시 집계하지 않음
+    for plan in plans:
+        table = plan["schema"]["table_name"]
+        if table in rebuilt:
+            continue
+        month = plan["series"][1] if plan.get("series") else None
+        appended = plan.get("status") == "appended"
+        mode = "month" if month is not None else "append" if appended else "full"
+        try:
+            with metrics.span("rollup.refresh", mode=mode):
+                rollup.maintain(conn, cursor, db_name, table, month, declared, appended)
+        except Exception as e:
+            print(f"⚠️ rollup {table}: {e}")
+            try:
+                conn.rollback()   # 다음 table이 실패한 transaction을 이어받지 않도록
+            except Exception:
+                pass
+            continue
+        if mode == "full":
+            rebuilt.add(table)
+    cursor.close()
+    conn.close()
+
+
+def pool_name(db_name):
+    """mysql.connector pool 이름은 영문/숫자/._:-*$#만 허용하므로 (한글 db 이름) db 이름의 sha1로 만듭니다."""
+    return f"csv2mysql_{hashlib.sha1(db_name.encode('utf-8')).hexdigest()[:8]}"
+
+
+def existing_tables(cursor, db_name):
+    cursor.execute("SELECT TABLE_NAME FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s", (db_name,))
+    return set(row[0] for row in cursor.fetchall())
+
+
+def plan_file(file_path, full_scan=False, file_manifest=None, tables=None):
+    """
+    manifest와 비교해서 파일을 어떻게 로딩할지 정합니다.
+    반환값: {"status": new/changed/unchanged/appended, "schema": ..., "ignore_lines": n, "recreate": bool,
+            "state": 로딩 전 파일 상태 (manifest가 있을 때)}
+    unchanged이면 schema는 None입니다.
+    """
+    status, entry = "new", None
+    month_series = series.detect_series(file_path) if series.SERIES_MODE else None
+    if file_manifest is not None:
+        status, entry = file_manifest.check(file_path)
+        table_name = month_series[0] if month_series else os.path.splitext(os.path.basename(file_path))[0]
+        if status in ("unchanged", "appended") and tables is not None and table_name not in tables:
+            status = "changed"   # table이 지워졌으면 처음부터 다시 로딩
+
+    if status == "unchanged":
+        return {"status": status, "schema": None, "ignore_lines": 0, "recreate": False}
+    # 로딩 전의 파일 상태를 manifest에 기록 (로딩하는 동안 추가된 행은 다음 실행에서 appended로 로딩)
+    state = manifest.snapshot(file_path) if file_manifest is not None else None
+    if month_series:
+        # 월별 파일은 그 달의 partition을 통째로 다시 로딩 (행이 추가된 경우도 포함)
+        return {"status": status, "schema": infer_file_schema(file_path, full_scan), "ignore_lines": 1,
+                "recreate": True, "series": month_series, "state": state}
+    if status == "appended":
+        # 이전에 로딩한 줄(헤더 포함)은 건너뛰고 기존 table에 추가
+        return {"status": status, "schema": entry["schema"], "ignore_lines": entry["lines"], "recreate": False,
+                "state": state}
+    return {"status": status, "schema": infer_file_schema(file_path, full_scan), "ignore_lines": 1, "recreate": True,
+            "state": state}
+
+
+# series마다 table 생성과 partition 변경은 한 번에 하나씩
+_series_locks = {}
+_series_locks_guard = threading.Lock()
+
+
+def _series_lock(table):
+    with _series_locks_guard:
+        return _series_locks.setdefault(table, threading.Lock())
+
+
+def load_series_month(conn, cursor, plan, file_path):
+    """
+    월별 파일을 series table의 그 달 partition에 로딩합니다.
+    파일은 같은 구조의 month table(<series>__p<연월>)에 LOAD DATA로 넣고 EXCHANGE PARTITION으로 바꿔 끼우므로
+    다른 달의 데이터에는 영향이 없고 같은 달을 다시 로딩해도 중복되지 않습니다.
+    month table에는 direct 모드로 로딩합니다 (LOAD_MODE=staging의 reject table은 사용하지 않음).
+    """
+    table, month = plan["series"]
+    db_name = conn.database
+    month_table = f"{table}__{series.partition_name(month)}"
+    schema = dict(plan["schema"], table_name=month_table)
+
+    lock = _series_lock(table)
+    lock.acquire()
+    try:
+        if not series.table_exists(cursor, db_name, table):
+            # 첫 달: 추론한 schema로 month table을 만들고 로딩한 뒤 같은 구조의 series table을 만듦
+            date_columns = [c for c, t in zip(schema["column_names"], schema["sql_types"])
+                            if t.split("(")[0].strip().upper() in ("DATE", "DATETIME")]
+            key_column = date_columns[0] if date_columns else series.MONTH_COLUMN
+            if key_column == series.MONTH_COLUMN:
+                schema["column_names"] = schema["column_names"] + [series.MONTH_COLUMN]
+                schema["sql_types"] = schema["sql_types"] + ["INT"]
+                schema["set_stm"] = ", ".join(s for s in [schema["set_stm"], f"{series.MONTH_COLUMN} = {month}"] if s)
+            load_direct(conn, cursor, schema, file_path)
+            series.create_series_table(cursor, table, month_table, key_column)
+            print(f"🗓  series table '{table}' 생성 (partition column: {key_column})")
+            key_type = "int" if key_column == series.MONTH_COLUMN else "date"
+        else:
+            key_column, key_type = series.partition_key(cursor, db_name, table)
+            columns = [c for c, _ in series.column_types(cursor, db_name, table) if c != series.MONTH_COLUMN]
+            if columns != schema["column_names"]:
+                raise ValueError(f"'{os.path.basename(file_path)}' columns differ from series table '{table}'")
+            series.create_month_table(cursor, table, month_table)
+            if key_type == "int":
+                schema["set_stm"] = ", ".join(s for s in [schema["set_stm"], f"{series.MONTH_COLUMN} = {month}"] if s)
+            # 다른 달의 month table 로딩은 동시에 진행
+            lock.release()
+            try:
+                load_direct(conn, cursor, schema, file_path, recreate=False)
+            finally:
+                lock.acquire()
+            series.sync_columns(cursor, db_name, table, month_table)
+
+        series.ensure_partition(cursor, db_name, table, month, key_type)
+        series.exchange_month(cursor, table, month_table, month)
+        conn.commit()
+    finally:
+        lock.release()
+    plan["schema"] = dict(plan["schema"], table_name=table)
+
+
+def _load_file(conn, cursor, plan, file_path, load_mode):
+    with metrics.span("ingest.file", mode="series" if plan.get("series") else load_mode, status=plan["status"]):
+        if plan.get("series"):
+            load_series_month(conn, cursor, plan, file_path)
+        elif load_mode == "staging":
+            load_staging(conn, cursor, plan["schema"], file_path, plan["ignore_lines"], plan["recreate"])
+        else:
+            load_direct(conn, cursor, plan["schema"], file_path, plan["ignore_lines"], plan["recreate"])
+
+
+def _load_pooled(pool, plan, file_path, load_mode):
+    conn = pool.get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET SESSION sql_mode = 'STRICT_ALL_TABLES'")
+        _load_file(conn, cursor, plan, file_path, load_mode)
+    finally:
+        cursor.close()
+        conn.close()   # pool로 반환
+
+
+def process_directory_parallel(directory, full_scan=False, load_mode="direct", workers=INGEST_WORKERS,
+                               infer_workers=INFER_WORKERS, incremental=INCREMENTAL, on_table_loaded=None):
+    """
+    파일별 타입 추론과 LOAD DATA를 pipeline으로 병렬 실행합니다.
+    한 파일의 실패가 다른 파일에 영향을 주지 않고, 마지막에 파일별 성공/실패를 출력합니다.
+    on_table_loaded(table_name)은 table 로딩이 끝날 때마다 호출됩니다 (예: search.SchemaCatalog.invalidate).
+    반환값: {filename: {"ok": bool, "seconds": float, "error": str}}
+    """
+    db_name = os.path.basename(os.path.normpath(directory))
+    # mysql.connector pool은 connection을 32개까지만 가질 수 있으므로 로딩 worker 수도 그 이하로
+    max_pool = getattr(mysql.connector.pooling, "CNX_POOL_MAXSIZE", 32)
+    if workers > max_pool:
+        print(f"⚠️ INGEST_WORKERS={workers}는 connection pool 한도를 넘으므로 {max_pool}개로 실행합니다.")
+        workers = max_pool
+
+    try:
+        conn = mysql.connector.connect(**MYSQL_CONFIG)
+        cursor = conn.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{db_name}` DEFAULT CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+        file_manifest = manifest.Manifest(db_name, "mysql") if incremental else None
+        tables = existing_tables(cursor, db_name) if incremental else None
+        cursor.close()
+        conn.close()
+
+        pool = mysql.connector.pooling.MySQLConnectionPool(
+            pool_name=pool_name(db_name), pool_size=workers, database=db_name, **MYSQL_CONFIG
+        )
+    except Exception as e:
+        # process_directory와 같이 출력만 하고 끝냄
+        print(f"Error: {e}")
+        return None
+
+    filenames = [f for f in os.listdir(directory) if f.endswith(".csv")]
+    results = {}
+    started = {}
+    loaded = []
+    with ThreadPoolExecutor(max_workers=infer_workers) as infer_pool, \
+            ThreadPoolExecutor(max_workers=workers) as load_pool:
+        infer_futures = {}
+        for filename in filenames:
+            file_path = os.path.abspath(os.path.join(directory, filename))
+            started[filename] = time.time()
+            infer_futures[infer_pool.submit(plan_file, file_path, full_scan, file_manifest, tables)] = (filename, file_path)
+
+        # 타입 추론이 끝난 파일부터 바로 로딩을 시작
+        load_futures = {}
+        for future in as_completed(infer_futures):
+            filename, file_path = infer_futures[future]
+            try:
+                plan = future.result()
+            except Exception as e:
+                results[filename] = {"ok": False, "seconds": time.time() - started[filename], "error": f"schema: {e}"}
+                continue
+            if plan["status"] == "unchanged":
+                results[filename] = {"ok": True, "seconds": time.time() - started[filename], "error": "unchanged, skipped"}
+                continue
+            load_futures[load_pool.submit(_load_pooled, pool, plan, file_path, load_mode)] = (filename, file_path, plan)
+
+        for future in as_completed(load_futures):
+            filename, file_path, plan = load_futures[future]
+            try:
+                future.result()
+                results[filename] = {"ok": True, "seconds": time.time() - started[filename], "error": ""}
+                loaded.append(plan)
+                if on_table_loaded is not None:
+                    on_table_loaded(plan["schema"]["table_name"])
+                if file_manifest is not None:
+                    file_manifest.record(plan["state"], schema=plan["schema"])
+            except Exception as e:
+                results[filename] = {"ok": False, "seconds": time.time() - started[filename], "error": f"load: {e}"}
+
+    if file_manifest is not None:
+        file_manifest.save()
+    refresh_rollups(db_name, loaded)
+    advise_indexes(db_name, [plan["schema"]["table_name"] for plan in loaded])
+
+    failed = [f for f in filenames if not results[f]["ok"]]
+    print(f"\n===== {len(filenames) - len(failed)}/{len(filenames)} files loaded =====")
+    for filename in filenames:
+        r = results[filename]
+        mark = "✅" if r["ok"] else "❌"
+        print(f"{mark} {filename} ({r['seconds']:.1f}s) {r['error']}")
+    if _type_cache is not None:
+        print(f"type cache stats: {_type_cache.stats()}")
+    return results
+
+
+def process_directory(directory, full_scan=None, load_mode=None, workers=None, incremental=None, on_table_loaded=None):
+    full_scan = FULL_SCAN if full_scan is None else full_scan
+    load_mode = load_mode or LOAD_MODE
+    workers = workers or INGEST_WORKERS
+    incremental = INCREMENTAL if incremental is None else incremental
+    if sources.is_archive(directory):
+        return process_archive(directory, full_scan, on_table_loaded=on_table_loaded)
+    if workers > 1:
+        return process_directory_parallel(directory, full_scan, load_mode, workers,
+                                          incremental=incremental, on_table_loaded=on_table_loaded)
+
     # Database name is the directory name
     db_name = os.path.basename(os.path.normpath(directory))
     
@@ -155,134 +1057,34 @@ def process_directory(directory):
         cursor.execute(f"USE `{db_name}`")
  
         cursor.execute("SET SESSION sql_mode = 'STRICT_ALL_TABLES'")
+
+        file_manifest = manifest.Manifest(db_name, "mysql") if incremental else None
+        tables = existing_tables(cursor, db_name) if incremental else None
+        loaded = []
         
         for filename in os.listdir(directory):
             if filename.endswith(".csv"):
                 file_path = os.path.abspath(os.path.join(directory, filename))
-                table_name = os.path.splitext(filename)[0]
-                
-                # 2. Read first 20 lines for LLM
-                df_sample = pd.read_csv(file_path, nrows=20, index_col=False)
-                csv_text = df_sample.to_csv(index=False)
-                
-                # 3. Get Types from Ollama
-                column_names = df_sample.columns.tolist()
-                sql_types, fields, set_stm = get_optimal_types(df_sample)
-                #sql_types = get_optimal_types(csv_text)
-                print(f"LLM returns {sql_types}")
-                
-                # Validation: ensure LLM returned enough types for the columns
-                if len(sql_types) != len(column_names):
-                    # Fallback to VARCHAR if LLM response length mismatches
-                    sql_types = ["TEXT"] * len(column_names)
-
-                # 4. Create Table Script
-                col_definitions = [f"`{name}` {dtype}" for name, dtype in zip(column_names, sql_types)]
-                create_query = f"CREATE TABLE IF NOT EXISTS `{table_name}` ({', '.join(col_definitions)});"
-                
-                cursor.execute(f"DROP TABLE IF EXISTS `{table_name}`")
-                cursor.execute(create_query)
-                
-                # 5. Load Data via LOAD DATA LOCAL INFILE
-                # Note: replace backslashes for Windows compatibility in SQL string
-                formatted_path = file_path.replace('\\', '/')
-                load_query = f"""
-                LOAD DATA INFILE '{formatted_path}'
-                INTO TABLE `{table_name}`
-                FIELDS TERMINATED BY ','
-                ENCLOSED BY '\"'
-                LINES TERMINATED BY '\\n'
-                IGNORE 1 ROWS
-                {fields}
-                SET {set_stm};
-                """
-                print(load_query)            
-                attempt = 1
-                while True:
-                    try:
-                        print(f"[{attempt}차 시도] 데이터 로딩 시작...")
-                        cursor.execute(load_query)
-                        conn.commit()
-                        print("✅ 데이터 로딩 성공!")
-                        break
-
-                    except mysql.connector.Error as err:
-                        # 1406 에러: Data too long for column 'column_name'
-                        if err.errno == 1406:
-                            error_msg = str(err)
-                            print(f"❌ 에러 발생: {error_msg}")
-            
-                            # 에러 메시지에서 컬럼명 추출 (예: Data too long for column 'email' at row 1)
-                            match = re.search(r"column '(.+?)'", error_msg)
-                            if match:
-                                col_name = match.group(1)
-                             
-                                # 1. 현재 VARCHAR 크기 확인
-                                cursor.execute(f"""
-                                    SELECT CHARACTER_MAXIMUM_LENGTH 
-                                    FROM information_schema.COLUMNS 
-                                    WHERE  
-                                    TABLE_NAME = '{table_name}' 
-                                    AND COLUMN_NAME = '{col_name}'
-                                """)
-                                current_size = cursor.fetchone()[0]
-                             
-                                if current_size is None:
-                                    print("사이즈를 확인할 수 없는 컬럼 타입입니다.")
-                                    break
-            
-                                # 2. 크기를 2배로 확장
-                                new_size = current_size * 2
-                                print(f"🔧 컬럼 '{col_name}' 크기 변경: {current_size} -> {new_size}")
-                             
-                                alter_query = f"ALTER TABLE `{table_name}` MODIFY {col_name} VARCHAR({new_size})"
-                                cursor.execute(alter_query)
-                    
-                                attempt += 1
-                                continue # 루프 재시작 (재시도)
-                            else:
-                                print("컬럼명을 추출하지 못했습니다.")
-                                raise
-                        elif err.errno == 1265:   # Data truncated for column 'column_name'
-                            error_msg = str(err)
-                            print(f"❌ 에러 발생: {error_msg}")
-
-                            # 에러 메시지에서 컬럼명 추출 (예: Data truncated for column 'email' at row 428)
-                            match = re.search(r"column '(.+?)'", error_msg)
-                            if match:
-                                col_name = match.group(1)
-                                # error where usually character data is given to int type, for example, 100A
-                                print(f"🔧 컬럼 '{col_name}' type change:  int -> varchar(10)")
-
-                                alter_query = f"ALTER TABLE `{table_name}` MODIFY {col_name} VARCHAR(10)"
-                                cursor.execute(alter_query)
-                    
-                                attempt += 1
-                                continue # 루프 재시작 (재시도)
-                        elif err.errno == 1366:   # Incorrect integer value: 'N61' for column 'column_name'
-                            error_msg = str(err)
-                            print(f"❌ 에러 발생: {error_msg}")
-
-                            # 에러 메시지에서 컬럼명 추출 (예: Incorrect integer value: 'N61' for column '노선번호'
-                            match = re.search(r"column '(.+?)'", error_msg)
-                            if match:
-                                col_name = match.group(1)
-                                # for example, N61
-                                print(f"🔧 컬럼 '{col_name}' type change:  int -> varchar(10)")
-
-                                alter_query = f"ALTER TABLE `{table_name}` MODIFY {col_name} VARCHAR(10)"
-                                cursor.execute(alter_query)
-                    
-                                attempt += 1
-                                continue # 루프 재시작 (재시도)
-                        else:
-                            print(f"기타 MySQL 에러: {err}")
-                            raise
-                # end of while loop
+                plan = plan_file(file_path, full_scan, file_manifest, tables)
+                if plan["status"] == "unchanged":
+                    print(f"⏭  {filename}: 변경 없음, 건너뜀")
+                    continue
+                if plan["status"] == "appended":
+                    print(f"➕ {filename}: 앞의 {plan['ignore_lines']}줄은 건너뛰고 추가된 행만 로딩")
+                _load_file(conn, cursor, plan, file_path, load_mode)
+                loaded.append(plan)
+                if on_table_loaded is not None:
+                    on_table_loaded(plan["schema"]["table_name"])
+                if file_manifest is not None:
+                    file_manifest.record(plan["state"], schema=plan["schema"])
+                    file_manifest.save()
+        refresh_rollups(db_name, loaded)
+        advise_indexes(db_name, [plan["schema"]["table_name"] for plan in loaded])
+        if _type_cache is not None:
+            print(f"type cache stats: {_type_cache.stats()}")
     except Exception as e:
         print(f"Error: {e}")
     finally:
         if 'conn' in locals() and conn.is_connected():
             cursor.close()
             conn.close()
-
@@ -1,166 +1,392 @@
 import os
-import pandas as pd
-import ollama
-import mysql.connector
-from mysql.connector import errorcode
-from transformers import AutoTokenizer, AutoModel
-import torch
 import random
 import csv
-from pymilvus import  (
-        connections, FieldSchema, CollectionSchema, DataType, 
-        Collection, utility, AnnSearchRequest, WeightedRanker
-)
-from FlagEmbedding import BGEM3FlagModel
-import numpy as np
+import io
+import time
+import math
+import mmap
+from concurrent.futures import ThreadPoolExecutor
+import manifest
+import series
+import sources
+import metrics
+import llm_client
+import vector_catalog
+# BGE-M3 모델은 embedding 모듈이 처음 사용할 때 읽음 (csv2recap.generate_embeddings로도 사용 가능)
+from embedding import generate_embeddings
 
 # --- Configuration ---
 MILVUS_HOST = "localhost"
 MILVUS_PORT = "19530"
+RECAP_MODEL = "exaone3.5:32b"
+# 요약 RECAP_BATCH_SIZE개를 모아 한 번에 embedding/insert, 요약은 RECAP_SUMMARY_WORKERS개를 동시에 요청
+RECAP_BATCH_SIZE = int(os.getenv("RECAP_BATCH_SIZE", "16"))
+RECAP_SUMMARY_WORKERS = int(os.getenv("RECAP_SUMMARY_WORKERS", "2"))
+# INCREMENTAL=1 이면 manifest 기준으로 바뀌지 않은 파일은 다시 요약/embedding하지 않음
+INCREMENTAL = os.getenv("INCREMENTAL", "0") == "1"
 
 
-model = BGEM3FlagModel('BAAI/bge-m3', use_fp16=True)
+def setup_milvus(collection_name):
+    """Milvus collection (connections.connect 후에 호출). recap_csv_files는 vector_catalog.open_catalog()를 사용"""
+    return vector_catalog.milvus_collection(collection_name)
 
-def generate_embeddings(texts):
-    # return_dense=True, return_sparse=True, return_colbert_vecs=False
-    output = model.encode(texts, return_dense=True, return_sparse=True)
-    
-    dense_vectors = output['dense_vecs'].astype(np.float32)
-    
-    # Milvus용 Sparse 포맷 변환: {단어ID: 가중치} 형태의 Dictionary
-    # BGE-M3의 sparse output은 이미 {id: weight} 형태입니다.
-    sparse_vectors = output['lexical_weights'] 
-    
-    return dense_vectors, sparse_vectors
 
-def setup_milvus(collection_name):
-    if utility.has_collection(collection_name):
-        return Collection(collection_name)
-    
-    fields = [
-        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
-        FieldSchema(name="filename", dtype=DataType.VARCHAR, max_length=256),
+SCAN_BLOCK_SIZE = 1 << 24   # 줄 수를 셀 때 한 번에 보는 byte 수
+SAMPLE_SEED = os.getenv("SAMPLE_SEED")   # 지정하면 같은 파일에서 항상 같은 샘플
+
+
+def _skip_lines(mm, pos, idx, target, avg_line):
+    """
+    pos(idx번째 줄의 시작)에서 target번째 줄의 시작까지 이동합니다.
+    줄바꿈은 block 단위 bytes.count()로 세므로 건너뛰는 줄마다 Python 코드가 실행되지 않습니다.
+    block 크기는 평균 줄 길이(avg_line)로 필요한 만큼만 잡습니다.
+    파일 끝에 도달하면 (len(mm), 지나온 줄바꿈 수 기준 idx)를 반환합니다.
+    """
+    size = len(mm)
+    while idx < target and pos < size:
+        block_size = min(SCAN_BLOCK_SIZE, max(4096, int((target - idx) * avg_line * 1.25)))
+        block = mm[pos:pos + block_size]
+        count = block.count(b"\n")
+        if idx + count < target:
+            idx += count
+            pos += len(block)
+            continue
+        # target 줄의 시작은 이 block 안에 있음: (target - idx)번째 줄바꿈 위치를 이분 탐색
+        needed = target - idx
+        lo, hi, seen = 0, len(block), 0   # block[:lo]에는 줄바꿈이 seen개
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            c = block.count(b"\n", lo, mid)
+            if seen + c >= needed:
+                hi = mid
+            else:
+                lo, seen = mid, seen + c
+        pos += hi
+        idx = target
+    return pos, idx
+
+
+def sample_lines(mm, start, k, rng):
+    """
+    mm[start:]의 줄 수를 세면서 줄 시작 offset k개를 reservoir sampling(Algorithm L)으로 고릅니다.
+    파일을 한 번만 지나가며, 뽑히지 않는 줄은 _skip_lines()로 건너뜁니다.
+    반환값: (줄 수, 뽑힌 줄 시작 offset 리스트)
+    """
+    size = len(mm)
+    pos, idx = start, 0
+    reservoir = []
 
-        # [Dense Vector] 의미 검색용 (BGE-M3는 1024차원)
-        FieldSchema(name="dense_vector", dtype=DataType.FLOAT_VECTOR, dim=1024),
+    # 1. 처음 k줄로 reservoir를 채움
+    while idx < k and pos < size:
+        reservoir.append(pos)
+        nl = mm.find(b"\n", pos)
+        pos = size if nl < 0 else nl + 1
+        idx += 1
 
-        # [Sparse Vector] 키워드 검색용 (SPARSE_FLOAT_VECTOR 타입 사용)
-        FieldSchema(name="sparse_vector", dtype=DataType.SPARSE_FLOAT_VECTOR),
+    # 2. 다음에 교체할 줄 번호를 기하분포로 뽑아 그 사이는 건너뜀
+    if idx == k and pos < size:
+        avg_line = (pos - start) / idx
+        w = math.exp(math.log(rng.random()) / k)
+        target = idx + int(math.log(rng.random()) / math.log(1 - w))
+        while True:
+            pos, idx = _skip_lines(mm, pos, idx, target, avg_line)
+            if pos >= size:
+                break
+            reservoir[rng.randrange(k)] = pos
+            w *= math.exp(math.log(rng.random()) / k)
+            target += int(math.log(rng.random()) / math.log(1 - w)) + 1
+        # 마지막 줄이 줄바꿈으로 끝나지 않으면 그 줄도 셈
+        if size > start and mm[size - 1:size] != b"\n":
+            idx += 1
 
-        FieldSchema(name="text", dtype=DataType.VARCHAR, max_length=2000),
-    ]
-    schema = CollectionSchema(fields, "File description embeddings")
-    return Collection(collection_name, schema)
+    return idx, reservoir
 
 
-def read_csv_smart(file_path, encoding='utf-8'):
+def _line_at(mm, offset):
+    nl = mm.find(b"\n", offset)
+    return mm[offset:] + b"\n" if nl < 0 else mm[offset:nl + 1]
+
+
+class _LineScanner:
+    """stream에서 줄 단위로 읽거나 건너뜁니다. 건너뛰는 줄은 block 단위 bytes.count()로 셉니다."""
+
+    def __init__(self, stream, block_size=sources.SOURCE_CHUNK_SIZE):
+        self.stream = stream
+        self.block_size = block_size
+        self.buf = b""
+
+    def _fill(self):
+        data = self.stream.read(self.block_size)
+        self.buf += data
+        return bool(data)
+
+    def readline(self):
+        """다음 줄 (파일 끝이면 b"")"""
+        while True:
+            nl = self.buf.find(b"\n")
+            if nl >= 0:
+                line, self.buf = self.buf[:nl + 1], self.buf[nl + 1:]
+                return line
+            if not self._fill():
+                line, self.buf = self.buf, b""
+                return line
+
+    def skip(self, n):
+        """n줄을 건너뜁니다. 반환값: 실제로 건너뛴 줄 수 (파일 끝이면 n보다 작음)"""
+        skipped = 0
+        while skipped < n:
+            count = self.buf.count(b"\n")
+            if skipped + count >= n:
+                pos = -1
+                for _ in range(n - skipped):
+                    pos = self.buf.find(b"\n", pos + 1)
+                self.buf = self.buf[pos + 1:]
+                return n
+            skipped += count
+            self.buf = self.buf[self.buf.rfind(b"\n") + 1:]   # 끝의 완성되지 않은 줄만 남김
+            if not self._fill():
+                if self.buf:
+                    skipped += 1   # 줄바꿈 없이 끝나는 마지막 줄
+                    self.buf = b""
+                return skipped
+        return skipped
+
+
+def sample_stream_lines(scanner, k, rng):
+    """
+    sample_lines()의 stream 버전: 한 번 읽어 지나가며 줄 k개를 Algorithm L로 고릅니다.
+    반환값: (줄 수, 뽑힌 줄 리스트 - 파일 순서)
+    """
+    reservoir = []   # (줄 번호, 줄)
+    idx = 0
+    while idx < k:
+        line = scanner.readline()
+        if not line:
+            return idx, [l for _, l in reservoir]
+        reservoir.append((idx, line))
+        idx += 1
+
+    w = math.exp(math.log(rng.random()) / k)
+    target = idx + int(math.log(rng.random()) / math.log(1 - w))
+    while True:
+        idx += scanner.skip(target - idx)
+        if idx < target:
+            break
+        line = scanner.readline()
+        if not line:
+            break
+        reservoir[rng.randrange(k)] = (idx, line)
+        idx += 1
+        w *= math.exp(math.log(rng.random()) / k)
+        target += int(math.log(rng.random()) / math.log(1 - w)) + 1
+    return idx, [l for _, l in sorted(reservoir)]
+
+
+def _read_source_smart(source, rng):
+    """압축 파일 안의 CSV(sources.Source)를 stream으로 한 번 읽으며 read_csv_smart()와 같은 규칙으로 샘플링"""
+    import pandas as pd
+    with source.open() as stream:
+        scanner = _LineScanner(stream)
+        header = scanner.readline()
+        if not header:
+            return pd.DataFrame()
+        if not header.endswith(b"\n"):
+            header += b"\n"
+        col_count = len(next(csv.reader([header.decode("utf-8")])))
+        limit_threshold = 100 if col_count <= 10 else 30 if col_count <= 30 else 10
+        row_count, lines = sample_stream_lines(scanner, limit_threshold, rng)
+    sources.report_fallback(source)
+
+    if row_count > limit_threshold:
+        final_count = min(max(int(row_count * 0.01), 1), limit_threshold)
+        keep = sorted(rng.sample(range(len(lines)), final_count))
+        lines = [lines[i] for i in keep]
+    if lines and not lines[-1].endswith(b"\n"):
+        lines[-1] += b"\n"
+    return pd.read_csv(io.BytesIO(header + b"".join(lines)), encoding="utf-8")
+
+
+def read_csv_smart(file_path, encoding='utf-8', seed=None):
     """
     조건에 따라 CSV 파일을 다르게 읽어들이는 함수
+    파일을 memory-map해서 한 번만 지나가며 줄 수를 세고 reservoir sampling으로 샘플을 고릅니다.
     
     Args:
-        file_path (str): CSV 파일 경로
+        file_path (str | sources.Source): CSV 파일 경로 또는 압축 파일 안의 CSV
         encoding (str): 파일 인코딩 (기본: utf-8)
+        seed (int): 난수 seed (기본: SAMPLE_SEED 환경 변수, 없으면 매번 다른 샘플)
         
     Returns:
         pd.DataFrame: 조건에 맞춰 로드된 데이터프레임
     """
-    
-    # 1. 파일의 메타데이터(컬럼 수, 전체 행 수) 파악
-    with open(file_path, 'r', encoding=encoding) as f:
-        # csv reader로 헤더 파싱하여 컬럼 수 확인
-        reader = csv.reader(f)
-        try:
-            header = next(reader)
-            col_count = len(header)
-        except StopIteration:
-            # 빈 파일인 경우
-            return pd.DataFrame()
+    import pandas as pd
+    if seed is None and SAMPLE_SEED is not None:
+        seed = int(SAMPLE_SEED)
+    rng = random.Random(seed)
 
-        # 남은 줄 수를 세어 데이터 행 수 확인 (헤더 제외)
-        row_count = sum(1 for row in f)
-
-    # 2. 조건에 따른 임계값(Threshold) 설정
-    # limit_threshold: 해당 줄 수 이상이면 샘플링을 시작하는 기준이자, 최대 읽기 허용 줄 수
-    if col_count <= 10:
-        limit_threshold = 100
-    elif 10 < col_count <= 30:
-        limit_threshold = 30
-    else:  # col_count > 30
-        limit_threshold = 10
-
-    # 3. 읽기 전략 결정 및 실행
-    if row_count <= limit_threshold:
-        # 기준 줄 수 이하이면 모두 읽기
-        return pd.read_csv(file_path, encoding=encoding)
-    else:
-        # 기준 줄 수 초과이면 1% Random Sampling (단, limit_threshold를 넘지 않음)
-        
-        # 1% 계산 (최소 1줄은 읽도록 설정)
-        target_sample_size = int(row_count * 0.01)
-        if target_sample_size < 1:
-            target_sample_size = 1
-            
-        # 최종 읽을 줄 수는 1%와 limit_threshold 중 작은 값
-        final_count = min(target_sample_size, limit_threshold)
-        
-        # 전체 데이터 인덱스(1 ~ row_count) 중에서 무작위로 final_count 개 선택
-        # 0번 인덱스는 헤더이므로 제외하고 1부터 시작
-        indices_to_keep = set(random.sample(range(1, row_count + 1), final_count))
-        
-        # skiprows에 적용할 함수 정의
-        # x가 0(헤더)이거나, 선택된 인덱스(indices_to_keep)에 포함되면 건너뛰지 않음(False)
-        # 그 외에는 건너뜀(True)
-        def skip_logic(x):
-            if x == 0: 
-                return False # 헤더는 유지
-            return x not in indices_to_keep # 선택되지 않은 행은 스킵
+    if isinstance(file_path, sources.Source):
+        # 압축 파일 member는 utf-8로 변환된 stream으로 읽음
+        return _read_source_smart(file_path, rng)
+
+    if os.path.getsize(file_path) == 0:
+        # 빈 파일인 경우
+        return pd.DataFrame()
+
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # 1. 헤더를 csv reader로 파싱하여 컬럼 수 확인
+        header = _line_at(mm, 0)
+        col_count = len(next(csv.reader([header.decode(encoding)])))
+
+        # 2. 조건에 따른 임계값(Threshold) 설정
+        # limit_threshold: 해당 줄 수 이상이면 샘플링을 시작하는 기준이자, 최대 읽기 허용 줄 수
+        if col_count <= 10:
+            limit_threshold = 100
+        elif 10 < col_count <= 30:
+            limit_threshold = 30
+        else:  # col_count > 30
+            limit_threshold = 10
+
+        # 3. 줄 수를 세면서 limit_threshold개의 후보를 reservoir에 모음
+        row_count, reservoir = sample_lines(mm, len(header), limit_threshold, rng)
+
+        if row_count > limit_threshold:
+            # 기준 줄 수 초과이면 1% Random Sampling (단, limit_threshold를 넘지 않음, 최소 1줄)
+            final_count = min(max(int(row_count * 0.01), 1), limit_threshold)
+            # 균등 표본(reservoir)에서 다시 균등하게 뽑으면 전체에서 균등하게 뽑은 것과 같음
+            reservoir = rng.sample(reservoir, final_count)
+        # 기준 줄 수 이하이면 reservoir에 모든 줄이 들어있음
 
-        return pd.read_csv(file_path, skiprows=skip_logic, encoding=encoding)
+        # 파일 순서를 유지
+        lines = [_line_at(mm, offset) for offset in sorted(reservoir)]
 
+    return pd.read_csv(io.BytesIO(header + b"".join(lines)), encoding=encoding)
 
-def recap_csv_files(directory):
-    # dbname is the directory name
-    milvus_db_name = os.path.basename(os.path.normpath(directory))
-    # ---  Milvus Setup ---
-    connections.connect("default", host=MILVUS_HOST, port=MILVUS_PORT)
-    milvus_col = setup_milvus(milvus_db_name)
+
+def summarize_csv_file(file_path, table_name, months=None):
+    """
+    파일 샘플을 LLM으로 요약합니다. 반환값: (요약, 프롬프트 token 수, 생성 token 수)
+    months가 있으면 table_name은 그 달들의 파일을 합친 series table이고 file_path는 그중 최신 파일입니다.
+    """
+    # Read first 20 lines
+    with metrics.span("recap.sample"):
+        df_sample = read_csv_smart(file_path)
+    #dF_sample = pd.read_csv(file_path, nrows=20)
+    csv_snippet = df_sample.to_string()
+
+    # Request 1: Analysis & Embedding
+
+    if months:
+        prompt1 = f"""{csv_snippet}\n\n {table_name} table의 {months[-1]} 데이터 일부이다.
+            이 table은 {months[0]}부터 {months[-1]}까지 {len(months)}개월의 월별 파일을 월별 partition으로 합친 것이다.
+            table은 무엇을 담고 있는지 100자 내외로 설명하고 포함된 기간을 년월로 표기하라.
+            모든 열의 헤더만 설명없이 나열하라. """
+    else:
+        prompt1 = f"""{csv_snippet}\n\n {table_name} 이름으로된 csv의 일부이다.
+            파일은 무엇을 담고 있는지 100자 내외로 설명하라.
+            파일 이름에 date를 의미하는 부분이 포함될 수 있으니
+            csv 파일 내용과 결부해서 date를 년월일을 구분해서 표기하라.
+            모든 열의 헤더만 설명없이 나열하라. """
+    response = llm_client.generate(RECAP_MODEL, prompt1, purpose="recap")
+    return response['response'], response.get('prompt_eval_count') or 0, response.get('eval_count') or 0
+
+
+def recap_csv_files(directory, incremental=None, batch_size=None, summary_workers=None):
+    """
+    파일별 요약을 summary_workers개의 thread로 만들고, batch_size개씩 모아
+    한 번의 encode()와 한 번의 Milvus insert로 넣습니다.
+    한 batch를 embedding/insert하는 동안 다음 batch의 요약이 계속 진행됩니다.
+    directory는 .tar.gz/.zip/.gz 압축 파일이어도 됩니다 (풀지 않고 stream으로 읽음).
+    """
+    incremental = INCREMENTAL if incremental is None else incremental
+    batch_size = batch_size or RECAP_BATCH_SIZE
+    summary_workers = summary_workers or RECAP_SUMMARY_WORKERS
+    # dbname is the directory name (압축 파일이면 확장자를 뺀 이름)
+    milvus_db_name = sources.dataset_name(directory)
+    archive = sources.is_archive(directory)
+    # ---  Milvus Setup --- (CATALOG_BACKEND=embedded 이면 Milvus 대신 CATALOG_DIR의 파일)
+    store = vector_catalog.open_catalog(milvus_db_name, uri=f"http://{MILVUS_HOST}:{MILVUS_PORT}")
+    # 압축 파일은 member별 mtime/크기를 manifest로 비교할 수 없어서 매번 전체를 요약
+    file_manifest = manifest.Manifest(milvus_db_name, "recap") if incremental and not archive else None
 
     # - --  Processing Files for MILVUS --
-    for filename in os.listdir(directory):
+    # job: (table_name, 요약할 file_path, 지울 이전 요약 이름들, manifest에 기록할 요약 전 파일 상태들, series의 연월 목록)
+    # 요약은 filename으로 지우고 다시 넣으므로 (delete-then-insert) 몇 번을 실행해도 filename당 한 행만 남음
+    jobs = []
+    grouped = {}   # SERIES_MODE: series table -> [(연월, file_path)]
+    if archive:
+        for source in sources.list_sources(directory):
+            jobs.append((source.table_name, source, [source.table_name], [], None))
+    for filename in [] if archive else os.listdir(directory):
         if filename.endswith(".csv"):
             file_path = os.path.join(directory, filename)
             table_name = filename.replace(".csv", "")
-            print(f"{table_name} ============================ ")
+            month_series = series.detect_series(filename) if series.SERIES_MODE else None
+            if month_series:
+                grouped.setdefault(month_series[0], []).append((month_series[1], file_path))
+                continue
+            if file_manifest is not None and file_manifest.check(file_path)[0] == "unchanged":
+                print(f"{table_name}: 변경 없음, 건너뜀")
+                continue
+            states = [manifest.snapshot(file_path)] if file_manifest is not None else []
+            jobs.append((table_name, file_path, [table_name], states, None))
 
-            # Read first 20 lines
-            df_sample = read_csv_smart(file_path)
-            #dF_sample = pd.read_csv(file_path, nrows=20)
-            csv_snippet = df_sample.to_string()
+    # series는 table 하나로 요약: 달이 추가되거나 바뀌면 최신 달 파일로 다시 요약
+    for table_name, files in grouped.items():
+        files.sort()
+        paths = [file_path for _, file_path in files]
+        if file_manifest is not None and all(file_manifest.check(p)[0] == "unchanged" for p in paths):
+            print(f"{table_name}: 변경 없음, 건너뜀")
+            continue
+        # 이전 series 요약과 series mode 전에 파일별로 넣은 요약을 지움
+        replaced = [table_name] + [os.path.basename(p).replace(".csv", "") for p in paths]
+        states = [manifest.snapshot(p) for p in paths] if file_manifest is not None else []
+        jobs.append((table_name, paths[-1], replaced, states, [month for month, _ in files]))
 
-            # Request 1: Analysis & Embedding
+    started = time.time()
+    done = 0
+    prompt_tokens = 0
+    gen_tokens = 0
+    with ThreadPoolExecutor(max_workers=summary_workers) as pool:
+        # 요약은 모두 미리 제출하고 batch 순서대로 결과를 기다림
+        futures = [pool.submit(summarize_csv_file, file_path, table_name, months)
+                   for table_name, file_path, _, _, months in jobs]
 
-            prompt1 = f"""{csv_snippet}\n\n {table_name} 이름으로된 csv의 일부이다.
-                    파일은 무엇을 담고 있는지 100자 내외로 설명하라.
-                    파일 이름에 date를 의미하는 부분이 포함될 수 있으니
-                    csv 파일 내용과 결부해서 date를 년월일을 구분해서 표기하라.
-                    모든 열의 헤더만 설명없이 나열하라. """
-            response1 = ollama.generate(model="exaone3.5:32b", prompt=prompt1)['response']
-            print(f"{response1}")
+        for start in range(0, len(jobs), batch_size):
+            batch = jobs[start:start + batch_size]
+            summaries = []
+            for (table_name, _, _, _, _), future in zip(batch, futures[start:start + batch_size]):
+                response1, n_prompt, n_gen = future.result()
+                print(f"{table_name} ============================ ")
+                print(f"{response1}")
+                summaries.append(response1)
+                prompt_tokens += n_prompt
+                gen_tokens += n_gen
 
             # Vectorize and Insert to Milvus
-            dense_vecs, sparse_vecs = generate_embeddings([response1])
-            entities = [
-                [table_name],
-                dense_vecs,
-                sparse_vecs,
-                [response1]
-            ]
-            milvus_col.insert(entities)
-
-    milvus_col.flush()
-    milvus_col.create_index("dense_vector",
-            {"index_type": "IVF_FLAT", "metric_type": "L2", "params": {"nlist": 128}})
-    milvus_col.create_index("sparse_vector",
-            {"index_type": "SPARSE_INVERTED_INDEX", "metric_type": "IP", "params": {"drop_ratio_build": 0.2}})
-    milvus_col.load()
+            dense_vecs, sparse_vecs = generate_embeddings(summaries)
+
+            # 같은 filename의 이전 요약을 지우고 다시 넣음 (upsert). embedding까지 끝난 뒤에 지우므로
+            # 요약이나 embedding이 실패해도 이전 요약은 남아 있음
+            replaced = [name for _, _, names, _, _ in batch for name in names]
+            if replaced:
+                with metrics.span("catalog.delete"):
+                    store.delete(replaced)
+            with metrics.span("catalog.insert") as sp:
+                store.insert([table_name for table_name, _, _, _, _ in batch], dense_vecs, sparse_vecs, summaries)
+                sp.set(rows=len(batch))
+            if file_manifest is not None:
+                for (_, _, _, states, _), summary in zip(batch, summaries):
+                    for state in states:
+                        file_manifest.record(state, summary=summary)
+                file_manifest.save()
+
+            done += len(batch)
+            elapsed = time.time() - started
+            print(
+                f"[recap {done}/{len(jobs)}] {done / elapsed:.2f} files/s, "
+                f"{gen_tokens / elapsed:.1f} tokens/s (prompt {prompt_tokens}, generated {gen_tokens} tokens)"
+            )
+
+    with metrics.span("catalog.finalize"):
+        store.finalize()
 
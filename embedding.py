@@ -0,0 +1,162 @@
+import os
+import re
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+import metrics
+
+# --- Configuration ---
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3")
+
+_model = None
+_model_lock = threading.Lock()
+_encode_lock = threading.Lock()
+
+
+def get_model():
+    """
+    BGE-M3 모델을 처음 필요할 때 한 번만 읽습니다.
+    FlagEmbedding(torch, transformers)은 여기서 import하므로 embedding을 쓰지 않는 실행은 모델 로딩 비용이 없습니다.
+    """
+    global _model
+    with _model_lock:
+        if _model is None:
+            from FlagEmbedding import BGEM3FlagModel
+            _model = BGEM3FlagModel(EMBEDDING_MODEL, use_fp16=True)
+    return _model
+
+
+def generate_embeddings(texts):
+    model = get_model()
+    # tokenizer는 여러 thread에서 동시에 쓸 수 없으므로 encode는 한 번에 하나씩
+    with _encode_lock, metrics.span("embedding.encode") as sp:
+        # return_dense=True, return_sparse=True, return_colbert_vecs=False
+        output = model.encode(texts, return_dense=True, return_sparse=True)
+        sp.set(rows=len(texts))
+
+    dense_vectors = output['dense_vecs'].astype(np.float32)
+
+    # Milvus용 Sparse 포맷 변환: {단어ID: 가중치} 형태의 Dictionary
+    # BGE-M3의 sparse output은 이미 {id: weight} 형태입니다.
+    sparse_vectors = output['lexical_weights']
+
+    return dense_vectors, sparse_vectors
+
+
+# --- Query embedding cache ---
+# EMBED_CACHE_SIZE: 메모리 LRU 항목 수, EMBED_CACHE_DIR: 지정하면 dense/sparse 벡터를 .npz 파일로도 저장
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "1024"))
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR")
+
+
+def normalize_text(text):
+    """cache key용 정규화: 유니코드 NFKC, 앞뒤 공백 제거, 연속 공백은 하나로"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+
+class EmbeddingCache:
+    """
+    정규화한 문장 -> (dense float32 벡터, sparse {token: weight}) cache.
+    메모리 LRU(maxsize)를 먼저 보고, cache_dir이 있으면 디스크에서 찾습니다.
+    """
+
+    def __init__(self, maxsize=EMBED_CACHE_SIZE, cache_dir=EMBED_CACHE_DIR, model_name=EMBEDDING_MODEL):
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _key(self, text):
+        raw = f"{self.model_name}\x00{normalize_text(text)}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def _remember(self, key, value):
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def get(self, text):
+        key = self._key(text)
+        with self._lock:
+            value = self._lru.get(key)
+            if value is not None:
+                self._lru.move_to_end(key)
+                self.memory_hits += 1
+                return value
+
+        if self.cache_dir and os.path.exists(self._disk_path(key)):
+            with np.load(self._disk_path(key), allow_pickle=False) as data:
+                dense = data["dense"]
+                sparse = {k: float(v) for k, v in zip(data["sparse_keys"].tolist(), data["sparse_values"])}
+            with self._lock:
+                self._remember(key, (dense, sparse))
+                self.disk_hits += 1
+            return dense, sparse
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, text, dense, sparse):
+        key = self._key(text)
+        dense = np.asarray(dense, dtype=np.float32)
+        with self._lock:
+            self._remember(key, (dense, sparse))
+        if self.cache_dir:
+            tmp_path = self._disk_path(key) + ".tmp.npz"
+            np.savez(
+                tmp_path,
+                dense=dense,
+                sparse_keys=np.array([str(k) for k in sparse.keys()]),
+                sparse_values=np.array(list(sparse.values()), dtype=np.float32),
+            )
+            os.replace(tmp_path, self._disk_path(key))
+
+    def encode(self, texts):
+        """generate_embeddings()와 같은 형식을 반환합니다. cache에 없는 문장만 한 번에 encode합니다."""
+        found = [self.get(t) for t in texts]
+        missing = [i for i, v in enumerate(found) if v is None]
+        if missing:
+            dense, sparse = generate_embeddings([texts[i] for i in missing])
+            for j, i in enumerate(missing):
+                found[i] = (dense[j], sparse[j])
+                self.put(texts[i], dense[j], sparse[j])
+        return np.stack([d for d, _ in found]), [s for _, s in found]
+
+    def stats(self):
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+            "size": len(self._lru),
+            "maxsize": self.maxsize,
+        }
+
+
+_query_cache = None
+
+
+def get_query_cache():
+    """검색 질문용 공유 EmbeddingCache"""
+    global _query_cache
+    with _model_lock:
+        if _query_cache is None:
+            _query_cache = EmbeddingCache()
+    return _query_cache
@@ -0,0 +1,330 @@
+import os
+import re
+import json
+import time
+import threading
+from collections import Counter
+
+# --- Configuration ---
+# search.py가 실행한 SQL 기록. INDEX_ADVISOR=1 이거나 QUERY_LOG를 지정했을 때만 기록 (기본은 기록하지 않음)
+QUERY_LOG = os.getenv("QUERY_LOG", os.path.expanduser("~/.cache/csv2mysql/query_log.jsonl")
+                      if os.getenv("INDEX_ADVISOR", "0") == "1" else "")
+# 이보다 커지면 <QUERY_LOG>.1로 옮기고 새로 씀 (이전 .1은 지움)
+QUERY_LOG_MAX_BYTES = int(os.getenv("QUERY_LOG_MAX_BYTES", str(8 << 20)))
+INDEX_REPORT_DIR = os.getenv("INDEX_REPORT_DIR", os.path.expanduser("~/.cache/csv2mysql"))
+INDEX_MAX_PER_TABLE = int(os.getenv("INDEX_MAX_PER_TABLE", "4"))
+INDEX_SAMPLE_ROWS = 100000      # cardinality를 볼 때 읽는 최대 행 수
+INDEX_DISTINCT_RATIO = 0.2      # 샘플에서 distinct 값 비율이 이보다 작은 문자열 column만 (낮은~중간 cardinality)
+INDEX_PREFIX_CHARS = 64         # TEXT나 긴 VARCHAR는 prefix index
+INDEX_MAX_COLUMNS = 3
+INDEX_BENCH_QUERIES = 10        # table마다 측정하는 최근 query 수
+INDEX_BENCH_RUNS = 3
+
+DATE_TYPES = {"date", "datetime", "timestamp"}
+TEXT_TYPES = {"char", "varchar", "tinytext", "text", "mediumtext", "longtext"}
+
+_log_lock = threading.Lock()
+
+SQL_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'")
+IDENTIFIER = re.compile(r"`([^`]+)`|([A-Za-z_가-힣][\w가-힣]*)")
+WHERE_CLAUSE = re.compile(r"\bWHERE\b(.*?)(?=\bGROUP\s+BY\b|\bORDER\s+BY\b|\bHAVING\b|\bLIMIT\b|$)", re.I | re.S)
+GROUP_CLAUSE = re.compile(r"\bGROUP\s+BY\b(.*?)(?=\bORDER\s+BY\b|\bHAVING\b|\bLIMIT\b|$)", re.I | re.S)
+# column 바로 뒤의 연산자로 등호 조건과 범위 조건을 구분
+EQUALITY_OP = re.compile(r"\s*(=|<=>|IN\b)", re.I)
+
+
+# --- Query log ---
+
+def log_query(sql, tables, elapsed_ms, path=QUERY_LOG, max_bytes=QUERY_LOG_MAX_BYTES):
+    """search.py가 실행한 SQL을 JSON Lines로 기록합니다. max_bytes를 넘으면 <path>.1로 rotate합니다."""
+    if not path:
+        return
+    entry = {"ts": time.time(), "sql": sql, "tables": tables, "ms": elapsed_ms}
+    with _log_lock:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if max_bytes and os.path.exists(path) and os.path.getsize(path) >= max_bytes:
+            os.replace(path, path + ".1")
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def read_query_log(path=QUERY_LOG):
+    """rotate된 <path>.1과 현재 기록을 오래된 순서로 읽습니다."""
+    if not path:
+        return []
+    entries = []
+    for p in (path + ".1", path):
+        if not os.path.exists(p):
+            continue
+        with open(p, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue   # 쓰는 도중 끊긴 줄
+    return entries
+
+
+def _identifiers(text, columns):
+    """text에 나오는 column을 (이름, 그 뒤의 text) 순서대로 반환합니다. 문자열 literal 안은 보지 않습니다."""
+    text = SQL_STRING_LITERAL.sub("''", text)
+    lower = {c.lower(): c for c in columns}
+    found = []
+    for m in IDENTIFIER.finditer(text):
+        name = (m.group(1) or m.group(2)).lower()
+        if name in lower:
+            found.append((lower[name], text[m.end():]))
+    return found
+
+
+def predicate_columns(sql, columns):
+    """
+    SQL의 WHERE/GROUP BY에서 table의 column을 찾습니다.
+    반환: (등호 조건 column, 범위 조건 column, GROUP BY column) - 각각 나온 순서, 중복 없음
+    """
+    equality, ranges, group = [], [], []
+    where = WHERE_CLAUSE.search(sql)
+    if where:
+        for name, rest in _identifiers(where.group(1), columns):
+            target = equality if EQUALITY_OP.match(rest) else ranges
+            if name not in equality and name not in ranges:
+                target.append(name)
+    grouped = GROUP_CLAUSE.search(sql)
+    if grouped:
+        for name, _ in _identifiers(grouped.group(1), columns):
+            if name not in group:
+                group.append(name)
+    return equality, ranges, group
+
+
+# --- Advisor ---
+
+def table_columns(cursor, db_name, tables):
+    cursor.execute(
+        "SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = %s ORDER BY TABLE_NAME, ORDINAL_POSITION",
+        (db_name,),
+    )
+    columns = {}
+    for table, column, data_type, max_chars in cursor.fetchall():
+        if tables is None or table in tables:
+            columns.setdefault(table, {})[column] = (data_type.lower(), max_chars)
+    return columns
+
+
+def _existing_indexes(cursor, db_name):
+    cursor.execute(
+        "SELECT TABLE_NAME, INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = %s ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX",
+        (db_name,),
+    )
+    indexes = {}
+    for table, index, column in cursor.fetchall():
+        indexes.setdefault(table, {}).setdefault(index, []).append(column)
+    return indexes
+
+
+def low_cardinality_columns(cursor, table, text_columns):
+    """앞의 INDEX_SAMPLE_ROWS 행에서 distinct 값 비율이 낮은 문자열 column을 (비율, column) 순서로 반환"""
+    if not text_columns:
+        return []
+    quoted = ", ".join(f"`{c}`" for c in text_columns)
+    distinct = ", ".join(f"COUNT(DISTINCT `{c}`)" for c in text_columns)
+    cursor.execute(f"SELECT COUNT(*), {distinct} FROM (SELECT {quoted} FROM `{table}` LIMIT {INDEX_SAMPLE_ROWS}) s")
+    row = cursor.fetchone()
+    total = row[0]
+    if not total:
+        return []
+    ratios = [(count / total, column) for column, count in zip(text_columns, row[1:]) if 1 < count]
+    return sorted((r, c) for r, c in ratios if r <= INDEX_DISTINCT_RATIO)
+
+
+def _covered(candidate, indexes):
+    """candidate가 이미 있는 index(또는 앞서 고른 index)의 앞부분이면 True"""
+    return any(list(candidate) == cols[:len(candidate)] for cols in indexes)
+
+
+def propose_indexes(cursor, db_name, tables=None, log_entries=None):
+    """
+    table별로 만들 index를 제안합니다. 우선순위:
+      1) query log에서 자주 나온 WHERE 조건 (등호 column 먼저, 범위 column 마지막) 과 GROUP BY column
+      2) 날짜 column (DATE/DATETIME, STR_TO_DATE로 로딩한 column)
+      3) distinct 값이 적은~중간인 문자열 column (역 이름, 노선 등)
+    반환: {table: [{"columns": [...], "reason": str}, ...]}
+    """
+    columns = table_columns(cursor, db_name, tables)
+    existing = _existing_indexes(cursor, db_name)
+    log_entries = log_entries or []
+
+    proposals = {}
+    for table, cols in columns.items():
+        used = Counter()
+        for entry in log_entries:
+            if table not in entry.get("tables", []):
+                continue
+            equality, ranges, group = predicate_columns(entry["sql"], cols)
+            key = tuple((equality + ranges[:1])[:INDEX_MAX_COLUMNS])
+            if key:
+                used[key] += 1
+            elif group:
+                used[tuple(group[:INDEX_MAX_COLUMNS])] += 1
+
+        candidates = [(list(key), f"query log: {n} queries") for key, n in used.most_common()]
+        candidates += [([c], "date column") for c, (t, _) in cols.items() if t in DATE_TYPES]
+        text_columns = [c for c, (t, _) in cols.items() if t in TEXT_TYPES]
+        candidates += [([c], f"low cardinality ({ratio:.1%} distinct)")
+                       for ratio, c in low_cardinality_columns(cursor, table, text_columns)]
+
+        chosen = []
+        taken = list(existing.get(table, {}).values())
+        for candidate, reason in candidates:
+            if len(chosen) >= INDEX_MAX_PER_TABLE:
+                break
+            if _covered(candidate, taken):
+                continue
+            chosen.append({"columns": candidate, "reason": reason})
+            taken.append(candidate)
+        if chosen:
+            proposals[table] = chosen
+    return proposals
+
+
+def _key_part(column, column_type):
+    data_type, max_chars = column_type
+    # utf8mb4 index key는 column당 768자까지, 긴 문자열은 앞부분만 index
+    if data_type in TEXT_TYPES and (data_type.endswith("text") or (max_chars or 0) > 191):
+        return f"`{column}`({INDEX_PREFIX_CHARS})"
+    return f"`{column}`"
+
+
+def index_name(columns):
+    name = "ix_" + "_".join(columns)
+    return name[:64]
+
+
+def create_indexes(cursor, db_name, proposals):
+    columns = table_columns(cursor, db_name, set(proposals))
+    created = []
+    for table, indexes in proposals.items():
+        for proposal in indexes:
+            name = index_name(proposal["columns"])
+            parts = ", ".join(_key_part(c, columns[table][c]) for c in proposal["columns"])
+            sql = f"CREATE INDEX `{name}` ON `{table}` ({parts}) ALGORITHM=INPLACE LOCK=NONE"
+            try:
+                start = time.perf_counter()
+                cursor.execute(sql)
+                print(f"🗂  {table}: {name} ({proposal['reason']}) {time.perf_counter() - start:.1f}s")
+                created.append({"table": table, "index": name, **proposal})
+            except Exception as e:
+                print(f"⚠️ {table}: {name} 생성 실패: {e}")
+        cursor.execute(f"ANALYZE TABLE `{table}`")
+        cursor.fetchall()
+    return created
+
+
+# --- Before / after report ---
+
+def _time_query(cursor, sql, runs=INDEX_BENCH_RUNS):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        cursor.execute(sql)
+        cursor.fetchall()
+        times.append((time.perf_counter() - start) * 1000)
+    return sorted(times)[len(times) // 2]
+
+
+def _explain_key(cursor, sql):
+    cursor.execute(f"EXPLAIN {sql}")
+    names = [d[0] for d in cursor.description]
+    keys = [dict(zip(names, row)).get("key") for row in cursor.fetchall()]
+    return ",".join(k for k in keys if k) or None
+
+
+def bench_queries(log_entries, tables, limit=INDEX_BENCH_QUERIES):
+    """tables를 사용하는 최근 query (SQL이 같으면 한 번만)"""
+    seen, queries = set(), []
+    for entry in reversed(log_entries):
+        if entry["sql"] in seen or not set(entry.get("tables", [])) & set(tables):
+            continue
+        seen.add(entry["sql"])
+        queries.append(entry["sql"])
+        if len(queries) >= limit:
+            break
+    return queries
+
+
+def advise(cursor, db_name, tables=None, log_path=QUERY_LOG, apply=True, benchmark=True):
+    """
+    index를 제안하고 (apply=True이면) 만든 뒤, query log의 query로 전후 실행 시간을 비교합니다.
+    cursor는 db_name을 USE한 connection의 cursor여야 합니다.
+    보고서는 INDEX_REPORT_DIR/index_report_<db>.json에 저장합니다.
+    """
+    log_entries = read_query_log(log_path)
+    proposals = propose_indexes(cursor, db_name, tables, log_entries)
+    report = {"database": db_name, "proposals": proposals, "created": [], "queries": []}
+    if not proposals:
+        print("🗂  index advisor: 추가할 index 없음")
+        return report
+
+    if not apply:
+        for table, indexes in proposals.items():
+            for p in indexes:
+                print(f"🗂  {table}: {index_name(p['columns'])} ({p['reason']}) [dry-run]")
+        return report
+
+    queries = bench_queries(log_entries, proposals) if benchmark else []
+    before = {}
+    for sql in queries:
+        try:
+            before[sql] = _time_query(cursor, sql)
+        except Exception as e:
+            print(f"⚠️ 측정 실패 (table이 바뀌었을 수 있음): {e}")
+
+    report["created"] = create_indexes(cursor, db_name, proposals)
+
+    for sql, before_ms in before.items():
+        after_ms = _time_query(cursor, sql)
+        report["queries"].append({
+            "sql": sql,
+            "before_ms": round(before_ms, 2),
+            "after_ms": round(after_ms, 2),
+            "speedup": round(before_ms / after_ms, 2) if after_ms else None,
+            "key": _explain_key(cursor, sql),
+        })
+
+    if report["queries"]:
+        print("\n===== query latency before/after index =====")
+        for q in report["queries"]:
+            sql = " ".join(q["sql"].split())
+            print(f"{q['before_ms']:9.1f}ms -> {q['after_ms']:9.1f}ms  x{q['speedup']}  key={q['key']}  {sql[:80]}")
+
+    os.makedirs(INDEX_REPORT_DIR, exist_ok=True)
+    path = os.path.join(INDEX_REPORT_DIR, f"index_report_{db_name}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"index report: {path}")
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import mysql.connector
+    parser = argparse.ArgumentParser(description="query log와 column 통계로 secondary index를 제안하고 생성")
+    parser.add_argument("database")
+    parser.add_argument("tables", nargs="*", help="대상 table (기본: 전체)")
+    parser.add_argument("--dry-run", action="store_true", help="제안만 출력하고 index를 만들지 않음")
+    parser.add_argument("--no-bench", action="store_true", help="전후 실행 시간을 측정하지 않음")
+    args = parser.parse_args()
+
+    conn = mysql.connector.connect(
+        host=os.getenv("MYSQL_HOST", "localhost"), user=os.getenv("MYSQL_USER", "root"),
+        password=os.getenv("MYSQL_PASSWORD", "_password_"), port=int(os.getenv("MYSQL_PORT", "3306")),
+        database=args.database,
+    )
+    try:
+        cur = conn.cursor()
+        advise(cur, args.database, set(args.tables) or None, apply=not args.dry_run, benchmark=not args.no_bench)
+        cur.close()
+    finally:
+        conn.close()
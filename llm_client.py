@@ -0,0 +1,316 @@
+import os
+import json
+import time
+import random
+import threading
+
+import metrics
+
+# --- Configuration ---
+# csv2mysql(타입 추론), csv2recap(요약), search.py(table 선택, SQL 생성)가 같은 Ollama를 쓰므로
+# process 안에서 HTTP session 하나와 동시 요청 수 한도를 공유합니다.
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+LLM_KEEP_ALIVE = os.getenv("LLM_KEEP_ALIVE", "30m")              # 요청 사이에 모델을 GPU에 남겨 두는 시간
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "2"))         # 동시에 보내는 요청 수 (Ollama OLLAMA_NUM_PARALLEL과 맞춤)
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "600"))  # 차례를 기다리는 최대 시간(초)
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "300"))             # 응답 한 건의 read timeout(초)
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "3"))
+LLM_BACKOFF = float(os.getenv("LLM_BACKOFF", "0.5"))             # 재시도 대기: LLM_BACKOFF * 2^n초 (+ random)
+# LLM_STREAM=1 이면 응답을 stream으로 받아, JSON 답변은 첫 JSON object가 끝나는 순간 연결을 끊음
+LLM_STREAM = os.getenv("LLM_STREAM", "1") == "1"
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class LLMBusy(RuntimeError):
+    """LLM_QUEUE_TIMEOUT 안에 요청 차례가 오지 않음"""
+
+
+class _JSONWatcher:
+    """
+    stream으로 받는 글자를 이어 보면서 첫 top-level JSON object가 닫히는 위치를 찾습니다.
+    문자열 안의 괄호와 escape는 건너뛰고, 닫힌 object가 json.loads로 읽히지 않으면 다음 '{'부터 다시 찾습니다.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.pos = 0
+        self.start = -1
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+
+    def feed(self, chunk):
+        """chunk를 더하고, object가 끝났으면 그 끝 위치(없으면 -1)"""
+        self.text += chunk
+        text = self.text
+        while self.pos < len(text):
+            ch = text[self.pos]
+            self.pos += 1
+            if self.start < 0:
+                if ch == "{":
+                    self.start, self.depth = self.pos - 1, 1
+                continue
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch == "{":
+                self.depth += 1
+            elif ch == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    try:
+                        json.loads(text[self.start:self.pos])
+                        return self.pos
+                    except ValueError:
+                        self.pos = self.start + 1
+                        self.start = -1
+        return -1
+
+
+class LLMClient:
+    """
+    Ollama /api/generate, /api/chat client.
+    - keep-alive HTTP session 하나 (connection pool = 동시 요청 수)
+    - 동시 요청은 concurrency개까지, 나머지는 queue_timeout초까지 차례를 기다림
+    - connection 오류 / timeout / 429·5xx는 backoff 후 재시도
+    - 응답은 ollama library와 같은 dict (response 또는 message, prompt_eval_count, eval_count)
+    """
+
+    def __init__(self, host=OLLAMA_HOST, concurrency=LLM_CONCURRENCY, timeout=LLM_TIMEOUT,
+                 keep_alive=LLM_KEEP_ALIVE, retries=LLM_RETRIES, stream=LLM_STREAM):
+        # ollama library처럼 "localhost:11434" 형식도 허용
+        self.host = (host if "://" in host else f"http://{host}").rstrip("/")
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.retries = retries
+        self.stream = stream
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self._session = None
+        self._lock = threading.Lock()
+        self._stats = {}   # (model, purpose) -> dict
+
+    @property
+    def session(self):
+        # requests는 처음 요청할 때 import
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session = session
+        return self._session
+
+    def generate(self, model, prompt, format=None, options=None, purpose="generate", stop_at_json=None):
+        """
+        ollama.generate()와 같은 형식의 dict를 반환합니다.
+        stop_at_json: 첫 JSON object를 받으면 생성을 멈춤 (기본: format="json"일 때)
+        """
+        payload = {"model": model, "prompt": prompt}
+        if format:
+            payload["format"] = format
+        if stop_at_json is None:
+            stop_at_json = format == "json"
+        return self._call("/api/generate", payload, options, purpose, stop_at_json)
+
+    def chat(self, model, messages, format=None, options=None, purpose="chat", stop_at_json=False):
+        """ollama.chat()과 같은 형식 ({"message": {"role", "content"}, ...})의 dict를 반환합니다."""
+        payload = {"model": model, "messages": messages}
+        if format:
+            payload["format"] = format
+        return self._call("/api/chat", payload, options, purpose, stop_at_json)
+
+    # --- 요청 ---
+    def _call(self, path, payload, options, purpose, stop_at_json):
+        model = payload["model"]
+        payload = dict(payload, stream=self.stream, keep_alive=self.keep_alive)
+        if options:
+            payload["options"] = options
+        kind = "chat" if path == "/api/chat" else "generate"
+
+        attempt = 0
+        while True:
+            with metrics.span(f"llm.{kind}", model=model, purpose=purpose) as sp:
+                waited = self._acquire(model, purpose)
+                sp.set(queue_s=round(waited, 3))
+                t0 = time.perf_counter()
+                try:
+                    data = self._post(path, payload, stop_at_json)
+                except Exception as e:
+                    retry = attempt < self.retries and self._retryable(e)
+                    self._record(model, purpose, waited, time.perf_counter() - t0, None, error=not retry, retry=retry)
+                    if not retry:
+                        raise
+                    error = e
+                else:
+                    seconds = time.perf_counter() - t0
+                    data["latency_s"] = round(seconds, 3)
+                    self._record(model, purpose, waited, seconds, data)
+                    break
+                finally:
+                    self._slots.release()
+            attempt += 1
+            delay = LLM_BACKOFF * (2 ** (attempt - 1)) * (0.5 + random.random())
+            print(f"⚠️ LLM {kind} {model} 실패 ({type(error).__name__}: {error}), {delay:.1f}초 후 재시도 {attempt}/{self.retries}")
+            metrics.count("llm.retries", model=model, purpose=purpose)
+            time.sleep(delay)
+
+        metrics.llm_tokens(data, model=model, purpose=purpose)
+        return data
+
+    def _acquire(self, model, purpose):
+        t0 = time.perf_counter()
+        if not self._slots.acquire(timeout=LLM_QUEUE_TIMEOUT):
+            metrics.count("llm.busy", model=model, purpose=purpose)
+            raise LLMBusy(f"LLM 요청이 {LLM_QUEUE_TIMEOUT}초 동안 차례를 기다림 (LLM_CONCURRENCY={self.concurrency})")
+        return time.perf_counter() - t0
+
+    @staticmethod
+    def _retryable(error):
+        import requests
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return True
+        response = getattr(error, "response", None)
+        return isinstance(error, requests.HTTPError) and response is not None and response.status_code in RETRY_STATUS
+
+    def _post(self, path, payload, stop_at_json):
+        t0 = time.perf_counter()
+        # (connect, read) timeout: read는 stream chunk 사이의 최대 간격
+        r = self.session.post(self.host + path, json=payload, timeout=(10, self.timeout), stream=payload["stream"])
+        try:
+            r.raise_for_status()
+            if not payload["stream"]:
+                return r.json()
+            return self._read_stream(r, path == "/api/chat", stop_at_json, t0)
+        finally:
+            r.close()
+
+    @staticmethod
+    def _read_stream(r, is_chat, stop_at_json, t0):
+        """
+        NDJSON chunk들을 이어 붙여 stream=False 응답과 같은 dict를 만듭니다.
+        stop_at_json이면 첫 JSON object가 닫히는 순간 읽기를 멈추고 연결을 닫아 Ollama가 생성을 그만두게 합니다.
+        이때 eval_count는 받은 chunk 수(대략 token 수)이고 prompt_eval_count는 알 수 없습니다.
+        first_token_s는 요청을 보낸 때부터 첫 글자를 받을 때까지의 시간입니다.
+        """
+        watcher = _JSONWatcher() if stop_at_json else None
+        parts = []
+        chunks = 0
+        first_token_s = None
+        last = {}
+        for line in r.iter_lines():
+            if not line:
+                continue
+            last = json.loads(line)
+            if last.get("error"):
+                raise RuntimeError(f"Ollama error: {last['error']}")
+            piece = (last.get("message") or {}).get("content", "") if is_chat else last.get("response", "")
+            if piece:
+                chunks += 1
+                if first_token_s is None:
+                    first_token_s = time.perf_counter() - t0
+                parts.append(piece)
+                if watcher is not None and not last.get("done"):
+                    end = watcher.feed(piece)
+                    if end >= 0:
+                        # 닫는 괄호 뒤에 같은 chunk로 온 글자는 버림
+                        parts = [watcher.text[:end]]
+                        last = {"model": last.get("model"), "done": True, "done_reason": "json_complete",
+                                "eval_count": chunks}
+                        break
+            if last.get("done"):
+                break
+
+        text = "".join(parts)
+        data = {k: v for k, v in last.items() if k not in ("message", "response")}
+        if is_chat:
+            data["message"] = {"role": "assistant", "content": text}
+        else:
+            data["response"] = text
+        data.setdefault("eval_count", chunks)
+        data["first_token_s"] = round(first_token_s, 3) if first_token_s is not None else None
+        return data
+
+    # --- 통계 ---
+    def _record(self, model, purpose, waited, seconds, data, error=False, retry=False):
+        with self._lock:
+            s = self._stats.setdefault((model, purpose), {
+                "calls": 0, "errors": 0, "retries": 0, "early_stops": 0, "total_s": 0.0, "max_s": 0.0,
+                "queue_s": 0.0, "first_token_s": 0.0, "prompt_tokens": 0, "generated_tokens": 0,
+            })
+            s["queue_s"] += waited
+            if retry:
+                s["retries"] += 1
+                return
+            s["calls"] += 1
+            s["total_s"] += seconds
+            s["max_s"] = max(s["max_s"], seconds)
+            if error:
+                s["errors"] += 1
+                return
+            s["prompt_tokens"] += data.get("prompt_eval_count") or 0
+            s["generated_tokens"] += data.get("eval_count") or 0
+            s["first_token_s"] += data.get("first_token_s") or 0.0
+            if data.get("done_reason") == "json_complete":
+                s["early_stops"] += 1
+        if data is not None and data.get("done_reason") == "json_complete":
+            metrics.count("llm.early_stops", model=model, purpose=purpose)
+
+    def stats(self):
+        """model/purpose별 호출 수, 평균/최대 시간, 평균 대기 시간, 첫 token 시간, token 수, 재시도/조기 종료 수"""
+        with self._lock:
+            out = []
+            for (model, purpose), s in sorted(self._stats.items()):
+                calls = s["calls"] or 1
+                out.append({
+                    "model": model, "purpose": purpose, "calls": s["calls"], "errors": s["errors"],
+                    "retries": s["retries"], "early_stops": s["early_stops"],
+                    "avg_s": round(s["total_s"] / calls, 3), "max_s": round(s["max_s"], 3),
+                    "avg_queue_s": round(s["queue_s"] / calls, 3),
+                    "avg_first_token_s": round(s["first_token_s"] / calls, 3),
+                    "prompt_tokens": s["prompt_tokens"], "generated_tokens": s["generated_tokens"],
+                    "tokens_per_s": round(s["generated_tokens"] / s["total_s"], 1) if s["total_s"] else None,
+                })
+        return out
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(host=None, timeout=None):
+    """host(기본 OLLAMA_HOST)와 timeout(기본 LLM_TIMEOUT)별로 하나씩 공유하는 LLMClient"""
+    host = host or OLLAMA_HOST
+    timeout = timeout or LLM_TIMEOUT
+    with _clients_lock:
+        client = _clients.get((host, timeout))
+        if client is None:
+            client = _clients[(host, timeout)] = LLMClient(host, timeout=timeout)
+        return client
+
+
+def generate(model, prompt, **kwargs):
+    """get_client().generate(): ollama.generate() 대신 사용"""
+    return get_client().generate(model, prompt, **kwargs)
+
+
+def chat(model, messages, **kwargs):
+    return get_client().chat(model, messages, **kwargs)
+
+
+def stats():
+    """모든 client의 통계"""
+    with _clients_lock:
+        clients = list(_clients.values())
+    return [dict(s, host=c.host) for c in clients for s in c.stats()]
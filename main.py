@@ -3,6 +3,7 @@ import csv2mysql
 
 # --- Configuration ---
 DIRECTORY_PATH = "/var/lib/mysql-files/seoul_transport"  
+# DIRECTORY_PATH can also be an archive such as "seoul_transport.tar.gz"; its CSVs are streamed through LOAD DATA LOCAL INFILE.
 # "LOAD DATA LOCAL INFILE" makes it easy to change the dirctory. But it doesn't check an error truncation of VARCHAR. 
 # "LOAD DATA INFILE" needs "/var/lib/mysql-files".
 
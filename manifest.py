@@ -0,0 +1,114 @@
+import os
+import json
+import hashlib
+import threading
+
+# --- Configuration ---
+MANIFEST_DIR = os.getenv("MANIFEST_DIR", os.path.expanduser("~/.cache/csv2mysql"))
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def hash_file(path, size=None):
+    """
+    파일 앞부분 size byte(기본: 전체)의 sha256과 줄 수, 마지막 byte를 반환합니다.
+    줄 수는 LOAD DATA ... IGNORE n LINES로 이어서 로딩할 때 사용합니다.
+    """
+    h = hashlib.sha256()
+    lines = 0
+    last = b""
+    remaining = os.path.getsize(path) if size is None else size
+    with open(path, "rb") as f:
+        while remaining > 0:
+            block = f.read(min(HASH_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            h.update(block)
+            lines += block.count(b"\n")
+            last = block[-1:]
+            remaining -= len(block)
+    return h.hexdigest(), lines, last
+
+
+def snapshot(path):
+    """
+    파일의 현재 size, mtime, sha256, 줄 수, 마지막 byte. 처리를 시작하기 전에 구해서 record()에 넘깁니다
+    (처리하는 동안 추가된 행이 처리한 것으로 기록되지 않도록).
+    """
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    sha256, lines, last = hash_file(path, st.st_size)
+    return {
+        "path": path,
+        "size": st.st_size,
+        "mtime": st.st_mtime,
+        "sha256": sha256,
+        "lines": lines,
+        "last_byte": last.decode("latin-1"),
+    }
+
+
+class Manifest:
+    """
+    단계(stage: "mysql", "recap")별로 이미 처리한 파일의 path, size, mtime, sha256, 줄 수와
+    그때 사용한 schema/summary를 JSON 파일에 기록합니다.
+    단계마다 파일이 따로 있으므로(manifest_<name>.<stage>.json) 두 단계를 동시에 실행해도 서로의 기록을 덮어쓰지 않습니다.
+    """
+
+    def __init__(self, name, stage, manifest_dir=MANIFEST_DIR):
+        os.makedirs(manifest_dir, exist_ok=True)
+        self.stage = stage
+        self.path = os.path.join(manifest_dir, f"manifest_{name}.{stage}.json")
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def get(self, path):
+        return self.entries.get(os.path.abspath(path))
+
+    def check(self, path):
+        """
+        이전 기록과 비교한 파일 상태를 (status, entry)로 반환합니다.
+        status: "new", "unchanged", "appended"(이전 내용 뒤에 행만 추가됨), "changed"
+        size와 mtime이 같으면 hash를 계산하지 않습니다.
+        """
+        entry = self.get(path)
+        if entry is None:
+            return "new", None
+
+        st = os.stat(path)
+        if st.st_size == entry["size"] and st.st_mtime == entry["mtime"]:
+            return "unchanged", entry
+
+        if st.st_size > entry["size"] and entry.get("last_byte") == "\n":
+            prefix_hash, _, _ = hash_file(path, entry["size"])
+            if prefix_hash == entry["sha256"]:
+                return "appended", entry
+
+        if st.st_size == entry["size"]:
+            # touch만 된 경우: 내용이 같으면 mtime만 갱신
+            sha256, _, _ = hash_file(path)
+            if sha256 == entry["sha256"]:
+                with self._lock:
+                    entry["mtime"] = st.st_mtime
+                return "unchanged", entry
+        return "changed", entry
+
+    def record(self, state, **extra):
+        """
+        처리가 끝난 파일을 기록합니다. state는 처리 전에 구한 snapshot(path)이고
+        extra에는 schema, summary 등을 넣습니다.
+        """
+        entry = dict(state, **extra)
+        with self._lock:
+            self.entries[entry["path"]] = entry
+        return entry
+
+    def save(self):
+        with self._lock:
+            # 임시 파일에 쓰고 rename (같은 단계를 다른 process가 저장하는 중이어도 파일이 깨지지 않음)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,202 @@
+import os
+import json
+import time
+import atexit
+import threading
+
+# --- Configuration ---
+# METRICS=1 이면 단계별 시간(span)과 counter를 모아 METRICS_REPORT(JSONL)에 기록하고,
+# METRICS_PROM을 지정하면 끝날 때 Prometheus text 형식으로도 저장. 끄면 span()은 아무것도 하지 않는 객체를 돌려줌
+METRICS = os.getenv("METRICS", "0") == "1"
+METRICS_REPORT = os.getenv("METRICS_REPORT", "metrics.jsonl")
+METRICS_PROM = os.getenv("METRICS_PROM")
+METRICS_PREFIX = "csv2mysql"
+
+enabled = False
+_lock = threading.Lock()
+_timings = {}    # (name, labels) -> [count, total 초, max 초, rows, errors]
+_counters = {}   # (name, labels) -> 값
+_report = None
+_report_path = None
+_prom_path = None
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class _Span:
+    """with metrics.span("mysql.load_data", table=...) as sp: ...; sp.set(rows=n)"""
+    __slots__ = ("name", "labels", "attrs", "started", "t0")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.attrs = {}
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _record(self, time.perf_counter() - self.t0, exc_type is not None)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name, **labels):
+    """시간을 재는 context manager. 꺼져 있으면 공유하는 빈 객체를 돌려주므로 비용이 거의 없습니다."""
+    if not enabled:
+        return _NOOP
+    return _Span(name, labels)
+
+
+def count(name, value=1, **labels):
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def llm_tokens(response, **labels):
+    """Ollama 응답의 prompt_eval_count / eval_count를 token counter에 더합니다."""
+    if not enabled:
+        return
+    count("llm.prompt_tokens", response.get("prompt_eval_count") or 0, **labels)
+    count("llm.generated_tokens", response.get("eval_count") or 0, **labels)
+
+
+def _record(sp, seconds, error):
+    rows = sp.attrs.get("rows")
+    key = _key(sp.name, sp.labels)
+    with _lock:
+        t = _timings.setdefault(key, [0, 0.0, 0.0, 0, 0])
+        t[0] += 1
+        t[1] += seconds
+        t[2] = max(t[2], seconds)
+        t[3] += rows or 0
+        t[4] += int(error)
+        if _report is not None:
+            event = {"type": "span", "name": sp.name, "labels": sp.labels, "start": round(sp.started, 3),
+                     "seconds": round(seconds, 6), "error": error}
+            if sp.attrs:
+                event["attrs"] = sp.attrs
+                if rows and seconds > 0:
+                    event["rows_per_s"] = round(rows / seconds, 1)
+            _report.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+
+
+def summary():
+    """span 이름/label별 횟수, 합계/최대 시간, 행 수(rows/s)와 counter 값"""
+    with _lock:
+        spans = []
+        for (name, labels), (n, total, longest, rows, errors) in sorted(_timings.items()):
+            entry = {"name": name, "labels": dict(labels), "count": n, "total_s": round(total, 6),
+                     "max_s": round(longest, 6), "errors": errors}
+            if rows:
+                entry["rows"] = rows
+                entry["rows_per_s"] = round(rows / total, 1) if total > 0 else None
+            spans.append(entry)
+        counters = [{"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(_counters.items())]
+    return {"spans": spans, "counters": counters}
+
+
+def _metric_name(name, suffix):
+    return f"{METRICS_PREFIX}_{name.replace('.', '_').replace('-', '_')}_{suffix}"
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    escaped = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                       for k, v in sorted(labels.items()))
+    return "{" + escaped + "}"
+
+
+def prometheus_text():
+    """summary()를 Prometheus text exposition 형식으로 (span은 _seconds_sum / _seconds_count / _rows_total)"""
+    data = summary()
+    lines = []
+    typed = set()
+    for s in data["spans"]:
+        labels = _label_text(s["labels"])
+        base = _metric_name(s["name"], "seconds")
+        if base not in typed:
+            typed.add(base)
+            lines.append(f"# TYPE {base} summary")
+        lines.append(f"{base}_sum{labels} {s['total_s']}")
+        lines.append(f"{base}_count{labels} {s['count']}")
+        if s.get("rows"):
+            lines.append(f"{_metric_name(s['name'], 'rows_total')}{labels} {s['rows']}")
+        if s["errors"]:
+            lines.append(f"{_metric_name(s['name'], 'errors_total')}{labels} {s['errors']}")
+    for c in data["counters"]:
+        name = _metric_name(c["name"], "total")
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_label_text(c['labels'])} {c['value']}")
+    return "\n".join(lines) + "\n"
+
+
+def flush():
+    """summary를 report 끝에 한 줄로 쓰고 METRICS_PROM 파일을 갱신합니다. 프로그램이 끝날 때 자동으로 호출됩니다."""
+    if not enabled:
+        return
+    line = json.dumps(dict(summary(), type="summary", time=round(time.time(), 3)), ensure_ascii=False)
+    with _lock:
+        if _report is not None:
+            _report.write(line + "\n")
+            _report.flush()
+    if _prom_path:
+        tmp_path = _prom_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(prometheus_text())
+        os.replace(tmp_path, _prom_path)
+
+
+def enable(report_path=METRICS_REPORT, prom_path=METRICS_PROM):
+    """수집을 켭니다. report_path가 None이면 JSONL은 쓰지 않고 메모리에만 모읍니다 (summary / prometheus_text)."""
+    global enabled, _report, _report_path, _prom_path
+    with _lock:
+        if report_path and report_path != _report_path:
+            if _report is not None:
+                _report.close()
+            _report = open(report_path, "a", encoding="utf-8", buffering=1)
+            _report_path = report_path
+        _prom_path = prom_path
+        first = not enabled
+        enabled = True
+    if first:
+        atexit.register(flush)
+
+
+def reset():
+    with _lock:
+        _timings.clear()
+        _counters.clear()
+
+
+if METRICS:
+    enable()
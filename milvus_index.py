@@ -0,0 +1,85 @@
+import os
+import math
+
+# --- Configuration ---
+# dense_vector index는 collection 크기로 정함: MILVUS_FLAT_MAX개 이하는 FLAT(전체 비교, 정확),
+# MILVUS_HNSW_MIN개 이상은 HNSW, 그 사이는 IVF_FLAT (nlist = 4 * sqrt(행 수))
+MILVUS_FLAT_MAX = int(os.getenv("MILVUS_FLAT_MAX", "20000"))
+MILVUS_HNSW_MIN = int(os.getenv("MILVUS_HNSW_MIN", "1000000"))
+MILVUS_NPROBE = int(os.getenv("MILVUS_NPROBE", "0"))   # 0이면 nlist / 16 (최소 8)
+MILVUS_HNSW_EF = int(os.getenv("MILVUS_HNSW_EF", "64"))
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+
+DENSE_FIELD = "dense_vector"
+SPARSE_FIELD = "sparse_vector"
+DENSE_METRIC = "L2"
+SPARSE_INDEX = {"index_type": "SPARSE_INVERTED_INDEX", "metric_type": "IP", "params": {"drop_ratio_build": 0.2}}
+
+
+def choose_dense_index(num_rows):
+    """행 수에 맞는 dense index 설정"""
+    if num_rows <= MILVUS_FLAT_MAX:
+        return {"index_type": "FLAT", "metric_type": DENSE_METRIC, "params": {}}
+    if num_rows < MILVUS_HNSW_MIN:
+        nlist = min(max(int(4 * math.sqrt(num_rows)), 64), 65536)
+        return {"index_type": "IVF_FLAT", "metric_type": DENSE_METRIC, "params": {"nlist": nlist}}
+    return {"index_type": "HNSW", "metric_type": DENSE_METRIC,
+            "params": {"M": HNSW_M, "efConstruction": HNSW_EF_CONSTRUCTION}}
+
+
+def dense_search_params(index_type, index_params=None, limit=10):
+    """MilvusHybridSearcher의 AnnSearchRequest param: index 종류에 맞는 nprobe / ef"""
+    index_params = index_params or {}
+    if index_type == "IVF_FLAT":
+        nlist = int(index_params.get("nlist", 128))
+        nprobe = MILVUS_NPROBE or max(8, nlist // 16)
+        return {"metric_type": DENSE_METRIC, "params": {"nprobe": min(nprobe, nlist)}}
+    if index_type == "HNSW":
+        return {"metric_type": DENSE_METRIC, "params": {"ef": max(MILVUS_HNSW_EF, limit)}}
+    return {"metric_type": DENSE_METRIC, "params": {}}
+
+
+def _field_indexes(collection):
+    """field 이름 -> (index 이름, index params)"""
+    found = {}
+    for index in collection.indexes:
+        found[index.field_name] = (index.index_name, dict(index.params))
+    return found
+
+
+def ensure_indexes(collection):
+    """
+    index가 없을 때만 만들고, 행 수가 늘어 dense index 종류(FLAT -> IVF_FLAT -> HNSW)가 바뀌어야 할 때만 다시 만듭니다.
+    collection은 아직 load되지 않았으면 load합니다. 반환: dense index 설정
+    """
+    from pymilvus import utility
+    existing = _field_indexes(collection)
+    wanted = choose_dense_index(collection.num_entities)
+
+    current = existing.get(DENSE_FIELD)
+    if current is not None and current[1].get("index_type") != wanted["index_type"]:
+        print(f"🔁 {collection.name}: {collection.num_entities} rows, dense index "
+              f"{current[1].get('index_type')} -> {wanted['index_type']}")
+        collection.release()
+        collection.drop_index(index_name=current[0])
+        current = None
+    if current is None:
+        collection.create_index(DENSE_FIELD, wanted)
+        print(f"🧭 {collection.name}: dense index {wanted['index_type']} {wanted['params']}")
+    if SPARSE_FIELD not in existing:
+        collection.create_index(SPARSE_FIELD, SPARSE_INDEX)
+
+    state = utility.load_state(collection.name)
+    if getattr(state, "name", str(state)) != "Loaded":
+        collection.load()
+    return wanted if current is None else current[1]
+
+
+def describe_dense_index(client, collection_name):
+    """MilvusClient로 dense_vector index의 (종류, params)를 읽습니다. index가 없으면 ("FLAT", {})."""
+    for index_name in client.list_indexes(collection_name, field_name=DENSE_FIELD):
+        info = client.describe_index(collection_name, index_name)
+        params = info.get("params") or info
+        return info.get("index_type", "FLAT"), params
+    return "FLAT", {}
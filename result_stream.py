@@ -0,0 +1,201 @@
+import os
+import csv
+import json
+import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# --- Configuration ---
+RESULT_CHUNK_ROWS = int(os.getenv("RESULT_CHUNK_ROWS", "5000"))   # fetchmany() 한 번에 읽는 행 수
+RESULT_MAX_ROWS = int(os.getenv("RESULT_MAX_ROWS", "0")) or None   # 0이면 제한 없음
+RESULT_MAX_BYTES = int(os.getenv("RESULT_MAX_BYTES", "0")) or None
+
+
+def _row_bytes(rows: List[Tuple]) -> int:
+    """결과 크기 추정: 문자열/byte 값은 길이, 나머지 값은 8 byte로 계산"""
+    return sum(
+        len(v) if isinstance(v, (str, bytes, bytearray)) else 8
+        for row in rows for v in row if v is not None
+    )
+
+
+class ResultStream:
+    """
+    SELECT 결과를 unbuffered cursor에서 chunk_size 행씩 읽어 tuple list로 돌려줍니다.
+    결과 전체를 메모리에 올리지 않으며, max_rows/max_bytes를 넘으면 서버의 query를 중단하고 truncated=True가 됩니다.
+    한 번만 iterate할 수 있습니다.
+    """
+
+    def __init__(self, mysql, sql: str, chunk_size: int = RESULT_CHUNK_ROWS,
+                 max_rows: Optional[int] = RESULT_MAX_ROWS, max_bytes: Optional[int] = RESULT_MAX_BYTES):
+        self.mysql = mysql
+        self.sql = sql
+        self.chunk_size = chunk_size
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.columns: List[str] = []
+        self.field_types: List[int] = []
+        self.rows = 0
+        self.bytes = 0
+        self.truncated = False
+
+    def _cap(self, rows: List[Tuple]) -> Tuple[List[Tuple], bool]:
+        stop = False
+        if self.max_rows is not None and self.rows + len(rows) > self.max_rows:
+            rows = rows[:self.max_rows - self.rows]
+            stop = True
+        size = _row_bytes(rows)
+        if self.max_bytes is not None and self.bytes + size > self.max_bytes:
+            # 한도를 넘기 직전 행까지만 남김
+            keep = 0
+            for row in rows:
+                row_size = _row_bytes([row])
+                if self.bytes + row_size > self.max_bytes:
+                    break
+                self.bytes += row_size
+                keep += 1
+            rows = rows[:keep]
+            stop = True
+        else:
+            self.bytes += size
+        self.rows += len(rows)
+        return rows, stop
+
+    def __iter__(self) -> Iterator[List[Tuple]]:
+        with self.mysql.connection() as conn:
+            cur = conn.cursor(buffered=False)
+            try:
+                cur.execute(self.sql)
+                self.columns = [d[0] for d in cur.description]
+                self.field_types = [d[1] for d in cur.description]
+                while True:
+                    rows = cur.fetchmany(self.chunk_size)
+                    if not rows:
+                        break
+                    rows, stop = self._cap(rows)
+                    if rows:
+                        yield rows
+                    if stop:
+                        self.truncated = True
+                        print(f"⚠️ result cap reached (rows={self.rows}, bytes={self.bytes}), query stopped")
+                        break
+            finally:
+                # 다 읽지 않고 멈춘 경우 (cap, 호출한 쪽의 break/오류)
+                if conn.unread_result:
+                    self.mysql.cancel(conn)
+                cur.close()
+
+    def dicts(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        앞의 limit 행만 dict로 만들어 반환하고 나머지는 세기만 합니다 (전체 행 수는 self.rows).
+        limit=None이면 모든 행을 dict로 만듭니다.
+        """
+        out: List[Dict[str, Any]] = []
+        for rows in self:
+            if limit is None or len(out) < limit:
+                take = rows if limit is None else rows[:limit - len(out)]
+                out.extend(dict(zip(self.columns, row)) for row in take)
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {"rows": self.rows, "bytes": self.bytes, "truncated": self.truncated}
+
+
+# --- Export ---
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8", errors="replace")
+    return str(value)
+
+
+def write_csv(stream: ResultStream, path: str, encoding: str = "utf-8") -> Dict[str, Any]:
+    with open(path, "w", encoding=encoding, newline="") as f:
+        writer = csv.writer(f)
+        header = False
+        for rows in stream:
+            if not header:
+                writer.writerow(stream.columns)
+                header = True
+            writer.writerows(rows)
+        if not header:
+            writer.writerow(stream.columns)
+    return stream.stats()
+
+
+def write_jsonl(stream: ResultStream, path: str) -> Dict[str, Any]:
+    with open(path, "w", encoding="utf-8") as f:
+        for rows in stream:
+            for row in rows:
+                f.write(json.dumps(dict(zip(stream.columns, row)), ensure_ascii=False, default=_json_default))
+                f.write("\n")
+    return stream.stats()
+
+
+def _column_kinds(field_types: List[int]) -> List[str]:
+    from mysql.connector.constants import FieldType
+    ints = {FieldType.TINY, FieldType.SHORT, FieldType.LONG, FieldType.LONGLONG, FieldType.INT24, FieldType.YEAR}
+    floats = {FieldType.DECIMAL, FieldType.NEWDECIMAL, FieldType.FLOAT, FieldType.DOUBLE}
+    return ["int" if t in ints else "float" if t in floats else "str" for t in field_types]
+
+
+def _to_array(values: Tuple, kind: str) -> np.ndarray:
+    if kind == "int":
+        if None not in values:
+            return np.array(values, dtype=np.int64)
+        kind = "float"   # NULL이 있는 정수 column은 NaN을 쓰기 위해 float64
+    if kind == "float":
+        return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+    return np.array([v if v is None or isinstance(v, str) else _json_default(v) for v in values], dtype=object)
+
+
+def column_batches(stream: ResultStream) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    chunk마다 {column: numpy 배열}을 돌려줍니다.
+    정수는 int64 (NULL이 있으면 float64 + NaN), DECIMAL/FLOAT/DOUBLE은 float64, 나머지는 문자열 object 배열.
+    """
+    kinds = None
+    for rows in stream:
+        if kinds is None:
+            kinds = _column_kinds(stream.field_types)
+        columns = list(zip(*rows))
+        yield {name: _to_array(values, kind) for name, values, kind in zip(stream.columns, columns, kinds)}
+
+
+def to_columns(stream: ResultStream) -> Dict[str, np.ndarray]:
+    """column_batches()를 column별로 이어 붙입니다."""
+    parts: Dict[str, List[np.ndarray]] = {}
+    for batch in column_batches(stream):
+        for name, arr in batch.items():
+            parts.setdefault(name, []).append(arr)
+    if not parts:
+        return {name: np.array([], dtype=object) for name in stream.columns}
+    # 한 chunk에만 NULL이 있으면 int64와 float64가 섞이므로 concatenate가 float64로 맞춤
+    return {name: np.concatenate(arrs) for name, arrs in parts.items()}
+
+
+def write_npz(stream: ResultStream, path: str) -> Dict[str, Any]:
+    columns = to_columns(stream)
+    # object 배열은 pickle 없이 읽을 수 있도록 unicode 배열로 저장 (NULL은 빈 문자열)
+    np.savez(path, **{
+        name: np.array(["" if v is None else v for v in arr], dtype=str) if arr.dtype == object else arr
+        for name, arr in columns.items()
+    })
+    return stream.stats()
+
+
+EXPORTERS = {".csv": write_csv, ".jsonl": write_jsonl, ".npz": write_npz}
+
+
+def export(stream: ResultStream, path: str) -> Dict[str, Any]:
+    """확장자(.csv, .jsonl, .npz)에 맞는 형식으로 결과를 파일에 씁니다."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in EXPORTERS:
+        raise ValueError(f"unsupported export format '{ext}' (use {', '.join(EXPORTERS)})")
+    return EXPORTERS[ext](stream, path)
@@ -0,0 +1,248 @@
+import os
+import re
+import json
+from decimal import Decimal
+
+import index_advisor
+import series
+
+# --- Configuration ---
+# ROLLUP=1 이면 로딩한 table마다 기간(일/월) x 차원 column별 합계를 미리 계산한 rollup table을 만들고 갱신
+ROLLUP = os.getenv("ROLLUP", "0") == "1"
+# 선언한 rollup 목록 (JSON 파일). 없는 table은 column 이름과 cardinality로 제안
+ROLLUP_CONFIG = os.getenv("ROLLUP_CONFIG")
+ROLLUP_MAX_DIMENSIONS = 2
+ROLLUP_SUFFIX = "__rollup_"
+REGISTRY_TABLE = "_rollups"
+
+NUMERIC_TYPES = {"tinyint", "smallint", "mediumint", "int", "bigint", "decimal", "float", "double"}
+MEASURE_PATTERN = re.compile(r"(승객수|인원|건수|금액|수량|count|total|amount|qty)", re.I)
+PERIOD_PATTERN = re.compile(r"(년월|연월|일자|날짜|date|month)", re.I)
+
+# ROLLUP_CONFIG 예:
+# [{"source": "CARD_SUBWAY_MONTH", "period_column": "사용일자", "grain": "month",
+#   "dimensions": ["역명"], "measures": ["승차총승객수", "하차총승객수"]}]
+
+
+def rollup_name(source, grain):
+    return f"{source}{ROLLUP_SUFFIX}{grain}"[:64]
+
+
+def load_declared(path=ROLLUP_CONFIG):
+    """ROLLUP_CONFIG의 rollup 정의를 source table별로 반환합니다."""
+    if not path:
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        definitions = json.load(f)
+    declared = {}
+    for d in definitions:
+        d = dict(d, grain=d.get("grain", "month"), dimensions=d.get("dimensions", []))
+        d.setdefault("name", rollup_name(d["source"], d["grain"]))
+        declared.setdefault(d["source"], []).append(d)
+    return declared
+
+
+def suggest_rollups(cursor, db_name, table):
+    """
+    column으로 rollup을 제안합니다.
+      measure: 이름이 승객수/인원/건수/금액 등인 숫자 column
+      기간: 첫 번째 날짜 column (일/월 rollup 두 개) 또는 series_month/연월 column
+      차원: distinct 값이 적은 문자열 column 최대 ROLLUP_MAX_DIMENSIONS개 (노선명, 역명 등)
+    """
+    columns = index_advisor.table_columns(cursor, db_name, {table}).get(table, {})
+    measures = [c for c, (t, _) in columns.items() if t in NUMERIC_TYPES and MEASURE_PATTERN.search(c)]
+    if not measures:
+        return []
+
+    period = next((c for c, (t, _) in columns.items() if t in index_advisor.DATE_TYPES), None)
+    grains = ["day", "month"] if period else ["raw"]
+    if period is None:
+        period = series.MONTH_COLUMN if series.MONTH_COLUMN in columns else next(
+            (c for c, (t, _) in columns.items() if t not in NUMERIC_TYPES and PERIOD_PATTERN.search(c)), None)
+        if period is None:
+            return []
+
+    text_columns = [c for c, (t, _) in columns.items() if t in index_advisor.TEXT_TYPES and c != period]
+    dimensions = [c for _, c in index_advisor.low_cardinality_columns(cursor, table, text_columns)]
+    # 원래 column 순서 유지 (노선명, 역명)
+    dimensions = [c for c in columns if c in dimensions[:ROLLUP_MAX_DIMENSIONS]]
+
+    return [
+        {"name": rollup_name(table, grain), "source": table, "period_column": period, "grain": grain,
+         "dimensions": dimensions, "measures": measures}
+        for grain in grains
+    ]
+
+
+def describe(defn):
+    """search.py 프롬프트에 넣는 설명"""
+    period = {
+        "day": f"DATE({defn['period_column']})",
+        "month": f"DATE_FORMAT({defn['period_column']}, '%Y-%m') as 'YYYY-MM' string",
+        "raw": defn["period_column"],
+    }[defn["grain"]]
+    dims = ", ".join(defn["dimensions"]) or "(none)"
+    return (f"pre-aggregated from `{defn['source']}`: one row per (period, {dims}); period = {period}; "
+            f"each measure column is SUM of the raw column, row_count = COUNT(*) of raw rows")
+
+
+def _period_expr(defn):
+    col = f"`{defn['period_column']}`"
+    if defn["grain"] == "day":
+        return f"DATE({col})"
+    if defn["grain"] == "month":
+        return f"DATE_FORMAT({col}, '%Y-%m')"
+    return col
+
+
+def select_sql(defn, where=""):
+    dims = [f"`{d}`" for d in defn["dimensions"]]
+    sums = [f"SUM(`{m}`) AS `{m}`" for m in defn["measures"]]
+    group = ", ".join(str(i + 1) for i in range(1 + len(dims)))
+    return (f"SELECT {', '.join([_period_expr(defn) + ' AS `period`'] + dims + sums + ['COUNT(*) AS `row_count`'])} "
+            f"FROM `{defn['source']}` {where} GROUP BY {group}")
+
+
+def _month_filters(defn, month):
+    """
+    month만 다시 계산할 때의 (source WHERE, rollup WHERE). 기간 column으로 달을 고를 수 없으면 None.
+    """
+    start = f"'{month // 100:04d}-{month % 100:02d}-01'"
+    end = series.bound_literal(month, "date")
+    col = f"`{defn['period_column']}`"
+    if defn["grain"] == "day":
+        return f"WHERE {col} >= {start} AND {col} < {end}", f"WHERE `period` >= {start} AND `period` < {end}"
+    if defn["grain"] == "month":
+        return (f"WHERE {col} >= {start} AND {col} < {end}",
+                f"WHERE `period` = '{month // 100:04d}-{month % 100:02d}'")
+    if defn["period_column"] == series.MONTH_COLUMN:
+        return f"WHERE {col} = {month}", f"WHERE `period` = {month}"
+    return None
+
+
+def _literal(value):
+    if isinstance(value, (int, float, Decimal)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _since_filters(defn, last):
+    """rollup의 마지막 기간 last부터 다시 계산할 때의 (source WHERE, rollup WHERE)"""
+    col = f"`{defn['period_column']}`"
+    start = f"'{last}-01'" if defn["grain"] == "month" else _literal(last)
+    return f"WHERE {col} >= {start}", f"WHERE `period` >= {_literal(last)}"
+
+
+def _ensure_registry(cursor):
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS `{REGISTRY_TABLE}` ("
+        "name VARCHAR(64) PRIMARY KEY, source VARCHAR(64) NOT NULL, definition JSON NOT NULL, "
+        "description TEXT, refreshed_at DATETIME)"
+    )
+
+
+def registered(cursor, db_name, source=None):
+    """registry에 있는 rollup 정의 목록 (registry가 없으면 빈 목록)"""
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s",
+        (db_name, REGISTRY_TABLE),
+    )
+    if cursor.fetchone()[0] == 0:
+        return []
+    if source is None:
+        cursor.execute(f"SELECT definition FROM `{REGISTRY_TABLE}`")
+    else:
+        cursor.execute(f"SELECT definition FROM `{REGISTRY_TABLE}` WHERE source = %s", (source,))
+    return [json.loads(row[0]) for row in cursor.fetchall()]
+
+
+def rebuild(cursor, defn):
+    """새 table에 전체를 집계한 뒤 RENAME으로 바꿔 끼웁니다 (바꾸는 동안에도 이전 rollup을 읽을 수 있음)."""
+    name = defn["name"]
+    building = f"{name}__new"[:64]
+    cursor.execute(f"DROP TABLE IF EXISTS `{building}`")
+    cursor.execute(f"CREATE TABLE `{building}` AS {select_sql(defn)}")
+    cursor.execute(f"ALTER TABLE `{building}` ADD INDEX ix_period (`period`)")
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", (name,)
+    )
+    if cursor.fetchone()[0]:
+        old = f"{name}__old"[:64]
+        cursor.execute(f"DROP TABLE IF EXISTS `{old}`")
+        cursor.execute(f"RENAME TABLE `{name}` TO `{old}`, `{building}` TO `{name}`")
+        cursor.execute(f"DROP TABLE `{old}`")
+    else:
+        cursor.execute(f"RENAME TABLE `{building}` TO `{name}`")
+
+
+def refresh_month(conn, cursor, defn, month):
+    """month의 행만 지우고 다시 집계합니다. 가능하지 않으면 False."""
+    filters = _month_filters(defn, month)
+    if filters is None:
+        return False
+    source_where, rollup_where = filters
+    cursor.execute(f"DELETE FROM `{defn['name']}` {rollup_where}")
+    cursor.execute(f"INSERT INTO `{defn['name']}` {select_sql(defn, source_where)}")
+    conn.commit()
+    return True
+
+
+def refresh_appended(conn, cursor, defn):
+    """
+    append된 행만 반영합니다. rollup의 마지막 기간부터 지우고 다시 집계한 뒤 row_count 합계가 source 행 수와
+    같은지 확인합니다. 마지막 기간보다 이전 날짜의 행이 append되었으면 맞지 않으므로 되돌리고 False.
+    """
+    cursor.execute(f"SELECT MAX(`period`) FROM `{defn['name']}`")
+    last = cursor.fetchone()[0]
+    if last is None:
+        return False
+    source_where, rollup_where = _since_filters(defn, last)
+    cursor.execute(f"DELETE FROM `{defn['name']}` {rollup_where}")
+    cursor.execute(f"INSERT INTO `{defn['name']}` {select_sql(defn, source_where)}")
+    cursor.execute(
+        f"SELECT (SELECT COALESCE(SUM(`row_count`), 0) FROM `{defn['name']}`), (SELECT COUNT(*) FROM `{defn['source']}`)"
+    )
+    aggregated, rows = cursor.fetchone()
+    if aggregated != rows:
+        conn.rollback()
+        return False
+    conn.commit()
+    return True
+
+
+def maintain(conn, cursor, db_name, table, month=None, declared=None, appended=False):
+    """
+    table의 rollup을 갱신합니다. month가 있으면 (월별 series의 한 달을 로딩한 경우) 그 달만 다시 집계하고,
+    appended이면 (INCREMENTAL로 추가된 행만 로딩한 경우) rollup의 마지막 기간부터 다시 집계하고,
+    아니면 (또는 그렇게 할 수 없으면) 전체를 다시 만듭니다. 정의는 ROLLUP_CONFIG > registry(이전 실행) > 제안 순서로 사용합니다.
+    반환: 갱신한 rollup 이름 목록
+    """
+    if declared is None:
+        declared = load_declared()
+    definitions = declared.get(table) or registered(cursor, db_name, table) or suggest_rollups(cursor, db_name, table)
+    if not definitions:
+        return []
+
+    _ensure_registry(cursor)
+    existing = index_advisor.table_columns(cursor, db_name, {d["name"] for d in definitions})
+    refreshed = []
+    for defn in definitions:
+        mode = "full"
+        if defn["name"] in existing:
+            if month is not None and refresh_month(conn, cursor, defn, month):
+                mode = f"month {month}"
+            elif appended and refresh_appended(conn, cursor, defn):
+                mode = "append"
+        if mode == "full":
+            rebuild(cursor, defn)
+        cursor.execute(
+            f"INSERT INTO `{REGISTRY_TABLE}` (name, source, definition, description, refreshed_at) "
+            "VALUES (%s, %s, %s, %s, NOW()) ON DUPLICATE KEY UPDATE "
+            "source = VALUES(source), definition = VALUES(definition), description = VALUES(description), "
+            "refreshed_at = VALUES(refreshed_at)",
+            (defn["name"], table, json.dumps(defn, ensure_ascii=False), describe(defn)),
+        )
+        conn.commit()
+        print(f"📊 rollup {defn['name']} 갱신 ({mode})")
+        refreshed.append(defn["name"])
+    return refreshed
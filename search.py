@@ -5,30 +5,42 @@ End-to-end: User Query -> Milvus Hybrid Search -> Table selection loop via Ollam
 
 import os
 import json
+import hashlib
 import time
 import re
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from typing import List, Dict, Any, Tuple, Optional
 
-import numpy as np
-import requests
-import csv2recap
-
 # ---- BGE-M3 ----
-from FlagEmbedding import BGEM3FlagModel
-
-# ---- Milvus ----
-from pymilvus import MilvusClient, AnnSearchRequest, WeightedRanker
-
-# ---- MySQL ----
-import mysql.connector
+# 모델은 embedding.generate_embeddings()를 처음 호출할 때 읽음
+import embedding
+import result_stream
+import index_advisor
+import rollup
+import metrics
+import vector_catalog
+import llm_client
+
+# pymilvus(vector_catalog), requests(llm_client), mysql.connector는 사용하는 class 안에서 import
+# (--help, --dry-run, --schema-only는 필요한 것만 읽어서 바로 시작)
 
 # =========================
 # 1) Milvus Hybrid Search
 # =========================
 class MilvusHybridSearcher:
-    def __init__(self, uri: str, collection_name: str):
-        self.client = MilvusClient(uri=uri)
+    def __init__(self, uri: str, collection_name: str, embed_cache: Optional[embedding.EmbeddingCache] = None,
+                 backend: Optional[vector_catalog.CatalogBackend] = None):
+        """backend: vector_catalog의 catalog (기본: CATALOG_BACKEND에 따라 Milvus server 또는 embedded 파일)"""
+        self.backend = backend or vector_catalog.open_catalog(collection_name, uri=uri)
         self.collection_name = collection_name
+        # 같은 질문/milvus_query는 다시 encode하지 않음
+        self.embed_cache = embed_cache or embedding.get_query_cache()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self.embed_cache.stats()
 
     def hybrid_search_tables(
         self,
@@ -38,45 +50,49 @@ class MilvusHybridSearcher:
         dense_weight: float = 0.3,
         sparse_weight: float = 0.7,
     ) -> List[Dict[str, Any]]:
-        exclude_filenames = exclude_filenames or set()
-
-        q_dense, q_sparse = csv2recap.generate_embeddings([query])
-
-        req_dense = AnnSearchRequest(
-            data=q_dense,
-            anns_field="dense_vector",
-            param={"metric_type": "L2", "params": {"nprobe": 10}},
-            limit=limit,
-        )
-
-        req_sparse = AnnSearchRequest(
-            data=q_sparse,
-            anns_field="sparse_vector",
-            param={"metric_type": "IP", "params": {"drop_ratio_search": 0.2}},
-            limit=limit,
-        )
+        q_dense, q_sparse = self.embed_cache.encode([query])
+        return self._search_encoded(q_dense[:1], q_sparse[:1], limit, exclude_filenames, dense_weight, sparse_weight)
 
-        ranker = WeightedRanker(dense_weight, sparse_weight)
+    def hybrid_search_many(
+        self,
+        queries: List[str],
+        limit: int = 10,
+        exclude_filenames: Optional[set] = None,
+        parallel: int = 4,
+    ) -> List[Dict[str, Any]]:
+        """
+        여러 milvus_query를 한 번에 encode하고 catalog 검색은 동시에 실행합니다.
+        결과는 filename별 가장 높은 score만 남겨 score 순으로 합칩니다.
+        """
+        if not queries:
+            return []
+        q_dense, q_sparse = self.embed_cache.encode(queries)
+
+        def one(i: int) -> List[Dict[str, Any]]:
+            return self._search_encoded(q_dense[i:i + 1], q_sparse[i:i + 1], limit, exclude_filenames)
+
+        if len(queries) == 1 or parallel <= 1:
+            results = [one(i) for i in range(len(queries))]
+        else:
+            with ThreadPoolExecutor(max_workers=min(parallel, len(queries))) as pool:
+                results = list(pool.map(one, range(len(queries))))
+
+        best: Dict[str, Dict[str, Any]] = {}
+        for hits in results:
+            for r in hits:
+                prev = best.get(r["filename"])
+                if prev is None or (r["score"] or 0) > (prev["score"] or 0):
+                    best[r["filename"]] = r
+        return sorted(best.values(), key=lambda x: x["score"] or 0, reverse=True)
+
+    def _search_encoded(self, q_dense, q_sparse, limit: int, exclude_filenames: Optional[set],
+                        dense_weight: float = 0.3, sparse_weight: float = 0.7) -> List[Dict[str, Any]]:
+        exclude_filenames = exclude_filenames or set()
 
-        results = self.client.hybrid_search(
-            collection_name=self.collection_name,
-            reqs=[req_dense, req_sparse],
-            ranker=ranker,
-            limit=limit,
-            output_fields=["filename", "text"],
-        )
+        with metrics.span("catalog.search", backend=type(self.backend).__name__):
+            results = self.backend.hybrid_search(q_dense, q_sparse, limit, dense_weight, sparse_weight)
 
-        # pymilvus returns list-of-list; normalize
-        hits = []
-        for batch in results:
-            for h in batch:
-                row = {
-                    "filename": h.get("entity", {}).get("filename"),
-                    "text": h.get("entity", {}).get("text"),
-                    "score": h.get("score"),
-                }
-                if row["filename"] and row["filename"] not in exclude_filenames:
-                    hits.append(row)
+        hits = [r for r in results if r["filename"] and r["filename"] not in exclude_filenames]
 
         # sort by score desc (just in case)
         hits.sort(key=lambda x: (x["score"] is None, x["score"]), reverse=True)
@@ -98,24 +114,26 @@ class MilvusHybridSearcher:
 # 2) Ollama Client + Prompting
 # =========================
 class OllamaClient:
-    def __init__(self, base_url: str = "http://localhost:11434", model: str = "gpt-oss:20b", timeout: int = 120):
-        self.base_url = base_url.rstrip("/")
+    def __init__(self, base_url: str = "http://localhost:11434", model: str = "gpt-oss:20b",
+                 timeout: Optional[float] = None, client: Optional[llm_client.LLMClient] = None):
+        """
+        HTTP session, 동시 요청 수 한도, 재시도는 llm_client가 담당 (같은 base_url과 timeout이면 process 안에서 공유)
+        timeout은 응답 한 건의 read timeout(초)이며 없으면 LLM_TIMEOUT
+        """
         self.model = model
         self.timeout = timeout
+        self.client = client or llm_client.get_client(base_url, timeout)
 
-    def chat(self, messages: List[Dict[str, str]], temperature: float = 0.1) -> str:
-        url = f"{self.base_url}/api/chat"
-        payload = {
-            "model": self.model,
-            "messages": messages,
-            "options": {"temperature": temperature},
-            "stream": False,
-        }
-        r = requests.post(url, json=payload, timeout=self.timeout)
-        r.raise_for_status()
-        data = r.json()
+    def chat(self, messages: List[Dict[str, str]], temperature: float = 0.1, purpose: str = "chat") -> str:
+        # 모든 프롬프트가 JSON object 하나를 요구하므로 그 object가 끝나면 생성을 멈춤
+        data = self.client.chat(self.model, messages, options={"temperature": temperature}, purpose=purpose,
+                                stop_at_json=True)
         return data["message"]["content"]
 
+    def stats(self) -> List[Dict[str, Any]]:
+        return self.client.stats()
+
+
 def _extract_json_strict(text: str) -> Dict[str, Any]:
     """
     Extract first JSON object from model output; fail loudly if not possible.
@@ -173,9 +191,60 @@ def build_prompt_need_more_tables(
     return [{"role": "system", "content": system}, {"role": "user", "content": user}]
 
 
+def build_prompt_select_tables(
+    user_query: str,
+    selected_tables: List[Dict[str, Any]],
+    candidates: List[Dict[str, Any]],
+) -> List[Dict[str, str]]:
+    """
+    Step 2 prompt (multi mode):
+    - pick every table needed from the scored candidates at once
+    - if something is still missing, produce Milvus search queries for all missing concepts
+    """
+    selected_brief = [{"filename": t["filename"], "text": (t.get("text") or "")[:300]} for t in selected_tables]
+    candidates_brief = [
+        {
+            "filename": t["filename"],
+            "score": round(t["score"], 3) if t.get("score") is not None else None,
+            "text": (t.get("text") or "")[:400],
+        }
+        for t in candidates
+    ]
+
+    system = (
+        "You are a data engineer assistant. "
+        "Given a user information need, tables already selected, and candidate MySQL tables ranked by search score "
+        "(with short descriptions), choose ALL candidate tables required to answer the query correctly.\n\n"
+        "You MUST output ONLY valid JSON with the following schema:\n"
+        "{\n"
+        '  "tables": [string],\n'
+        '  "need_more": boolean,\n'
+        '  "reason": string,\n'
+        '  "milvus_queries": [string]\n'
+        "}\n\n"
+        "Rules:\n"
+        "- tables: exact filenames from CANDIDATE_TABLES only; include every table needed (e.g. each month or line "
+        "that must be joined or unioned), and none that are not needed.\n"
+        "- Do not repeat SELECTED_TABLES in tables.\n"
+        "- need_more is true only if a required concept is covered by neither SELECTED_TABLES nor the chosen tables.\n"
+        "- If need_more is false, milvus_queries MUST be an empty list.\n"
+        "- If need_more is true, give one short Korean search query suitable for Milvus per missing concept "
+        "(at most 3).\n"
+    )
+
+    user = (
+        f"USER_QUERY:\n{user_query}\n\n"
+        f"SELECTED_TABLES (filename=text snippet):\n{json.dumps(selected_brief, ensure_ascii=False, indent=2)}\n\n"
+        f"CANDIDATE_TABLES (filename, score, text snippet):\n{json.dumps(candidates_brief, ensure_ascii=False, indent=2)}\n"
+    )
+
+    return [{"role": "system", "content": system}, {"role": "user", "content": user}]
+
+
 def build_prompt_generate_mysql_sql(
     user_query: str,
     table_schemas: Dict[str, List[Dict[str, str]]],
+    rollups: Optional[Dict[str, str]] = None,
 ) -> List[Dict[str, str]]:
     """
     Step 6 prompt: generate MySQL SELECT query only, with safe constraints.
@@ -195,11 +264,19 @@ def build_prompt_generate_mysql_sql(
         "- If date filtering is implied (e.g., '2024년5월'), implement it robustly.\n"
         "- If you need to union multiple tables, do it carefully with aligned columns.\n"
     )
+    if rollups:
+        system += (
+            "- ROLLUP_TABLES are pre-aggregated copies of raw tables. If the answer only needs sums/counts of their "
+            "measure columns by their period and dimension columns, query the rollup table instead of the raw table "
+            "(SUM the rollup columns again when grouping coarser).\n"
+        )
 
     user = (
         f"USER_QUERY:\n{user_query}\n\n"
         f"TABLE_SCHEMAS (table -> columns):\n{json.dumps(table_schemas, ensure_ascii=False, indent=2)}\n"
     )
+    if rollups:
+        user += f"\nROLLUP_TABLES (table -> description):\n{json.dumps(rollups, ensure_ascii=False, indent=2)}\n"
     return [{"role": "system", "content": system}, {"role": "user", "content": user}]
 
 
@@ -207,14 +284,41 @@ def build_prompt_generate_mysql_sql(
 # 5) MySQL schema + execution
 # =========================
 class MySQLRunner:
-    def __init__(self, host: str, user: str, password: str, database: str, port: int = 3306):
-        self.conn = mysql.connector.connect(
-            host=host, user=user, password=password, database=database, port=port
-        )
+    def __init__(self, host: str, user: str, password: str, database: str, port: int = 3306, pool_size: int = 1):
+        """pool_size > 1이면 connection pool을 만들고, 호출마다 pool에서 connection을 빌려 씁니다 (server mode)."""
+        import mysql.connector
+        self.database = database
+        self._params = dict(host=host, user=user, password=password, database=database, port=port)
+        self.pool = None
+        self.conn = None
+        if pool_size > 1:
+            import mysql.connector.pooling
+            # pool 이름은 영문/숫자/._:-*$#만 허용하므로 (한글 db 이름) db 이름의 sha1로 만듦
+            name = f"search_{hashlib.sha1(database.encode('utf-8')).hexdigest()[:8]}"
+            self.pool = mysql.connector.pooling.MySQLConnectionPool(
+                pool_name=name, pool_size=pool_size,
+                host=host, user=user, password=password, database=database, port=port,
+            )
+        else:
+            self.conn = mysql.connector.connect(
+                host=host, user=user, password=password, database=database, port=port
+            )
+
+    @contextmanager
+    def connection(self):
+        if self.pool is None:
+            yield self.conn
+            return
+        conn = self.pool.get_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()   # pool로 반환
 
     def close(self):
         try:
-            self.conn.close()
+            if self.conn is not None:
+                self.conn.close()
         except Exception:
             pass
 
@@ -222,19 +326,173 @@ class MySQLRunner:
         """
         Returns list like: [{"Field":..., "Type":..., "Null":..., "Key":..., "Default":..., "Extra":...}, ...]
         """
-        cur = self.conn.cursor(dictionary=True)
-        cur.execute(f"DESCRIBE `{table}`")
-        rows = cur.fetchall()
-        cur.close()
+        with self.connection() as conn:
+            cur = conn.cursor(dictionary=True)
+            cur.execute(f"DESCRIBE `{table}`")
+            rows = cur.fetchall()
+            cur.close()
         return rows
 
     def run_select(self, sql: str) -> List[Dict[str, Any]]:
-        cur = self.conn.cursor(dictionary=True)
-        cur.execute(sql)
-        rows = cur.fetchall()
-        cur.close()
+        with self.connection() as conn:
+            cur = conn.cursor(dictionary=True)
+            cur.execute(sql)
+            rows = cur.fetchall()
+            cur.close()
         return rows
 
+    def stream_select(self, sql: str, **kwargs) -> "result_stream.ResultStream":
+        """
+        결과를 chunk 단위로 읽는 ResultStream을 반환합니다 (chunk_size, max_rows, max_bytes).
+        iterate하는 동안 connection 하나를 사용합니다.
+        """
+        return result_stream.ResultStream(self, sql, **kwargs)
+
+    def cancel(self, conn):
+        """다 읽지 않은 query를 서버에서 중단(KILL QUERY)하고 남은 결과를 버립니다."""
+        import mysql.connector
+        killer = mysql.connector.connect(**self._params)
+        try:
+            cur = killer.cursor()
+            cur.execute(f"KILL QUERY {conn.connection_id}")
+            cur.close()
+        finally:
+            killer.close()
+        try:
+            conn.consume_results()
+        except mysql.connector.Error:
+            pass   # 중단된 query는 1317 오류로 끝남
+
+
+class SchemaCatalog:
+    """
+    information_schema.COLUMNS를 한 번의 query로 읽어 database 전체의 table -> columns를 메모리에 보관합니다.
+    table 버전(CREATE_TIME/UPDATE_TIME)은 check_interval초마다 한 번만 확인하고, 바뀌었으면 다시 읽습니다.
+    csv2mysql.process_directory(on_table_loaded=catalog.invalidate)로 reload된 table만 바로 무효화할 수도 있습니다.
+    없는 table 이름은 다음 버전 확인까지 기억해 두고 다시 조회하지 않습니다.
+    """
+
+    def __init__(self, mysql: MySQLRunner, check_interval: float = 5.0):
+        self.mysql = mysql
+        self.check_interval = check_interval
+        self.tables: Dict[str, List[Dict[str, str]]] = {}
+        self.versions: Dict[str, str] = {}
+        self.rollups: Dict[str, List[Tuple[str, str]]] = {}   # source table -> [(rollup table, 설명)]
+        self._stale = True
+        self._stale_tables: set = set()   # invalidate(table)로 다시 읽을 table
+        self._misses: set = set()         # describe()에서 찾지 못한 table 이름
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self.mysql.connection() as conn:
+            cur = conn.cursor()
+            # information_schema.TABLES의 시간 값을 cache하지 않도록 함 (MySQL 8 기본값은 24시간)
+            cur.execute("SET SESSION information_schema_stats_expiry = 0")
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+            cur.close()
+        return rows
+
+    def _load_versions(self) -> Dict[str, str]:
+        rows = self._query(
+            "SELECT TABLE_NAME, CREATE_TIME, UPDATE_TIME FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s",
+            (self.mysql.database,),
+        )
+        return {name: f"{created}|{updated}" for name, created, updated in rows}
+
+    def refresh(self):
+        rows = self._query(
+            "SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE, COLUMN_KEY "
+            "FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s "
+            "ORDER BY TABLE_NAME, ORDINAL_POSITION",
+            (self.mysql.database,),
+        )
+        tables: Dict[str, List[Dict[str, str]]] = {}
+        for table, field, col_type, nullable, key in rows:
+            # DESCRIBE와 같은 key 이름 사용
+            tables.setdefault(table, []).append({"Field": field, "Type": col_type, "Null": nullable, "Key": key})
+        rollups: Dict[str, List[Tuple[str, str]]] = {}
+        if rollup.REGISTRY_TABLE in tables:
+            for name, source, description in self._query(
+                f"SELECT name, source, description FROM `{self.mysql.database}`.`{rollup.REGISTRY_TABLE}` ORDER BY name"
+            ):
+                if name in tables:
+                    rollups.setdefault(source, []).append((name, description))
+        with self._lock:
+            self.tables = tables
+            self.rollups = rollups
+            self.versions = self._load_versions()
+            self._stale = False
+            self._stale_tables.clear()
+            self._misses.clear()
+            self._checked_at = time.time()
+
+    def refresh_table(self, table: str):
+        """table 하나의 column과 버전만 다시 읽습니다 (없으면 catalog에서 뺌)."""
+        rows = self._query(
+            "SELECT COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE, COLUMN_KEY "
+            "FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s "
+            "ORDER BY ORDINAL_POSITION",
+            (self.mysql.database, table),
+        )
+        versions = self._query(
+            "SELECT CREATE_TIME, UPDATE_TIME FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s",
+            (self.mysql.database, table),
+        )
+        with self._lock:
+            self._stale_tables.discard(table)
+            if not rows:
+                self.tables.pop(table, None)
+                self.versions.pop(table, None)
+                return
+            self.tables[table] = [{"Field": f, "Type": t, "Null": n, "Key": k} for f, t, n, k in rows]
+            if versions:
+                created, updated = versions[0]
+                self.versions[table] = f"{created}|{updated}"
+            self._misses.discard(table)
+
+    def _ensure_fresh(self):
+        with self._lock:
+            if self._stale:
+                self.refresh()
+                return
+            for table in list(self._stale_tables):
+                self.refresh_table(table)
+            if time.time() - self._checked_at > self.check_interval:
+                self._checked_at = time.time()
+                self._misses.clear()
+                if self._load_versions() != self.versions:
+                    self.refresh()
+
+    def invalidate(self, table: Optional[str] = None):
+        """table이 reload된 후 호출합니다. 다음 조회에서 그 table을 (table이 None이면 catalog 전체를) 다시 읽습니다."""
+        with self._lock:
+            if table is None:
+                self._stale = True
+            else:
+                self._stale_tables.add(table)
+                self._misses.discard(table)
+
+    def describe(self, table: str) -> List[Dict[str, str]]:
+        self._ensure_fresh()
+        with self._lock:
+            if table not in self.tables and table not in self._misses:
+                # 마지막 확인 이후 새로 만들어진 table일 수 있음: 그 table만 읽고, 없으면 다음 버전 확인까지 기억
+                self.refresh_table(table)
+                if table not in self.tables:
+                    self._misses.add(table)
+            return self.tables.get(table, [])
+
+    def rollups_for(self, tables: List[str]) -> Dict[str, str]:
+        """tables로 만든 rollup table -> 설명 (csv2mysql ROLLUP=1)"""
+        self._ensure_fresh()
+        return {name: description for t in tables for name, description in self.rollups.get(t, [])}
+
+    def table_version(self, table: str) -> str:
+        self._ensure_fresh()
+        return self.versions.get(table, "")
+
 
 def is_safe_select(sql: str) -> bool:
     """
@@ -258,118 +516,407 @@ def is_safe_select(sql: str) -> bool:
 # =========================
 # Orchestration (1~6)
 # =========================
-def main():
-    # ---- Config ----
-    milvus_uri = os.getenv("MILVUS_URI", "http://localhost:19530")
-    collection_name = os.getenv("MILVUS_COLLECTION", "seoul_transport")
+def select_tables(
+    user_query: str,
+    searcher: MilvusHybridSearcher,
+    llm: OllamaClient,
+    max_rounds: int = 5,
+) -> List[Dict[str, Any]]:
+    """
+    Steps 1~4: Milvus에서 가장 적당한 table로 시작해서, Ollama가 더 필요 없다고 할 때까지 table을 추가합니다.
+    """
+    # 1) initial milvus query -> pick best table (top-1), but keep top-k candidates
+    exclude = set()
+    initial_hits = searcher.hybrid_search_tables(user_query, limit=10, exclude_filenames=exclude)
+    if not initial_hits:
+        raise RuntimeError("Milvus search returned no tables. Check collection content/embeddings.")
+
+    selected = [initial_hits[0]]
+    exclude.add(initial_hits[0]["filename"])
+
+    # 2~4) loop until no missing tables
+    round_idx = 0
+    while True:
+        round_idx += 1
+        if round_idx > max_rounds:
+            print(f"[WARN] Reached max_rounds={max_rounds}. Proceeding with current tables.")
+            break
+
+        # 2) ask ollama if more tables needed; if yes, request milvus_query
+        msgs = build_prompt_need_more_tables(user_query, selected)
+        out = llm.chat(msgs, temperature=0.1, purpose="select_tables")
+        decision = _extract_json_strict(out)
+        metrics.count("select.llm_rounds", mode="loop")
+
+        need_more = bool(decision.get("need_more", False))
+        reason = str(decision.get("reason", ""))
+        milvus_query = str(decision.get("milvus_query", "") or "").strip()
+
+        print(f"\n[ROUND {round_idx}] need_more={need_more} reason={reason}")
+        if not need_more:
+            break
+
+        if not milvus_query:
+            print("[WARN] need_more=True but milvus_query empty. Fallback to original user_query.")
+            milvus_query = user_query
+
+        # 3) search missing tables via milvus_query; exclude already selected
+        new_hits = searcher.hybrid_search_tables(milvus_query, limit=10, exclude_filenames=exclude)
+        if not new_hits:
+            print("[WARN] No additional tables found from Milvus for milvus_query:", milvus_query)
+            break
+
+        # pick top-1 new table each iteration (you can also add multiple if desired)
+        new_table = new_hits[0]
+        selected.append(new_table)
+        exclude.add(new_table["filename"])
+        print(f"[ADD] {new_table['filename']} score={new_table.get('score')}")
+
+        # 4) loop continues to step 2 with updated selected list
+
+    return selected
+
+
+def auto_accept_count(hits: List[Dict[str, Any]], gap: float, max_auto: int = 1) -> int:
+    """
+    앞쪽 후보 n개(n <= max_auto)가 n+1번째 후보보다 score가 gap 이상 높으면 n을 반환합니다
+    (뚜렷하게 높은 앞쪽 후보만 LLM에게 묻지 않고 선택). gap은 앞에서부터 확인하므로
+    비슷한 score의 후보들 뒤에 있는 낮은 꼬리 때문에 여러 개가 선택되지 않습니다.
+    후보가 하나뿐이면 1, 해당하는 gap이 없거나 gap이 0 이하이면 0
+    """
+    if len(hits) == 1:
+        return 1
+    if gap <= 0:
+        return 0
+    scores = [h.get("score") or 0.0 for h in hits]
+    for n in range(1, min(max_auto, len(scores) - 1) + 1):
+        if scores[n - 1] - scores[n] >= gap:
+            return n
+    return 0
+
+
+def select_tables_multi(
+    user_query: str,
+    searcher: MilvusHybridSearcher,
+    llm: OllamaClient,
+    top_k: int = 8,
+    auto_gap: float = 0.15,
+    auto_max: int = 1,
+    max_rounds: int = 3,
+    parallel: int = 4,
+) -> List[Dict[str, Any]]:
+    """
+    Steps 1~4 (multi mode): score를 붙인 top_k 후보를 한 프롬프트로 보여주고 필요한 table을 한 번에 고르게 합니다.
+    다음 후보보다 score가 auto_gap 이상 높은 앞쪽 후보(최대 auto_max개)는 바로 선택하고, 부족한 개념이 있으면 milvus_queries를 동시에 검색해
+    새 후보로 다음 round를 진행합니다 (LLM 호출은 최대 max_rounds번).
+    """
+    # 1) initial milvus query -> top-k scored candidates
+    hits = searcher.hybrid_search_tables(user_query, limit=top_k)
+    if not hits:
+        raise RuntimeError("Milvus search returned no tables. Check collection content/embeddings.")
+
+    n_auto = auto_accept_count(hits, auto_gap, auto_max)
+    selected = hits[:n_auto]
+    candidates = hits[n_auto:]
+    shown = {h["filename"] for h in hits}
+    for t in selected:
+        print(f"[AUTO] {t['filename']} score={t.get('score')}")
+    metrics.count("select.auto_accepted", n_auto)
+
+    round_idx = 0
+    while candidates:
+        round_idx += 1
+
+        # 2) ask ollama to pick all needed candidates (and what is still missing)
+        msgs = build_prompt_select_tables(user_query, selected, candidates)
+        out = llm.chat(msgs, temperature=0.1, purpose="select_tables")
+        decision = _extract_json_strict(out)
+        metrics.count("select.llm_rounds", mode="multi")
+
+        chosen = decision.get("tables") or []
+        chosen = {str(c) for c in ([chosen] if isinstance(chosen, str) else chosen)}
+        need_more = bool(decision.get("need_more", False))
+        reason = str(decision.get("reason", ""))
+        queries = decision.get("milvus_queries") or []
+        queries = [str(q).strip() for q in ([queries] if isinstance(queries, str) else queries) if str(q).strip()]
+
+        picked = [c for c in candidates if c["filename"] in chosen]
+        selected.extend(picked)
+        print(f"\n[ROUND {round_idx}] picked={[t['filename'] for t in picked]} need_more={need_more} reason={reason}")
+        unknown = chosen - {c["filename"] for c in candidates} - {t["filename"] for t in selected}
+        if unknown:
+            print(f"[WARN] Ignoring tables not in candidates: {sorted(unknown)}")
+        if not need_more:
+            break
+        if round_idx >= max_rounds:
+            print(f"[WARN] Reached max_rounds={max_rounds}. Proceeding with current tables.")
+            break
+
+        if not queries:
+            print("[WARN] need_more=True but milvus_queries empty. Fallback to original user_query.")
+            queries = [user_query]
+
+        # 3) search every missing concept in parallel; candidates already shown are not offered again
+        candidates = searcher.hybrid_search_many(queries[:3], limit=top_k, exclude_filenames=shown, parallel=parallel)
+        candidates = candidates[:top_k]
+        if not candidates:
+            print("[WARN] No additional tables found from Milvus for milvus_queries:", queries)
+        shown.update(c["filename"] for c in candidates)
+
+    if not selected:
+        print("[WARN] No table chosen. Using the top search hit.")
+        selected = [hits[0]]
+    return selected
+
+
+def generate_sql(
+    user_query: str,
+    table_schemas: Dict[str, List[Dict[str, str]]],
+    llm: OllamaClient,
+    rollups: Optional[Dict[str, str]] = None,
+) -> Tuple[str, str]:
+    """
+    Step 6: Ollama로 SELECT 문을 만듭니다. 반환값: (sql, notes)
+    rollups(rollup table -> 설명)의 table schema도 table_schemas에 들어 있어야 합니다.
+    """
+    msgs_sql = build_prompt_generate_mysql_sql(user_query, table_schemas, rollups)
+    out_sql = llm.chat(msgs_sql, temperature=0.1, purpose="generate_sql")
+    sql_obj = _extract_json_strict(out_sql)
+    sql = (sql_obj.get("sql") or "").strip()
+    notes = (sql_obj.get("notes") or "").strip()
+    return sql, notes
+
+
+def load_config() -> Dict[str, Any]:
+    return {
+        "milvus_uri": os.getenv("MILVUS_URI", "http://localhost:19530"),
+        "collection_name": os.getenv("MILVUS_COLLECTION", "seoul_transport"),
+        "ollama_url": os.getenv("OLLAMA_URL", "http://localhost:11434"),
+        "ollama_model": os.getenv("OLLAMA_MODEL", "gpt-oss:20b"),
+        "mysql_host": os.getenv("MYSQL_HOST", "localhost"),
+        "mysql_user": os.getenv("MYSQL_USER", "root"),
+        "mysql_password": os.getenv("MYSQL_PASSWORD", "_password_"),
+        "mysql_db": os.getenv("MYSQL_DB", "seoul_transport"),
+        "mysql_port": int(os.getenv("MYSQL_PORT", "3306")),
+        "sql_cache": os.getenv("SQL_CACHE", "0") == "1",
+        "sql_cache_templates": os.getenv("SQL_CACHE_TEMPLATES", "0") == "1",
+        # table 선택: loop(기본, round마다 한 table씩 추가) 또는 multi(후보를 한 프롬프트로 한 번에 선택)
+        "table_select": os.getenv("TABLE_SELECT", "loop"),
+        "select_top_k": int(os.getenv("SELECT_TOP_K", "8")),
+        "select_auto_gap": float(os.getenv("SELECT_AUTO_GAP", "0.15")),
+        "select_auto_max": int(os.getenv("SELECT_AUTO_MAX", "1")),
+        "select_max_rounds": int(os.getenv("SELECT_MAX_ROUNDS", "3")),
+        "select_parallel": int(os.getenv("SELECT_PARALLEL", "4")),
+    }
+
+
+def make_mysql(config: Dict[str, Any], pool_size: int = 1) -> MySQLRunner:
+    return MySQLRunner(
+        host=config["mysql_host"], user=config["mysql_user"], password=config["mysql_password"],
+        database=config["mysql_db"], port=config["mysql_port"], pool_size=pool_size,
+    )
 
-    ollama_url = os.getenv("OLLAMA_URL", "http://localhost:11434")
-    ollama_model = os.getenv("OLLAMA_MODEL", "gpt-oss:20b")
 
-    mysql_host = os.getenv("MYSQL_HOST", "localhost")
-    mysql_user = os.getenv("MYSQL_USER", "root")
-    mysql_password = os.getenv("MYSQL_PASSWORD", "_password_")
-    mysql_db = os.getenv("MYSQL_DB", "seoul_transport")
-    mysql_port = int(os.getenv("MYSQL_PORT", "3306"))
+class SearchContext:
+    """질문 하나를 답하는 데 필요한 client들. server mode에서는 한 번 만들어 모든 요청이 공유합니다."""
 
-    # ---- Inputs ----
-    user_query = os.getenv("USER_QUERY", "2024년5월과 6월  지하철 망포 총승차승객수는?")
-    #user_query = os.getenv("USER_QUERY", "2024년1월9701번 버스  총승차승객수는?")
+    def __init__(self, config: Dict[str, Any], pool_size: int = 1):
+        self.config = config
+        self.searcher = MilvusHybridSearcher(uri=config["milvus_uri"], collection_name=config["collection_name"])
+        self.llm = OllamaClient(base_url=config["ollama_url"], model=config["ollama_model"])
+        self.mysql = make_mysql(config, pool_size)
+        self.catalog = SchemaCatalog(self.mysql)
+        self.sql_cache = None
+        if config["sql_cache"]:
+            import sql_cache as sql_cache_mod
+            self.sql_cache = sql_cache_mod.SQLCache(templates=config["sql_cache_templates"])
 
-    # ---- Clients ----
-    searcher = MilvusHybridSearcher(uri=milvus_uri, collection_name=collection_name)
-    llm = OllamaClient(base_url=ollama_url, model=ollama_model)
-    mysql = MySQLRunner(host=mysql_host, user=mysql_user, password=mysql_password, database=mysql_db, port=mysql_port)
+    def close(self):
+        self.mysql.close()
 
-    try:
-        # 1) initial milvus query -> pick best table (top-1), but keep top-k candidates
-        exclude = set()
-        initial_hits = searcher.hybrid_search_tables(user_query, limit=10, exclude_filenames=exclude)
-        if not initial_hits:
-            raise RuntimeError("Milvus search returned no tables. Check collection content/embeddings.")
-
-        selected = [initial_hits[0]]
-        exclude.add(initial_hits[0]["filename"])
-
-        # 2~4) loop until no missing tables
-        max_rounds = 5
-        round_idx = 0
-        while True:
-            round_idx += 1
-            if round_idx > max_rounds:
-                print(f"[WARN] Reached max_rounds={max_rounds}. Proceeding with current tables.")
-                break
-
-            # 2) ask ollama if more tables needed; if yes, request milvus_query
-            msgs = build_prompt_need_more_tables(user_query, selected)
-            out = llm.chat(msgs, temperature=0.1)
-            decision = _extract_json_strict(out)
-
-            need_more = bool(decision.get("need_more", False))
-            reason = str(decision.get("reason", ""))
-            milvus_query = str(decision.get("milvus_query", "") or "").strip()
-
-            print(f"\n[ROUND {round_idx}] need_more={need_more} reason={reason}")
-            if not need_more:
-                break
-
-            if not milvus_query:
-                print("[WARN] need_more=True but milvus_query empty. Fallback to original user_query.")
-                milvus_query = user_query
-
-            # 3) search missing tables via milvus_query; exclude already selected
-            new_hits = searcher.hybrid_search_tables(milvus_query, limit=10, exclude_filenames=exclude)
-            if not new_hits:
-                print("[WARN] No additional tables found from Milvus for milvus_query:", milvus_query)
-                break
-
-            # pick top-1 new table each iteration (you can also add multiple if desired)
-            new_table = new_hits[0]
-            selected.append(new_table)
-            exclude.add(new_table["filename"])
-            print(f"[ADD] {new_table['filename']} score={new_table.get('score')}")
-
-            # 4) loop continues to step 2 with updated selected list
-
-        # 5) describe each selected table in MySQL
+
+def answer_query(user_query: str, ctx: SearchContext, preview_rows: Optional[int] = None,
+                 export_path: Optional[str] = None, **limits) -> Dict[str, Any]:
+    """
+    질문 하나를 처리합니다. 반환값에는 선택한 table, SQL, 결과 행과 단계별 시간(ms)이 들어갑니다.
+    결과는 stream으로 읽어 앞의 preview_rows 행만 "rows"에 담고 (None이면 전부),
+    export_path가 있으면 .csv/.jsonl/.npz 파일로 바로 씁니다. limits: max_rows, max_bytes, chunk_size
+    """
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    mark = started
+
+    def lap(name: str):
+        nonlocal mark
+        now = time.perf_counter()
+        timings[name] = round((now - mark) * 1000, 1)
+        mark = now
+
+    # 0) 비슷한 질문의 SQL이 cache에 있고 table이 바뀌지 않았으면 LLM 없이 바로 실행
+    hit = None
+    if ctx.sql_cache is not None:
+        q_dense, _ = ctx.searcher.embed_cache.encode([user_query])
+        hit = ctx.sql_cache.lookup(user_query, q_dense[0], ctx.catalog.table_version)
+        metrics.count("sql_cache.lookups", result="miss" if hit is None else "hit")
+        lap("sql_cache")
+
+    notes = ""
+    if hit is not None:
+        sql = hit["sql"]
+        table_names = hit["tables"]
+        print(f"\n[SQL cache] score={hit['score']:.3f} templated={hit['templated']} cached question: {hit['cached_question']}")
+        print("\n[Cached SQL]\n", sql)
+    else:
+        # 1~4) pick tables via milvus + ollama loop
+        config = ctx.config
+        if config["table_select"] == "multi":
+            selected = select_tables_multi(
+                user_query, ctx.searcher, ctx.llm, top_k=config["select_top_k"], auto_gap=config["select_auto_gap"],
+                auto_max=config["select_auto_max"], max_rounds=config["select_max_rounds"],
+                parallel=config["select_parallel"],
+            )
+        else:
+            selected = select_tables(user_query, ctx.searcher, ctx.llm)
+        table_names = [t["filename"] for t in selected]
+        lap("select_tables")
+
+        # 5) describe each selected table from the schema catalog (one information_schema query)
         table_schemas: Dict[str, List[Dict[str, str]]] = {}
-        for t in selected:
-            table = t["filename"]
-            desc = mysql.describe_table(table)
-            # store only key fields to keep prompt small
-            table_schemas[table] = [
-                {
-                    "Field": r.get("Field"),
-                    "Type": r.get("Type"),
-                    "Null": r.get("Null"),
-                    "Key": r.get("Key"),
-                }
-                for r in desc
-            ]
+        for table in table_names:
+            # catalog keeps only key fields to keep prompt small
+            table_schemas[table] = ctx.catalog.describe(table)
+        # 미리 집계한 rollup table이 있으면 같이 보여줌
+        rollups = ctx.catalog.rollups_for(table_names)
+        for name in rollups:
+            table_schemas[name] = ctx.catalog.describe(name)
+        # SQL cache가 rollup table의 버전도 확인하도록
+        table_names = table_names + list(rollups)
+        lap("schema")
 
         # 6) generate mysql SQL via ollama and execute
-        msgs_sql = build_prompt_generate_mysql_sql(user_query, table_schemas)
-        out_sql = llm.chat(msgs_sql, temperature=0.1)
-        sql_obj = _extract_json_strict(out_sql)
-        sql = (sql_obj.get("sql") or "").strip()
-        notes = (sql_obj.get("notes") or "").strip()
+        sql, notes = generate_sql(user_query, table_schemas, ctx.llm, rollups)
+        lap("generate_sql")
 
         print("\n[Ollama Notes]\n", notes)
         print("\n[Generated SQL]\n", sql)
 
-        if not is_safe_select(sql):
-            raise RuntimeError("Generated SQL failed safety check (must be a single SELECT). Refusing to execute.")
+    if not is_safe_select(sql):
+        raise RuntimeError("Generated SQL failed safety check (must be a single SELECT). Refusing to execute.")
+
+    stream = ctx.mysql.stream_select(sql, **limits)
+    with metrics.span("mysql.select", export=bool(export_path)) as sp:
+        if export_path:
+            result_stream.export(stream, export_path)
+            rows = []
+        else:
+            rows = stream.dicts(limit=preview_rows)
+        sp.set(rows=stream.rows)
+    lap("execute")
+    # index_advisor.py가 WHERE/GROUP BY column을 보고 index를 제안할 때 사용 (INDEX_ADVISOR=1 또는 QUERY_LOG를 지정했을 때만 기록)
+    index_advisor.log_query(sql, table_names, timings["execute"])
+    if ctx.sql_cache is not None and hit is None:
+        ctx.sql_cache.store(user_query, q_dense[0], table_names, ctx.catalog.table_version, sql)
+
+    timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+    metrics.count("search.queries", cached=hit is not None)
+    return {
+        "query": user_query,
+        "tables": table_names,
+        "sql": sql,
+        "notes": notes,
+        "cached": hit is not None,
+        "columns": stream.columns,
+        "rows": rows,
+        "row_count": stream.rows,
+        "truncated": stream.truncated,
+        "export_path": export_path,
+        "timings_ms": timings,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="User Query -> Milvus Hybrid Search -> Table selection loop via Ollama -> MySQL schema -> Ollama SQL -> Execute",
+    )
+    parser.add_argument("query", nargs="?", help="질문 (기본: USER_QUERY 환경 변수)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="설정과 첫 프롬프트만 출력하고 embedding 모델, Milvus, Ollama, MySQL은 사용하지 않음")
+    parser.add_argument("--schema-only", nargs="+", metavar="TABLE",
+                        help="MySQL에서 table 구조만 출력 (embedding 모델을 읽지 않음)")
+    parser.add_argument("--export", metavar="PATH", help="결과를 파일로 저장 (.csv, .jsonl, .npz)")
+    parser.add_argument("--max-rows", type=int, default=result_stream.RESULT_MAX_ROWS, help="결과 행 수 한도")
+    parser.add_argument("--max-bytes", type=int, default=result_stream.RESULT_MAX_BYTES, help="결과 크기(byte) 한도")
+    parser.add_argument("--serve", action="store_true", help="HTTP server mode (search_server.py)")
+    parser.add_argument("--host", default=os.getenv("SEARCH_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SEARCH_PORT", "8800")))
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("SEARCH_CONCURRENCY", "4")),
+                        help="server mode에서 동시에 처리하는 질문 수")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+
+    # ---- Config ----
+    config = load_config()
+
+    if args.serve:
+        import search_server
+        search_server.serve(config, host=args.host, port=args.port, concurrency=args.concurrency)
+        return
+
+    # ---- Inputs ----
+    user_query = args.query or os.getenv("USER_QUERY", "2024년5월과 6월  지하철 망포 총승차승객수는?")
+    #user_query = os.getenv("USER_QUERY", "2024년1월9701번 버스  총승차승객수는?")
+
+    if args.dry_run:
+        print(f"catalog={vector_catalog.CATALOG_BACKEND} milvus={config['milvus_uri']} collection={config['collection_name']}")
+        print(f"ollama={config['ollama_url']} model={config['ollama_model']}")
+        print(f"mysql={config['mysql_user']}@{config['mysql_host']}:{config['mysql_port']}/{config['mysql_db']}")
+        print(f"table select={config['table_select']} top_k={config['select_top_k']} auto_gap={config['select_auto_gap']}")
+        print(f"user query : {user_query}")
+        if config["table_select"] == "multi":
+            prompt = build_prompt_select_tables(user_query, [], [])
+        else:
+            prompt = build_prompt_need_more_tables(user_query, [])
+        print(json.dumps(prompt, ensure_ascii=False, indent=2))
+        return
+
+    if args.schema_only:
+        mysql = make_mysql(config)
+        catalog = SchemaCatalog(mysql)
+        try:
+            for table in args.schema_only:
+                print(f"[{table}]")
+                for r in catalog.describe(table):
+                    print(f"  {r.get('Field')} {r.get('Type')}")
+        finally:
+            mysql.close()
+        return
+
+    # ---- Clients ----
+    ctx = SearchContext(config)
+
+    try:
+        # print a small preview, the rest is only counted (or exported)
+        result = answer_query(user_query, ctx, preview_rows=20, export_path=args.export,
+                              max_rows=args.max_rows, max_bytes=args.max_bytes)
+        rows = result["rows"]
 
-        rows = mysql.run_select(sql)
         print(f"user query : {user_query}")
-        print(f"\n[RESULT] rows={len(rows)}")
-        # print a small preview
-        preview_n = min(20, len(rows))
-        for i in range(preview_n):
-            print(rows[i])
+        print(f"\n[RESULT] rows={result['row_count']}" + (" (truncated)" if result["truncated"] else ""))
+        if args.export:
+            print(f"exported to {args.export}")
+        for row in rows:
+            print(row)
+        print(f"\n[timings ms] {result['timings_ms']}")
+        print(f"[embedding cache] {ctx.searcher.cache_stats()}")
+        if ctx.sql_cache is not None:
+            print(f"[SQL cache] {ctx.sql_cache.stats()}")
+        print(f"[llm] {ctx.llm.stats()}")
 
     finally:
-        mysql.close()
+        ctx.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,127 @@
+import os
+import json
+import time
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+import search
+import metrics
+
+# --- Configuration ---
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "4"))          # 동시에 처리하는 질문 수
+SEARCH_QUEUE_TIMEOUT = float(os.getenv("SEARCH_QUEUE_TIMEOUT", "30"))   # 자리가 날 때까지 기다리는 최대 시간(초)
+SEARCH_MAX_ROWS = int(os.getenv("SEARCH_MAX_ROWS", "1000"))             # 응답에 넣는 최대 행 수
+
+
+def make_handler(ctx: search.SearchContext, slots: threading.BoundedSemaphore, queue_timeout: float, max_rows: int):
+    class QueryHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status: int, body: Dict[str, Any]):
+            data = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                # METRICS=1 일 때 모은 span/counter (Prometheus text 형식)
+                data = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                return
+            if self.path != "/health":
+                self._send_json(404, {"error": "not found"})
+                return
+            body = {"status": "ok", "embedding_cache": ctx.searcher.cache_stats(), "llm": ctx.llm.stats()}
+            if ctx.sql_cache is not None:
+                body["sql_cache"] = ctx.sql_cache.stats()
+            self._send_json(200, body)
+
+        def do_POST(self):
+            if self.path != "/query":
+                self._send_json(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", "0"))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                user_query = request["query"].strip()
+            except (ValueError, KeyError, AttributeError):
+                self._send_json(400, {"error": 'body must be JSON like {"query": "..."}'})
+                return
+
+            received = time.perf_counter()
+            if not slots.acquire(timeout=queue_timeout):
+                self._send_json(503, {"error": "server busy, try again later"})
+                return
+            try:
+                queued_ms = round((time.perf_counter() - received) * 1000, 1)
+                # 응답에 넣지 않을 행은 읽지 않도록 max_rows에서 query를 멈춤
+                result = search.answer_query(user_query, ctx, max_rows=max_rows)
+            except Exception as e:
+                traceback.print_exc()
+                self._send_json(500, {"query": user_query, "error": str(e)})
+                return
+            finally:
+                slots.release()
+
+            result["timings_ms"]["queued"] = queued_ms
+            self._send_json(200, result)
+
+        def log_message(self, format, *args):
+            print(f"[{self.log_date_time_string()}] {self.address_string()} {format % args}")
+
+    return QueryHandler
+
+
+def serve(config: Dict[str, Any], host: str = "127.0.0.1", port: int = 8800, concurrency: int = SEARCH_CONCURRENCY,
+          queue_timeout: float = SEARCH_QUEUE_TIMEOUT, max_rows: int = SEARCH_MAX_ROWS):
+    """
+    질문을 HTTP로 받는 server를 띄웁니다. embedding 모델과 Milvus/Ollama/MySQL 연결은 한 번만 만들고 모든 요청이 공유합니다.
+      POST /query  {"query": "..."}  -> {"tables", "sql", "rows", "row_count", "cached", "timings_ms", ...}
+      GET  /health
+      GET  /metrics  (METRICS=1 이면 단계별 시간과 counter, Prometheus text 형식)
+    동시에 처리하는 질문은 concurrency 개까지이며, queue_timeout 초 안에 자리가 나지 않으면 503을 돌려줍니다.
+    """
+    # 질문마다 pool의 MySQL connection 하나를 쓰는데 mysql.connector pool은 32개까지만 가질 수 있음
+    import mysql.connector.pooling
+    max_pool = getattr(mysql.connector.pooling, "CNX_POOL_MAXSIZE", 32)
+    if concurrency > max_pool:
+        print(f"⚠️ concurrency={concurrency}는 connection pool 한도를 넘으므로 {max_pool}개로 실행합니다.")
+        concurrency = max_pool
+    ctx = search.SearchContext(config, pool_size=concurrency)
+
+    # 첫 요청이 모델 로딩을 기다리지 않도록 미리 읽어 둠
+    t0 = time.perf_counter()
+    search.embedding.get_model()
+    ctx.catalog.refresh()
+    print(f"🔥 warm-up done in {time.perf_counter() - t0:.1f}s")
+
+    slots = threading.BoundedSemaphore(concurrency)
+    server = ThreadingHTTPServer((host, port), make_handler(ctx, slots, queue_timeout, max_rows))
+    server.daemon_threads = True
+    print(f"🚀 serving on http://{host}:{port} (concurrency={concurrency})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        ctx.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="search.py HTTP server mode")
+    parser.add_argument("--host", default=os.getenv("SEARCH_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SEARCH_PORT", "8800")))
+    parser.add_argument("--concurrency", type=int, default=SEARCH_CONCURRENCY)
+    args = parser.parse_args()
+    serve(search.load_config(), host=args.host, port=args.port, concurrency=args.concurrency)
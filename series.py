@@ -0,0 +1,156 @@
+import os
+import re
+
+# --- Configuration ---
+# SERIES_MODE=1 이면 파일 이름 끝에 연월이 붙은 파일(예: CARD_SUBWAY_MONTH_202406.csv)을
+# 연월을 뺀 이름의 table 하나에 월별 partition으로 로딩
+SERIES_MODE = os.getenv("SERIES_MODE", "0") == "1"
+# 날짜 column이 없는 series는 이 column(연월 INT)으로 partition
+MONTH_COLUMN = "series_month"
+MAX_PARTITION = "pmax"
+
+SERIES_PATTERNS = [
+    # CARD_SUBWAY_MONTH_202406.csv
+    re.compile(r"^(?P<base>.+?)[_\-]?(?P<year>(?:19|20)\d{2})(?P<month>0[1-9]|1[0-2])$"),
+    # 2024년_버스노선별_..._정보(11월).csv
+    re.compile(r"^(?P<year>(?:19|20)\d{2})년_?(?P<base>.+?)\((?P<month>\d{1,2})월\)$"),
+]
+
+
+def detect_series(filename):
+    """파일 이름에서 (series 이름, 연월 int)을 찾습니다. 연월이 없으면 None. 예) 'CARD_SUBWAY_MONTH_202406.csv' -> ('CARD_SUBWAY_MONTH', 202406)"""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    for pattern in SERIES_PATTERNS:
+        m = pattern.match(stem)
+        if m and 1 <= int(m.group("month")) <= 12:
+            base = m.group("base").strip("_- ")
+            if base:
+                return base, int(m.group("year")) * 100 + int(m.group("month"))
+    return None
+
+
+def next_month(month):
+    year, mon = divmod(month, 100)
+    return (year + 1) * 100 + 1 if mon == 12 else month + 1
+
+
+def partition_name(month):
+    return f"p{month}"
+
+
+def bound_literal(month, key_type):
+    """month partition의 상한 (다음 달 1일). 날짜 column이면 'YYYY-MM-01', 연월 column이면 YYYYMM"""
+    upper = next_month(month)
+    if key_type == "int":
+        return str(upper)
+    return f"'{upper // 100:04d}-{upper % 100:02d}-01'"
+
+
+def _bound_month(description):
+    """information_schema.PARTITIONS의 PARTITION_DESCRIPTION -> 상한 연월 int (MAXVALUE는 None)"""
+    value = description.strip().strip("'")
+    if value.upper() == "MAXVALUE":
+        return None
+    digits = re.sub(r"\D", "", value)
+    return int(digits[:6])
+
+
+def table_exists(cursor, db_name, table):
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s",
+        (db_name, table),
+    )
+    return cursor.fetchone()[0] > 0
+
+
+def column_types(cursor, db_name, table):
+    cursor.execute(
+        "SELECT COLUMN_NAME, COLUMN_TYPE FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s ORDER BY ORDINAL_POSITION",
+        (db_name, table),
+    )
+    return [(name, col_type) for name, col_type in cursor.fetchall()]
+
+
+def partition_key(cursor, db_name, table):
+    """(partition column, "date" 또는 "int")"""
+    cursor.execute(
+        "SELECT PARTITION_EXPRESSION FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s LIMIT 1",
+        (db_name, table),
+    )
+    column = cursor.fetchone()[0].strip("`")
+    return column, "int" if column == MONTH_COLUMN else "date"
+
+
+def list_partitions(cursor, db_name, table):
+    cursor.execute(
+        "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s ORDER BY PARTITION_ORDINAL_POSITION",
+        (db_name, table),
+    )
+    return cursor.fetchall()
+
+
+def create_series_table(cursor, table, template, key_column):
+    """template(첫 달을 로딩한 table)과 같은 구조에 key_column의 RANGE partition을 붙인 빈 table을 만듭니다."""
+    cursor.execute(f"CREATE TABLE `{table}` LIKE `{template}`")
+    cursor.execute(
+        f"ALTER TABLE `{table}` PARTITION BY RANGE COLUMNS(`{key_column}`) "
+        f"(PARTITION {MAX_PARTITION} VALUES LESS THAN (MAXVALUE))"
+    )
+
+
+def create_month_table(cursor, table, month_table):
+    """partition과 바꿀(EXCHANGE) 빈 table을 series table과 같은 구조로 만듭니다."""
+    cursor.execute(f"DROP TABLE IF EXISTS `{month_table}`")
+    cursor.execute(f"CREATE TABLE `{month_table}` LIKE `{table}`")
+    cursor.execute(f"ALTER TABLE `{month_table}` REMOVE PARTITIONING")
+
+
+def sync_columns(cursor, db_name, table, month_table):
+    """로딩 중 retry loop가 month table의 column을 넓혔으면 series table에도 같은 타입을 적용합니다."""
+    current = dict(column_types(cursor, db_name, table))
+    for name, col_type in column_types(cursor, db_name, month_table):
+        if current.get(name) != col_type:
+            print(f"🔧 series '{table}': column '{name}' {current.get(name)} -> {col_type}")
+            cursor.execute(f"ALTER TABLE `{table}` MODIFY `{name}` {col_type}")
+
+
+def ensure_partition(cursor, db_name, table, month, key_type):
+    """
+    month의 partition이 없으면 그 month를 담고 있는 partition(보통 pmax)을 둘로 나눕니다.
+    최신 달은 빈 pmax만 나누므로 데이터 복사가 없습니다.
+    """
+    name = partition_name(month)
+    partitions = list_partitions(cursor, db_name, table)
+    if any(p == name for p, _ in partitions):
+        return
+    for cover, description in partitions:
+        upper = _bound_month(description)
+        if upper is None or upper > month:
+            break
+    cursor.execute(
+        f"ALTER TABLE `{table}` REORGANIZE PARTITION {cover} INTO ("
+        f"PARTITION {name} VALUES LESS THAN ({bound_literal(month, key_type)}), "
+        f"PARTITION {cover} VALUES LESS THAN ({description}))"
+    )
+    print(f"🗓  {table}: partition {name} 추가")
+
+
+def exchange_month(cursor, table, month_table, month):
+    """
+    month table을 partition과 맞바꿉니다 (이전 내용은 month table로 나오고 삭제됨).
+    다른 달의 행이 섞여 있어 EXCHANGE가 거부되면 partition을 비우고 INSERT ... SELECT로 넣습니다.
+    """
+    import mysql.connector
+    name = partition_name(month)
+    try:
+        cursor.execute(f"ALTER TABLE `{table}` EXCHANGE PARTITION {name} WITH TABLE `{month_table}`")
+    except mysql.connector.Error as err:
+        if err.errno != 1737:   # Found a row that does not match the partition
+            raise
+        print(f"⚠️ {table}: {name} 범위 밖의 행이 있어 INSERT ... SELECT로 로딩")
+        cursor.execute(f"ALTER TABLE `{table}` TRUNCATE PARTITION {name}")
+        cursor.execute(f"INSERT INTO `{table}` SELECT * FROM `{month_table}`")
+    cursor.execute(f"DROP TABLE IF EXISTS `{month_table}`")
@@ -0,0 +1,236 @@
+import os
+import io
+import gzip
+import codecs
+import shutil
+import tarfile
+import zipfile
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# --- Configuration ---
+# 압축 파일 안의 CSV 인코딩. auto이면 앞부분으로 utf-8 / cp949를 판단하고, utf-8이면 나머지도 읽으면서 확인
+SOURCE_ENCODING = os.getenv("SOURCE_ENCODING", "auto")
+SOURCE_CHUNK_SIZE = 1 << 20
+ENCODING_PROBE_BYTES = 1 << 16
+
+ARCHIVE_SUFFIXES = (".tar.gz", ".tgz", ".tar", ".zip", ".gz")
+
+
+def is_archive(path):
+    return os.path.isfile(path) and path.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def dataset_name(path):
+    """database/collection 이름: 디렉토리 이름 또는 확장자를 뺀 압축 파일 이름"""
+    name = os.path.basename(os.path.normpath(path))
+    for suffix in ARCHIVE_SUFFIXES:
+        if name.lower().endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def detect_encoding(head):
+    """앞부분 byte로 인코딩을 정합니다: BOM이 있으면 utf-8-sig, utf-8로 읽히면 utf-8, 아니면 cp949"""
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        head.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError as e:
+        # 잘라서 읽은 끝부분의 멀티바이트 문자 때문이면 utf-8
+        if e.start >= len(head) - 3 and e.reason == "unexpected end of data":
+            return "utf-8"
+        return "cp949"
+
+
+class SourceStream(io.RawIOBase):
+    """
+    압축 파일 member 등의 binary stream을 읽으면서 utf-8로 변환합니다 (utf-8이면 그대로 전달).
+    fallback이 있으면 utf-8도 끝까지 strict하게 확인하면서 전달하고, utf-8이 아닌 byte가 나오면
+    그 줄부터는 fallback 인코딩으로 변환하고 on_fallback(그 줄의 위치)를 호출합니다
+    (앞부분만 보고 utf-8로 정한 경우).
+    close()하면 열어 둔 압축 파일도 닫습니다.
+    """
+
+    def __init__(self, raw, encoding, closers=(), fallback=None, on_fallback=None):
+        self.raw = raw
+        self.closers = list(closers)
+        self.fallback = fallback
+        self.on_fallback = on_fallback
+        self.decoder = None if encoding == "utf-8" else codecs.getincrementaldecoder(encoding)(errors="replace")
+        self.validator = codecs.getincrementaldecoder("utf-8")("strict") if encoding == "utf-8" and fallback else None
+        self.offset = 0   # utf-8로 확인하고 내보낸 byte 수
+        self.pending = b""
+        self.eof = False
+
+    def _convert(self, chunk, final=False):
+        if self.validator is not None:
+            # 앞 chunk 끝의 아직 확인하지 않은 멀티바이트 일부 + 이번 chunk
+            data = self.validator.getstate()[0] + chunk
+            try:
+                self.validator.decode(chunk, final=final)
+            except UnicodeDecodeError as e:
+                # cp949 글자 중에는 utf-8로도 읽히는 byte 쌍이 있어서 (예: 홍) 오류 위치 조금 앞부터 cp949일 수 있음.
+                # 그 줄의 처음까지는 utf-8로 내보내고 그 줄부터 fallback으로 변환
+                start = data.rfind(b"\n", 0, e.start) + 1
+                self.validator = None
+                self.decoder = codecs.getincrementaldecoder(self.fallback)(errors="replace")
+                if self.on_fallback is not None:
+                    self.on_fallback(self.offset + start)
+                return data[:start] + self.decoder.decode(data[start:], final=final).encode("utf-8")
+            # 확인된 부분만 내보내고 끝의 미완성 문자는 다음 chunk와 함께 확인
+            confirmed = len(data) - len(self.validator.getstate()[0])
+            self.offset += confirmed
+            return data[:confirmed]
+        if self.decoder is None:
+            return chunk
+        return self.decoder.decode(chunk, final=final).encode("utf-8")
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self.pending and not self.eof:
+            chunk = self.raw.read(SOURCE_CHUNK_SIZE)
+            if not chunk:
+                self.eof = True
+                self.pending = self._convert(b"", final=True)
+                break
+            self.pending = self._convert(chunk)
+        n = min(len(b), len(self.pending))
+        b[:n] = self.pending[:n]
+        self.pending = self.pending[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            for closer in reversed(self.closers):
+                closer.close()
+        super().close()
+
+
+class Source:
+    """
+    CSV 한 개. 디렉토리의 파일이거나 .tar.gz/.zip/.gz 안의 member입니다.
+    open()은 압축을 풀고 utf-8로 변환한 stream을 매번 처음부터 돌려줍니다 (임시 파일을 만들지 않음).
+    """
+
+    def __init__(self, origin, member=None, kind="file", encoding=SOURCE_ENCODING):
+        self.origin = origin
+        self.member = member
+        self.kind = kind
+        self.encoding = encoding
+        self.fallback_at = None   # 마지막 open()에서 utf-8이 아닌 byte가 처음 나온 위치
+        self.name = os.path.basename(member or origin)
+        if kind == "gz" and self.name.lower().endswith(".gz"):
+            self.name = self.name[:-3]
+
+    @property
+    def table_name(self):
+        return os.path.splitext(self.name)[0]
+
+    def __repr__(self):
+        return f"Source({self.origin}!{self.member})" if self.member else f"Source({self.origin})"
+
+    def _open_raw(self):
+        """(압축을 푼 binary stream, 닫을 객체들)"""
+        if self.kind == "tar":
+            archive = tarfile.open(self.origin, "r:*")
+            return archive.extractfile(self.member), [archive]
+        if self.kind == "zip":
+            archive = zipfile.ZipFile(self.origin)
+            return archive.open(self.member), [archive]
+        if self.kind == "gz":
+            f = gzip.open(self.origin, "rb")
+            return f, []
+        f = open(self.origin, "rb")
+        return f, []
+
+    def open(self):
+        raw, closers = self._open_raw()
+        closers = closers + [raw]
+        reader = io.BufferedReader(raw, SOURCE_CHUNK_SIZE)
+        encoding = self.encoding
+        fallback = None
+        if encoding == "auto":
+            encoding = detect_encoding(reader.peek(ENCODING_PROBE_BYTES)[:ENCODING_PROBE_BYTES])
+            # 앞부분이 ASCII뿐인 cp949 파일도 있으므로 utf-8로 정했으면 나머지를 읽으면서 확인
+            fallback = "cp949" if encoding == "utf-8" else None
+        self.fallback_at = None
+        stream = SourceStream(reader, encoding, closers, fallback, on_fallback=self._fell_back)
+        return io.BufferedReader(stream, SOURCE_CHUNK_SIZE)
+
+    def _fell_back(self, offset):
+        # stream을 읽는 thread(named pipe writer 등)에서 호출되므로 기록만 하고 출력은 report_fallback()에서
+        self.fallback_at = offset
+
+
+def report_fallback(source):
+    """마지막으로 읽은 stream이 도중에 cp949로 바뀌었으면 (인코딩이 섞인 파일) 알립니다."""
+    if source.fallback_at is not None:
+        print(f"⚠️ {source}: {source.fallback_at} byte부터 utf-8이 아니어서 그 뒤는 cp949로 변환했습니다 (인코딩이 섞인 파일).")
+
+
+def list_sources(path):
+    """디렉토리의 .csv 파일 또는 압축 파일 안의 .csv member 목록"""
+    if os.path.isdir(path):
+        return [Source(os.path.join(path, f)) for f in sorted(os.listdir(path)) if f.endswith(".csv")]
+    lower = path.lower()
+    if lower.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            return [Source(path, name, "zip") for name in archive.namelist() if name.endswith(".csv")]
+    if lower.endswith((".tar.gz", ".tgz", ".tar")):
+        with tarfile.open(path, "r:*") as archive:
+            return [Source(path, m.name, "tar") for m in archive.getmembers() if m.isfile() and m.name.endswith(".csv")]
+    if lower.endswith(".gz"):
+        return [Source(path, kind="gz")]
+    raise ValueError(f"unsupported source: {path}")
+
+
+def open_csv(source):
+    """파일 경로 또는 Source를 binary stream으로 엽니다 (pd.read_csv에 그대로 전달)."""
+    if isinstance(source, Source):
+        return source.open()
+    return open(source, "rb")
+
+
+@contextmanager
+def local_infile(source):
+    """
+    Source를 named pipe(FIFO)로 흘려보내고 그 경로를 돌려줍니다. LOAD DATA LOCAL INFILE '<경로>'에 사용합니다.
+    client(mysql.connector)가 pipe를 읽는 동안 thread가 압축 해제와 인코딩 변환을 하며 쓰므로 디스크에는 아무것도 쓰지 않습니다.
+    """
+    tmpdir = tempfile.mkdtemp(prefix="csv2mysql_")
+    path = os.path.join(tmpdir, source.name)
+    os.mkfifo(path)
+    errors = []
+
+    def feed():
+        try:
+            with open(path, "wb") as fifo, source.open() as stream:
+                shutil.copyfileobj(stream, fifo, SOURCE_CHUNK_SIZE)
+        except BrokenPipeError:
+            pass   # LOAD DATA가 실패해서 읽는 쪽이 먼저 닫힘
+        except Exception as e:
+            errors.append(e)
+
+    writer = threading.Thread(target=feed, daemon=True)
+    writer.start()
+    try:
+        yield path
+    finally:
+        while writer.is_alive():
+            # 읽는 쪽이 pipe를 열지 않았거나 중간에 닫았으면 읽는 쪽을 열고 닫아서 writer를 끝냄
+            try:
+                fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+                os.close(fd)
+            except OSError:
+                pass
+            writer.join(0.1)
+        os.unlink(path)
+        os.rmdir(tmpdir)
+    if errors:
+        raise errors[0]
+    report_fallback(source)
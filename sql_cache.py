@@ -0,0 +1,292 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import calendar
+import datetime
+import difflib
+import threading
+from typing import List, Dict, Any, Optional, Callable
+
+import numpy as np
+
+# --- Configuration ---
+SQL_CACHE_DIR = os.getenv("SQL_CACHE_DIR", os.path.expanduser("~/.cache/csv2mysql"))
+SQL_CACHE_THRESHOLD = float(os.getenv("SQL_CACHE_THRESHOLD", "0.97"))
+# 날짜/역 이름 등 값만 다른 질문에 SQL 모양을 재사용할 때의 유사도 기준
+SQL_CACHE_TEMPLATE_THRESHOLD = float(os.getenv("SQL_CACHE_TEMPLATE_THRESHOLD", "0.85"))
+SQL_CACHE_MAX_REPLACEMENTS = 3
+# 이보다 많으면 오래된 항목부터 지움
+SQL_CACHE_MAX_ENTRIES = int(os.getenv("SQL_CACHE_MAX_ENTRIES", "10000"))
+
+TOKEN_PATTERN = re.compile(r"\d+|[가-힣]+|[A-Za-z]+|\S")
+SQL_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'")
+
+
+def tokenize(question: str) -> List[str]:
+    """숫자, 한글, 영문 단위로 자릅니다. 예) '2024년5월 망포' -> ['2024', '년', '5', '월', '망포']"""
+    return TOKEN_PATTERN.findall(question)
+
+
+def _replace_in_literals(sql: str, mapping: Dict[str, str]) -> Optional[str]:
+    """
+    SQL의 literal 안에서만 mapping(old -> new)의 값을 한 번에 바꿉니다 (column 이름 등은 그대로). 바꾼 곳이 없으면 None.
+    regex 한 번으로 바꾸므로 앞에서 바꾼 값을 뒤의 치환이 다시 바꾸지 않습니다 (5 -> 6, 6 -> 7).
+    - 따옴표 문자열 literal: 부분 문자열도 바꾸며, 숫자는 앞의 0을 유지 (예: '2024-05-01'에서 5 -> 6 이면 '2024-06-01')
+    - 따옴표 밖: 숫자 값만 단독 literal일 때 바꿈 (예: = 5)
+    """
+    numbers = {old.lstrip("0") or "0": new for old, new in mapping.items() if old.isdigit() and new.isdigit()}
+    words = {old: new for old, new in mapping.items() if not (old.isdigit() and new.isdigit())}
+    if len(numbers) + len(words) != len(mapping):
+        return None   # 05와 5처럼 같은 숫자가 다른 값으로 바뀌는 경우
+
+    alternatives = []
+    if numbers:
+        digits = "|".join(re.escape(n) for n in sorted(numbers, key=len, reverse=True))
+        alternatives.append(r"(?<!\d)(?P<num>0*(?:" + digits + r"))(?!\d)")
+    if words:
+        alternatives.append("(?P<word>" + "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True)) + ")")
+    in_string = re.compile("|".join(alternatives))
+    outside_string = None
+    if numbers:
+        outside_string = re.compile(r"(?<![\w.])(?P<num>" + "|".join(
+            re.escape(old) for old in mapping if old.isdigit() and mapping[old].isdigit()) + r")(?![\w.])")
+
+    def replace_string(m):
+        value = m.groupdict().get("num")
+        if value is not None:
+            return numbers[value.lstrip("0") or "0"].zfill(len(value))
+        return words[m.group("word")]
+
+    def replace_outside(m):
+        return numbers[m.group("num").lstrip("0") or "0"]
+
+    count = 0
+    parts = []
+    last = 0
+    for m in list(SQL_STRING_LITERAL.finditer(sql)) + [None]:
+        outside = sql[last:m.start()] if m else sql[last:]
+        if outside_string is not None:
+            outside, n = outside_string.subn(replace_outside, outside)
+            count += n
+        parts.append(outside)
+        if m:
+            literal, n = in_string.subn(replace_string, m.group(0))
+            if n and not _dates_still_valid(m.group(0), literal):
+                return None
+            count += n
+            parts.append(literal)
+            last = m.end()
+    return "".join(parts) if count else None
+
+
+DATE_IN_LITERAL = re.compile(r"(?<!\d)(\d{4})(-?)(\d{1,2})\2(\d{1,2})(?!\d)")
+
+
+def _dates_still_valid(old_literal: str, new_literal: str) -> bool:
+    """
+    값을 바꾼 literal의 날짜가 모두 실제 날짜인지 확인합니다.
+    원래 날짜가 월말(예: '2024-06-30')이었는데 바뀐 날짜가 그 달의 월말이 아니면('2024-07-30') 뜻이 모호하므로 False.
+    """
+    old_dates = DATE_IN_LITERAL.findall(old_literal)
+    new_dates = DATE_IN_LITERAL.findall(new_literal)
+    if len(old_dates) != len(new_dates):
+        return False
+    for (oy, _, om, od), (ny, _, nm, nd) in zip(old_dates, new_dates):
+        try:
+            old_date = datetime.date(int(oy), int(om), int(od))
+            new_date = datetime.date(int(ny), int(nm), int(nd))
+        except ValueError:
+            return False
+        old_month_end = calendar.monthrange(old_date.year, old_date.month)[1]
+        new_month_end = calendar.monthrange(new_date.year, new_date.month)[1]
+        if old_date != new_date and old_date.day == old_month_end and new_date.day != new_month_end:
+            return False
+    return True
+
+
+def adapt_sql(cached_question: str, question: str, sql: str) -> Optional[str]:
+    """
+    cached_question과 question이 몇 개의 값(숫자, 이름)만 다르면 그 값을 SQL literal에서 바꿔 반환합니다.
+    바꿀 값이 SQL에서 발견되지 않거나, 질문 구조가 다르거나, 바꾼 날짜가 올바르지 않으면 None.
+    """
+    old_tokens, new_tokens = tokenize(cached_question), tokenize(question)
+    matcher = difflib.SequenceMatcher(a=old_tokens, b=new_tokens, autojunk=False)
+    mapping: Dict[str, str] = {}
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op == "equal":
+            continue
+        if op != "replace" or (i2 - i1) != (j2 - j1):
+            return None
+        for old, new in zip(old_tokens[i1:i2], new_tokens[j1:j2]):
+            if mapping.setdefault(old, new) != new:
+                return None   # 같은 값이 두 가지로 바뀜
+    if not mapping or len(mapping) > SQL_CACHE_MAX_REPLACEMENTS:
+        return None
+
+    adapted = _replace_in_literals(sql, mapping)
+    if adapted is None:
+        return None
+    # 바꿀 값마다 SQL 안에서 실제로 바뀐 곳이 있어야 함
+    for old, new in mapping.items():
+        if _replace_in_literals(sql, {old: new}) is None:
+            return None
+    return adapted
+
+
+class SQLCache:
+    """
+    (질문 embedding -> 선택한 table, 생성한 SQL) cache.
+    - 유사도가 threshold 이상이고 질문의 값(숫자, 이름)이 같으면 그대로 재사용
+    - templates=True이면 값만 다른 질문은 SQL literal의 값을 바꿔 재사용
+    - 저장할 때의 table 버전(SchemaCatalog.table_version)이 바뀐 항목은 사용하지 않고 지움
+    - 같은 질문은 한 항목만 유지하고, max_entries를 넘으면 오래된 항목부터 지움
+    """
+
+    def __init__(self, cache_dir: str = SQL_CACHE_DIR, threshold: float = SQL_CACHE_THRESHOLD,
+                 templates: bool = False, template_threshold: float = SQL_CACHE_TEMPLATE_THRESHOLD,
+                 max_entries: int = SQL_CACHE_MAX_ENTRIES):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "sql_cache.sqlite")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.templates = templates
+        self.template_threshold = template_threshold
+        self.hits = 0
+        self.template_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS sql_cache (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                question TEXT NOT NULL,
+                dense BLOB NOT NULL,
+                tables TEXT NOT NULL,
+                versions TEXT NOT NULL,
+                sql TEXT NOT NULL,
+                created REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+        self._load()
+
+    def _load(self):
+        rows = self._conn.execute("SELECT id, question, dense, tables, versions, sql FROM sql_cache ORDER BY id").fetchall()
+        self.entries = [
+            {
+                "id": row[0],
+                "question": row[1],
+                "tables": json.loads(row[3]),
+                "versions": json.loads(row[4]),
+                "sql": row[5],
+            }
+            for row in rows
+        ]
+        vectors = [np.frombuffer(row[2], dtype=np.float32) for row in rows]
+        self.matrix = np.stack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+    @staticmethod
+    def _unit(vec) -> np.ndarray:
+        vec = np.asarray(vec, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def lookup(self, question: str, dense, table_version: Callable[[str], str]) -> Optional[Dict[str, Any]]:
+        """
+        hit이면 {"tables", "sql", "score", "cached_question", "templated"}를, 아니면 None을 반환합니다.
+        table_version(table)은 현재 table 버전 문자열을 돌려주는 함수입니다.
+        """
+        with self._lock:
+            if not self.entries:
+                self.misses += 1
+                return None
+            scores = self.matrix @ self._unit(dense)
+            order = np.argsort(-scores)
+
+            for idx in order:
+                score = float(scores[idx])
+                if score < min(self.threshold, self.template_threshold if self.templates else self.threshold):
+                    break
+                entry = self.entries[idx]
+                if any(table_version(t) != v for t, v in entry["versions"].items()):
+                    continue   # schema가 바뀐 항목은 아래에서 지움
+
+                sql = None
+                templated = False
+                if score >= self.threshold and tokenize(entry["question"]) == tokenize(question):
+                    sql = entry["sql"]
+                elif self.templates and score >= self.template_threshold:
+                    sql = adapt_sql(entry["question"], question, entry["sql"])
+                    templated = sql is not None and sql != entry["sql"]
+                if sql is None:
+                    continue
+
+                if templated:
+                    self.template_hits += 1
+                else:
+                    self.hits += 1
+                return {
+                    "tables": entry["tables"],
+                    "sql": sql,
+                    "score": score,
+                    "cached_question": entry["question"],
+                    "templated": templated,
+                }
+
+            self.misses += 1
+            self._expire(table_version)
+            return None
+
+    def _expire(self, table_version: Callable[[str], str]):
+        stale = [e["id"] for e in self.entries if any(table_version(t) != v for t, v in e["versions"].items())]
+        if stale:
+            self._conn.executemany("DELETE FROM sql_cache WHERE id = ?", [(i,) for i in stale])
+            self._conn.commit()
+            self._load()
+
+    def _drop(self, ids: List[int]):
+        """ids 항목을 SQLite와 메모리 index에서 지웁니다 (commit은 호출한 쪽에서)."""
+        self._conn.executemany("DELETE FROM sql_cache WHERE id = ?", [(i,) for i in ids])
+        dropped = set(ids)
+        keep = [i for i, e in enumerate(self.entries) if e["id"] not in dropped]
+        self.entries = [self.entries[i] for i in keep]
+        self.matrix = self.matrix[keep] if keep else np.zeros((0, 0), dtype=np.float32)
+
+    def store(self, question: str, dense, tables: List[str], table_version: Callable[[str], str], sql: str):
+        """
+        실행에 성공한 SQL만 저장합니다. 같은 질문이 현재 table 버전으로 이미 있으면 저장하지 않고,
+        이전 버전으로 저장된 같은 질문은 바꿔 넣습니다.
+        """
+        versions = {t: table_version(t) for t in tables}
+        with self._lock:
+            same = [e for e in self.entries if e["question"] == question]
+            if any(e["tables"] == tables and e["versions"] == versions for e in same):
+                return
+            if same:
+                self._drop([e["id"] for e in same])
+            cur = self._conn.execute(
+                "INSERT INTO sql_cache (question, dense, tables, versions, sql, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (question, self._unit(dense).tobytes(), json.dumps(tables, ensure_ascii=False),
+                 json.dumps(versions, ensure_ascii=False), sql, time.time()),
+            )
+            # 새 항목만 메모리 index에 추가 (전체를 다시 읽지 않음)
+            vec = self._unit(dense)
+            self.entries.append({"id": cur.lastrowid, "question": question, "tables": tables,
+                                 "versions": versions, "sql": sql})
+            self.matrix = np.vstack([self.matrix, vec[None, :]]) if len(self.matrix) else vec[None, :].copy()
+            if self.max_entries and len(self.entries) > self.max_entries:
+                self._drop([e["id"] for e in self.entries[:len(self.entries) - self.max_entries]])
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.template_hits + self.misses
+        return {
+            "hits": self.hits,
+            "template_hits": self.template_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.template_hits) / total if total else 0.0,
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+        }
@@ -0,0 +1,56 @@
+import re
+
+import csv2mysql
+
+
+def test_parse_set_expressions_with_several_date_columns():
+    columns = ["사용일자", "승차", "기준일", "등록일"]
+    resolved = ["date(%Y%m%d)", "int", "date(%m-%d-%Y)", "date(%Y-%m-%d)"]
+    _, fields, set_stm = csv2mysql.build_type_statements(columns, resolved)
+    exprs = csv2mysql.parse_set_expressions(fields, set_stm)
+    assert sorted(exprs) == ["기준일", "등록일", "사용일자"]
+    temp_var, expr = exprs["기준일"]
+    assert expr == f"STR_TO_DATE({temp_var}, '%m-%d-%Y')"
+
+
+def test_conversion_sql_uses_str_to_date_for_every_date_column():
+    columns = ["사용일자", "승차", "기준일"]
+    _, fields, set_stm = csv2mysql.build_type_statements(columns, ["date(%Y%m%d)", "int", "date(%m-%d-%Y)"])
+    exprs = csv2mysql.parse_set_expressions(fields, set_stm)
+    expr, valid = csv2mysql.conversion_sql("기준일", "DATE", exprs)
+    assert expr == "STR_TO_DATE(NULLIF(`기준일`, ''), '%m-%d-%Y')"
+    assert "STR_TO_DATE(`기준일`, '%m-%d-%Y') IS NOT NULL" in valid
+
+
+def test_pool_name_is_valid_for_korean_directory():
+    # mysql.connector.pooling.CNX_POOL_NAMEREGEX, CNX_POOL_MAXNAMESIZE
+    name = csv2mysql.pool_name("서울교통")
+    assert re.fullmatch(r"[a-zA-Z0-9._:\-*$#]{1,64}", name)
+    assert name != csv2mysql.pool_name("부산교통")
+
+
+def test_rollup_failure_does_not_skip_other_tables(monkeypatch):
+    class Conn:
+        def cursor(self):
+            return self
+
+        def rollback(self):
+            pass
+
+        def close(self):
+            pass
+
+    refreshed = []
+
+    def maintain(conn, cursor, db_name, table, *args):
+        if table == "a":
+            raise RuntimeError("refresh failed")
+        refreshed.append(table)
+
+    monkeypatch.setattr(csv2mysql.rollup, "ROLLUP", True)
+    monkeypatch.setattr(csv2mysql.rollup, "maintain", maintain)
+    monkeypatch.setattr(csv2mysql.rollup, "load_declared", lambda: {})
+    monkeypatch.setattr(csv2mysql.mysql.connector, "connect", lambda **kw: Conn(), raising=False)
+    plans = [{"status": "appended", "schema": {"table_name": t}} for t in ("a", "b", "c")]
+    csv2mysql.refresh_rollups("db", plans)
+    assert refreshed == ["b", "c"]
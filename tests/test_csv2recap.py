@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import csv2recap
+
+
+def test_old_summary_is_kept_when_embedding_fails(tmp_path, monkeypatch):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a.csv").write_text("x\n1\n", encoding="utf-8")
+
+    class Store:
+        deleted = []
+
+        def delete(self, filenames):
+            self.deleted.extend(filenames)
+
+    store = Store()
+
+    def fail(summaries):
+        raise RuntimeError("embedding failed")
+
+    monkeypatch.setattr(csv2recap.vector_catalog, "open_catalog", lambda name, uri=None: store)
+    monkeypatch.setattr(csv2recap, "summarize_csv_file", lambda *args: ("summary", 1, 1))
+    monkeypatch.setattr(csv2recap, "generate_embeddings", fail)
+    with pytest.raises(RuntimeError):
+        csv2recap.recap_csv_files(str(data), incremental=False)
+    assert store.deleted == []
+
+
+def test_import_does_not_load_pandas():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = "import sys, csv2recap; print('pandas' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
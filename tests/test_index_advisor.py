@@ -0,0 +1,17 @@
+import index_advisor
+
+
+def test_query_log_rotates_at_max_bytes(tmp_path):
+    path = str(tmp_path / "query_log.jsonl")
+    for i in range(20):
+        index_advisor.log_query(f"SELECT {i}", ["t"], 1.0, path=path, max_bytes=200)
+
+    assert (tmp_path / "query_log.jsonl").stat().st_size < 400
+    entries = index_advisor.read_query_log(path)
+    assert entries[-1]["sql"] == "SELECT 19"
+    assert len(entries) < 20   # 두 번 이상 rotate된 오래된 기록은 지워짐
+
+
+def test_query_log_is_off_without_path(tmp_path):
+    index_advisor.log_query("SELECT 1", ["t"], 1.0, path="")
+    assert index_advisor.read_query_log("") == []
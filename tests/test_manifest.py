@@ -0,0 +1,30 @@
+import manifest
+
+
+def test_stages_use_separate_files(tmp_path):
+    csv = tmp_path / "a.csv"
+    csv.write_text("x,y\n1,2\n", encoding="utf-8")
+    mysql_manifest = manifest.Manifest("db", "mysql", manifest_dir=str(tmp_path))
+    recap_manifest = manifest.Manifest("db", "recap", manifest_dir=str(tmp_path))
+    mysql_manifest.record(manifest.snapshot(str(csv)))
+    recap_manifest.record(manifest.snapshot(str(csv)), summary="s")
+    # 두 단계가 각자 저장해도 다른 단계의 기록이 지워지지 않음
+    recap_manifest.save()
+    mysql_manifest.save()
+
+    assert manifest.Manifest("db", "mysql", manifest_dir=str(tmp_path)).check(str(csv))[0] == "unchanged"
+    assert manifest.Manifest("db", "recap", manifest_dir=str(tmp_path)).get(str(csv))["summary"] == "s"
+
+
+def test_rows_appended_during_load_are_not_recorded(tmp_path):
+    csv = tmp_path / "a.csv"
+    csv.write_text("x\n1\n", encoding="utf-8")
+    m = manifest.Manifest("db", "mysql", manifest_dir=str(tmp_path))
+    state = manifest.snapshot(str(csv))
+    with open(csv, "a", encoding="utf-8") as f:   # 로딩하는 동안 추가된 행
+        f.write("2\n")
+    m.record(state)
+
+    status, entry = m.check(str(csv))
+    assert status == "appended"
+    assert entry["lines"] == 2
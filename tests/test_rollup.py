@@ -0,0 +1,40 @@
+import sqlite3
+
+import rollup
+
+DEFN = {"name": "rides__rollup_raw", "source": "rides", "period_column": "series_month", "grain": "raw",
+        "dimensions": ["line"], "measures": ["riders"]}
+
+
+def _setup(rows):
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE rides (series_month INTEGER, line TEXT, riders INTEGER)")
+    cursor.executemany("INSERT INTO rides VALUES (?, ?, ?)", rows)
+    cursor.execute(f"CREATE TABLE `{DEFN['name']}` AS {rollup.select_sql(DEFN)}")
+    conn.commit()
+    return conn, cursor
+
+
+def _rollup(cursor):
+    cursor.execute(f"SELECT period, line, riders, row_count FROM `{DEFN['name']}` ORDER BY 1, 2")
+    return cursor.fetchall()
+
+
+def test_appended_rows_refresh_from_last_period():
+    conn, cursor = _setup([(202401, "1호선", 10), (202402, "1호선", 20)])
+    cursor.executemany("INSERT INTO rides VALUES (?, ?, ?)", [(202402, "1호선", 5), (202403, "2호선", 7)])
+    conn.commit()
+
+    assert rollup.refresh_appended(conn, cursor, DEFN)
+    assert _rollup(cursor) == [(202401, "1호선", 10, 1), (202402, "1호선", 25, 2), (202403, "2호선", 7, 1)]
+
+
+def test_backdated_rows_are_rolled_back_for_full_rebuild():
+    conn, cursor = _setup([(202401, "1호선", 10), (202402, "1호선", 20)])
+    before = _rollup(cursor)
+    cursor.execute("INSERT INTO rides VALUES (202312, '1호선', 3)")
+    conn.commit()
+
+    assert not rollup.refresh_appended(conn, cursor, DEFN)
+    assert _rollup(cursor) == before
@@ -0,0 +1,64 @@
+import search
+
+
+def _hits(*scores):
+    return [{"filename": f"t{i}", "score": s} for i, s in enumerate(scores)]
+
+
+def test_auto_accept_ignores_gap_in_the_tail():
+    hits = _hits(0.60, 0.59, 0.58, 0.57, 0.56, 0.55, 0.54, 0.53, 0.30)
+    assert search.auto_accept_count(hits, gap=0.15) == 0
+
+
+def test_auto_accept_clear_leader_only():
+    assert search.auto_accept_count(_hits(0.90, 0.50, 0.45), gap=0.15) == 1
+    assert search.auto_accept_count(_hits(0.90, 0.85, 0.50), gap=0.15) == 0
+    assert search.auto_accept_count(_hits(0.90, 0.85, 0.50), gap=0.15, max_auto=2) == 2
+
+
+class _Catalog(search.SchemaCatalog):
+    """information_schema 대신 dict에서 읽는 SchemaCatalog"""
+
+    def __init__(self, tables):
+        class MySQL:
+            database = "db"
+        super().__init__(MySQL(), check_interval=60)
+        self.data = tables
+        self.queries = []
+
+    def _query(self, sql, params=()):
+        self.queries.append(sql)
+        if "information_schema.TABLES" in sql:
+            names = [params[1]] if len(params) > 1 else list(self.data)
+            return [((n, "c", "u") if len(params) == 1 else ("c", "u")) for n in names if n in self.data]
+        if len(params) > 1:
+            return [(c, "int", "YES", "") for c in self.data.get(params[1], [])]
+        return [(t, c, "int", "YES", "") for t, cols in self.data.items() for c in cols]
+
+
+def test_catalog_remembers_missing_tables():
+    catalog = _Catalog({"a": ["x"]})
+    catalog.describe("a")
+    full = len(catalog.queries)
+    assert catalog.describe("nope") == []
+    assert catalog.describe("nope") == []
+    # 없는 table은 그 table만 한 번 조회하고 catalog 전체는 다시 읽지 않음
+    assert len(catalog.queries) == full + 2
+    assert not any("ORDER BY TABLE_NAME" in q for q in catalog.queries[full:])
+
+
+def test_catalog_invalidates_only_the_named_table():
+    catalog = _Catalog({"a": ["x"], "b": ["y"]})
+    catalog.describe("a")
+    catalog.data["a"] = ["x", "z"]
+    catalog.invalidate("a")
+    full = len(catalog.queries)
+    assert [c["Field"] for c in catalog.describe("a")] == ["x", "z"]
+    assert not any("ORDER BY TABLE_NAME" in q for q in catalog.queries[full:])
+    assert catalog.describe("b")[0]["Field"] == "y"
+
+
+def test_ollama_client_keeps_timeout_parameter():
+    client = search.OllamaClient("http://localhost:11434", "m", timeout=7)
+    assert client.client.timeout == 7
+    assert search.OllamaClient("http://localhost:11434", "m", 7).client is client.client
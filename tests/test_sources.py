@@ -0,0 +1,44 @@
+import gzip
+
+import sources
+
+
+def _read(path):
+    with sources.Source(str(path), kind="gz").open() as stream:
+        return stream.read().decode("utf-8")
+
+
+def test_cp949_after_ascii_probe_is_converted(tmp_path):
+    # 앞 64KB는 ASCII뿐이고 뒤에 cp949 한글이 나오는 파일
+    head = "id,name\n" + "".join(f"{i},abc\n" for i in range(20000))
+    tail = "20000,홍길동\n"
+    path = tmp_path / "people.csv.gz"
+    with gzip.open(path, "wb") as f:
+        f.write((head + tail).encode("cp949"))
+
+    assert len(head) > sources.ENCODING_PROBE_BYTES
+    assert _read(path) == head + tail
+
+
+def test_utf8_split_across_chunks_is_passed_through(tmp_path):
+    text = "id,name\n" + "".join(f"{i},홍길동\n" for i in range(30000))
+    path = tmp_path / "people.csv.gz"
+    with gzip.open(path, "wb") as f:
+        f.write(text.encode("utf-8"))
+
+    assert _read(path) == text
+
+
+def test_utf8_before_bad_byte_is_kept_when_falling_back(tmp_path):
+    # 같은 chunk 안에서 utf-8 한글 뒤에 cp949 한글이 나오는 파일 (인코딩이 섞인 파일)
+    head = "id,name\n" + "".join(f"{i},홍길동\n" for i in range(8000))
+    tail = "8000,김철수\n"
+    path = tmp_path / "people.csv.gz"
+    with gzip.open(path, "wb") as f:
+        f.write(head.encode("utf-8") + tail.encode("cp949"))
+
+    source = sources.Source(str(path), kind="gz")
+    with source.open() as stream:
+        text = stream.read().decode("utf-8")
+    assert text == head + tail
+    assert source.fallback_at == len(head.encode("utf-8"))
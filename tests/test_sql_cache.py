@@ -0,0 +1,59 @@
+import numpy as np
+
+import sql_cache
+from sql_cache import adapt_sql
+
+RANGE_SQL = "SELECT SUM(승차) FROM t WHERE 사용일자 BETWEEN '2024-05-01' AND '2024-06-30' AND 역명 = '망포'"
+
+
+def test_overlapping_months_are_not_rewritten_twice():
+    # 5 -> 6, 6 -> 7: 한 번에 바꾸므로 '2024-06-01'이 다시 '2024-07-01'이 되지 않음
+    sql = "SELECT 1 FROM t WHERE 사용일자 BETWEEN '2024-05-01' AND '2024-06-15'"
+    adapted = adapt_sql("2024년5월과 6월 망포", "2024년6월과 7월 망포", sql)
+    assert adapted == "SELECT 1 FROM t WHERE 사용일자 BETWEEN '2024-06-01' AND '2024-07-15'"
+
+
+def test_month_end_shift_falls_back_to_llm():
+    # '2024-06-30' -> '2024-07-30'은 날짜로는 맞지만 월말이 아니므로 재사용하지 않음
+    assert adapt_sql("2024년5월과 6월 망포", "2024년6월과 7월 망포", RANGE_SQL) is None
+
+
+def test_invalid_month_end_date_falls_back_to_llm():
+    sql = "SELECT 1 FROM t WHERE 사용일자 BETWEEN '2024-05-01' AND '2024-05-31'"
+    assert adapt_sql("2024년5월 망포", "2024년6월 망포", sql) is None
+
+
+def test_name_and_number_replacement():
+    adapted = adapt_sql("2024년5월 망포 승차", "2024년5월 강남 승차", RANGE_SQL)
+    assert adapted == RANGE_SQL.replace("망포", "강남")
+    assert adapt_sql("2024년 5월 승차", "2024년 4월 승차", "SELECT 1 FROM t WHERE m = 5") == "SELECT 1 FROM t WHERE m = 4"
+
+
+def test_value_missing_from_sql_is_rejected():
+    assert adapt_sql("2024년5월 망포", "2024년5월 강남", "SELECT 1 FROM t WHERE m = 5") is None
+
+
+def test_store_appends_to_memory_index(tmp_path):
+    cache = sql_cache.SQLCache(cache_dir=str(tmp_path))
+    vec = np.ones(4, dtype=np.float32)
+    cache.store("망포 승차", vec, ["t"], lambda t: "v1", "SELECT 1")
+    cache.store("강남 승차", -vec, ["t"], lambda t: "v1", "SELECT 2")
+    assert [e["sql"] for e in cache.entries] == ["SELECT 1", "SELECT 2"]
+    assert cache.lookup("강남 승차", -vec, lambda t: "v1")["sql"] == "SELECT 2"
+    # 다시 열면 같은 항목
+    assert len(sql_cache.SQLCache(cache_dir=str(tmp_path)).entries) == 2
+
+
+def test_store_skips_duplicates_and_evicts_oldest(tmp_path):
+    cache = sql_cache.SQLCache(cache_dir=str(tmp_path), max_entries=2)
+    vecs = np.eye(4, dtype=np.float32)
+    cache.store("망포 승차", vecs[0], ["t"], lambda t: "v1", "SELECT 1")
+    cache.store("망포 승차", vecs[0], ["t"], lambda t: "v1", "SELECT 1")
+    assert len(cache.entries) == 1
+
+    cache.store("강남 승차", vecs[1], ["t"], lambda t: "v1", "SELECT 2")
+    cache.store("수원 승차", vecs[2], ["t"], lambda t: "v1", "SELECT 3")
+    assert [e["sql"] for e in cache.entries] == ["SELECT 2", "SELECT 3"]
+    assert cache.matrix.shape == (2, 4)
+    assert cache.lookup("수원 승차", vecs[2], lambda t: "v1")["sql"] == "SELECT 3"
+    assert [e["sql"] for e in sql_cache.SQLCache(cache_dir=str(tmp_path)).entries] == ["SELECT 2", "SELECT 3"]
@@ -0,0 +1,11 @@
+import type_cache
+
+
+def test_failed_resolution_is_not_cached(tmp_path):
+    cache = type_cache.TypeCache("ns", cache_dir=str(tmp_path))
+    values = ["20240101", "20240102"]
+    cache.put("사용일자", values, None)
+    assert cache.get("사용일자", values) == (False, None)
+
+    cache.put("사용일자", values, "date(%Y%m%d)")
+    assert cache.get("사용일자", ["20240601"]) == (True, "date(%Y%m%d)")
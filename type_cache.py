@@ -0,0 +1,134 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+
+# --- Configuration ---
+TYPE_CACHE_DIR = os.getenv("TYPE_CACHE_DIR", os.path.expanduser("~/.cache/csv2mysql"))
+TYPE_CACHE_MAX_ENTRIES = int(os.getenv("TYPE_CACHE_MAX_ENTRIES", "100000"))
+
+
+def value_shape(value):
+    """
+    값의 모양만 남깁니다. 한글 연속은 '가', 영문 연속은 'a'로 줄이고,
+    숫자 연속은 날짜처럼 보이는 길이(4, 6, 8)만 자리수를 유지하고 나머지는 'N'으로 줄입니다.
+    예) '20240601' -> '99999999', '1234' -> '9999', '52' -> 'N', 'N61' -> 'aN', '망포' -> '가'
+    """
+    shape = re.sub(r'[가-힣ㄱ-ㅎㅏ-ㅣ]+', '가', str(value).strip())
+    shape = re.sub(r'[A-Za-z]+', 'a', shape)
+    return re.sub(r'\d+', lambda m: '9' * len(m.group(0)) if len(m.group(0)) in (4, 6, 8) else 'N', shape)
+
+
+def column_signature(values):
+    """샘플 값들의 모양 집합. 행 순서나 샘플링 위치가 달라도 같은 feed는 같은 signature를 가집니다."""
+    return "|".join(sorted(set(value_shape(v) for v in values)))
+
+
+class TypeCache:
+    """
+    column 제목 + 값 모양 signature -> 결정된 타입(및 날짜 형식) SQLite cache.
+    namespace에는 모델과 프롬프트의 hash가 들어가므로 둘 중 하나가 바뀌면 이전 항목은 더 이상 맞지 않습니다.
+    """
+
+    def __init__(self, namespace, cache_dir=TYPE_CACHE_DIR, max_entries=TYPE_CACHE_MAX_ENTRIES, invalidate=False):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "type_cache.sqlite")
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS type_cache (
+                key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                header TEXT NOT NULL,
+                signature TEXT NOT NULL,
+                type TEXT,
+                date_format TEXT,
+                hit_count INTEGER NOT NULL DEFAULT 0,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS type_cache_last_used ON type_cache(last_used)")
+        self._conn.commit()
+        if invalidate:
+            self.invalidate()
+
+    def _key(self, header, signature):
+        raw = f"{self.namespace}\x00{header}\x00{signature}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, header, values):
+        """(hit, resolved) 반환. resolved는 resolve_token_type()과 같은 형식입니다."""
+        key = self._key(header, column_signature(values))
+        with self._lock:
+            row = self._conn.execute("SELECT type, date_format FROM type_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE type_cache SET hit_count = hit_count + 1, last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+
+        typ, fmt = row
+        return True, f"{typ}({fmt})" if fmt else typ
+
+    def put(self, header, values, resolved):
+        """
+        resolve_token_type() 결과를 타입과 날짜 형식으로 나누어 저장합니다.
+        None(LLM 오류나 해석할 수 없는 답)은 일시적인 실패일 수 있으므로 저장하지 않습니다.
+        """
+        if resolved is None:
+            return
+        signature = column_signature(values)
+        typ, fmt = resolved, None
+        if "%" in resolved:
+            typ = resolved.split("(")[0]
+            fmt = resolved.split("(", 1)[1].rstrip(")")
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO type_cache (key, namespace, header, signature, type, date_format, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self._key(header, signature), self.namespace, str(header), signature, typ, fmt, time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # 오래 사용하지 않은 항목부터 max_entries를 넘는 만큼 삭제
+        count = self._conn.execute("SELECT COUNT(*) FROM type_cache").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM type_cache WHERE key IN (SELECT key FROM type_cache ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def invalidate(self, all_namespaces=True):
+        """프롬프트나 모델이 바뀌었을 때 cache를 비웁니다. all_namespaces=False이면 현재 namespace만 비웁니다."""
+        with self._lock:
+            if all_namespaces:
+                self._conn.execute("DELETE FROM type_cache")
+            else:
+                self._conn.execute("DELETE FROM type_cache WHERE namespace = ?", (self.namespace,))
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM type_cache").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": size,
+            "max_entries": self.max_entries,
+        }
+
+    def close(self):
+        self._conn.close()
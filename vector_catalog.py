@@ -0,0 +1,319 @@
+import os
+import json
+import threading
+
+import numpy as np
+
+import milvus_index
+
+# --- Configuration ---
+# 파일 요약 embedding을 저장하고 검색하는 곳
+#   milvus   : Milvus server (기본)
+#   embedded : CATALOG_DIR/<collection>/ 의 NumPy 파일 (dense 행렬 + sparse inverted index, memory-map으로 읽음)
+CATALOG_BACKEND = os.getenv("CATALOG_BACKEND", "milvus")
+CATALOG_DIR = os.getenv("CATALOG_DIR", os.path.join(os.path.expanduser("~"), ".cache", "csv2mysql", "catalog"))
+DENSE_DIM = 1024   # BGE-M3
+
+
+def milvus_collection(collection_name):
+    """collection이 없으면 만듭니다 (connections.connect 후에 호출)."""
+    from pymilvus import FieldSchema, CollectionSchema, DataType, Collection, utility
+    if utility.has_collection(collection_name):
+        return Collection(collection_name)
+
+    fields = [
+        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
+        FieldSchema(name="filename", dtype=DataType.VARCHAR, max_length=256),
+
+        # [Dense Vector] 의미 검색용 (BGE-M3는 1024차원)
+        FieldSchema(name="dense_vector", dtype=DataType.FLOAT_VECTOR, dim=DENSE_DIM),
+
+        # [Sparse Vector] 키워드 검색용 (SPARSE_FLOAT_VECTOR 타입 사용)
+        FieldSchema(name="sparse_vector", dtype=DataType.SPARSE_FLOAT_VECTOR),
+
+        FieldSchema(name="text", dtype=DataType.VARCHAR, max_length=2000),
+    ]
+    schema = CollectionSchema(fields, "File description embeddings")
+    return Collection(collection_name, schema)
+
+
+class CatalogBackend:
+    """
+    csv2recap이 요약을 넣고 search.py가 table을 찾는 저장소.
+      delete(filenames)                         : filename의 요약을 지움
+      insert(filenames, dense, sparse, texts)   : 요약 추가 (dense: (n, dim) float32, sparse: [{token: weight}])
+      finalize()                                : batch를 다 넣은 뒤 한 번 (Milvus flush/index, 파일 저장)
+      hybrid_search(q_dense, q_sparse, limit, dense_weight, sparse_weight)
+          -> [{"filename", "text", "score"}] (dense/sparse 각각 limit개 후보를 가중합)
+    """
+
+    def delete(self, filenames):
+        raise NotImplementedError
+
+    def insert(self, filenames, dense_vecs, sparse_vecs, texts):
+        raise NotImplementedError
+
+    def finalize(self):
+        pass
+
+    def hybrid_search(self, q_dense, q_sparse, limit=10, dense_weight=0.3, sparse_weight=0.7):
+        raise NotImplementedError
+
+    def count(self):
+        raise NotImplementedError
+
+
+class MilvusCatalog(CatalogBackend):
+    """Milvus server. 쓰기는 ORM Collection, 검색은 MilvusClient를 처음 사용할 때 연결합니다."""
+
+    def __init__(self, collection_name, uri="http://localhost:19530"):
+        self.collection_name = collection_name
+        self.uri = uri
+        self._collection = None
+        self._client = None
+        self._dense_index = None
+        self._loaded = False
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            from pymilvus import connections
+            connections.connect("default", uri=self.uri)
+            self._collection = milvus_collection(self.collection_name)
+        return self._collection
+
+    @property
+    def client(self):
+        if self._client is None:
+            from pymilvus import MilvusClient
+            self._client = MilvusClient(uri=self.uri)
+        return self._client
+
+    def delete(self, filenames):
+        collection = self.collection
+        # 방금 만든(비어 있는) collection은 지울 것이 없고, index도 load도 아직 없어 delete가 거절됨
+        if collection.num_entities == 0:
+            return
+        # filter 식 delete는 load된 collection에서만 가능: index를 (없으면) 만들고 load
+        if not self._loaded:
+            milvus_index.ensure_indexes(collection)
+            self._loaded = True
+        collection.delete("filename in " + json.dumps(list(filenames), ensure_ascii=False))
+
+    def insert(self, filenames, dense_vecs, sparse_vecs, texts):
+        self.collection.insert([list(filenames), dense_vecs, sparse_vecs, list(texts)])
+
+    def finalize(self):
+        self.collection.flush()
+        # index는 없을 때만 (행 수에 맞는 종류가 바뀌었을 때는 다시) 만들고, load는 아직 안 됐을 때만
+        milvus_index.ensure_indexes(self.collection)
+        self._loaded = True
+
+    def count(self):
+        return self.collection.num_entities
+
+    def dense_index(self):
+        """csv2recap이 collection 크기로 고른 dense index (FLAT / IVF_FLAT / HNSW)와 params. 처음 한 번만 조회"""
+        if self._dense_index is None:
+            self._dense_index = milvus_index.describe_dense_index(self.client, self.collection_name)
+        return self._dense_index
+
+    def hybrid_search(self, q_dense, q_sparse, limit=10, dense_weight=0.3, sparse_weight=0.7):
+        from pymilvus import AnnSearchRequest, WeightedRanker
+        index_type, index_params = self.dense_index()
+        req_dense = AnnSearchRequest(
+            data=q_dense,
+            anns_field="dense_vector",
+            param=milvus_index.dense_search_params(index_type, index_params, limit),
+            limit=limit,
+        )
+        req_sparse = AnnSearchRequest(
+            data=q_sparse,
+            anns_field="sparse_vector",
+            param={"metric_type": "IP", "params": {"drop_ratio_search": 0.2}},
+            limit=limit,
+        )
+        results = self.client.hybrid_search(
+            collection_name=self.collection_name,
+            reqs=[req_dense, req_sparse],
+            ranker=WeightedRanker(dense_weight, sparse_weight),
+            limit=limit,
+            output_fields=["filename", "text"],
+        )
+        # pymilvus returns list-of-list; normalize
+        return [
+            {"filename": h.get("entity", {}).get("filename"), "text": h.get("entity", {}).get("text"),
+             "score": h.get("score")}
+            for batch in results for h in batch
+        ]
+
+
+class EmbeddedCatalog(CatalogBackend):
+    """
+    외부 server 없이 CATALOG_DIR/<collection>/ 에 저장하는 catalog (table 요약 수천 개 규모용).
+      dense.npy                 : (n, dim) float32 행렬
+      sparse_tokens.npy         : 정렬된 token id, sparse_offsets.npy: token별 posting 시작 위치
+      sparse_docs.npy / sparse_weights.npy : posting (행 번호, weight)
+      meta.json                 : filename, text 목록 (마지막에 바꿔서 저장 완료 표시)
+    검색은 memory-map한 배열로 전체 dense 거리와 query token의 posting만 계산하고,
+    Milvus WeightedRanker와 같이 L2 거리는 1 - 2*arctan(d)/pi, IP는 0.5 + arctan(s)/pi로 0~1로 바꿔 가중합합니다.
+    """
+
+    FILES = ("dense", "sparse_tokens", "sparse_offsets", "sparse_docs", "sparse_weights")
+
+    def __init__(self, collection_name, root=CATALOG_DIR):
+        self.collection_name = collection_name
+        self.path = os.path.join(root, collection_name)
+        self._loaded_mtime = None
+        self._rows = None   # 쓰기 중인 행: [filename, text, dense, sparse]
+        self._lock = threading.Lock()   # search.py가 여러 검색을 동시에 실행할 때 다시 읽기는 한 번만
+        self._load()
+
+    def _meta_path(self):
+        return os.path.join(self.path, "meta.json")
+
+    def _load(self):
+        try:
+            mtime = os.stat(self._meta_path()).st_mtime_ns
+        except FileNotFoundError:
+            self.filenames, self.texts = [], []
+            self.dense = np.zeros((0, DENSE_DIM), dtype=np.float32)
+            self.norms = np.zeros(0, dtype=np.float32)
+            self.tokens = np.zeros(0, dtype=np.int64)
+            self.offsets = np.zeros(1, dtype=np.int64)
+            self.docs = np.zeros(0, dtype=np.int32)
+            self.weights = np.zeros(0, dtype=np.float32)
+            return
+        if mtime == self._loaded_mtime:
+            return
+        with open(self._meta_path(), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(self.path, f"{name}.{meta['version']}.npy"), mmap_mode="r")
+                  for name in self.FILES}
+        self.filenames, self.texts = meta["filenames"], meta["texts"]
+        self.dense = arrays["dense"]
+        self.norms = np.einsum("ij,ij->i", self.dense, self.dense)
+        self.tokens, self.offsets = arrays["sparse_tokens"], arrays["sparse_offsets"]
+        self.docs, self.weights = arrays["sparse_docs"], arrays["sparse_weights"]
+        self.version = meta["version"]
+        self._loaded_mtime = mtime
+
+    def refresh(self):
+        """csv2recap이 다른 process에서 저장했으면 다시 읽습니다 (meta.json mtime 비교)."""
+        if self._rows is None:
+            with self._lock:
+                self._load()
+
+    # --- 쓰기 ---
+    def _editing(self):
+        if self._rows is None:
+            sparse = [{} for _ in self.filenames]
+            for t, token in enumerate(self.tokens.tolist()):
+                start, end = self.offsets[t], self.offsets[t + 1]
+                for doc, weight in zip(self.docs[start:end].tolist(), self.weights[start:end].tolist()):
+                    sparse[doc][token] = weight
+            self._rows = [[f, t, np.array(d), s] for f, t, d, s in zip(self.filenames, self.texts, self.dense, sparse)]
+        return self._rows
+
+    def delete(self, filenames):
+        names = set(filenames)
+        self._rows = [row for row in self._editing() if row[0] not in names]
+
+    def insert(self, filenames, dense_vecs, sparse_vecs, texts):
+        rows = self._editing()
+        for filename, dense, sparse, text in zip(filenames, dense_vecs, sparse_vecs, texts):
+            rows.append([filename, text, np.asarray(dense, dtype=np.float32),
+                         {int(k): float(v) for k, v in sparse.items()}])
+
+    def finalize(self):
+        """쓰기 중인 행을 새 version 파일로 저장하고 meta.json을 바꿉니다 (읽는 쪽은 이전 파일을 계속 볼 수 있음)."""
+        if self._rows is None:
+            return
+        rows = self._rows
+        os.makedirs(self.path, exist_ok=True)
+        dim = len(rows[0][2]) if rows else DENSE_DIM
+        dense = np.stack([r[2] for r in rows]).astype(np.float32) if rows else np.zeros((0, dim), dtype=np.float32)
+
+        postings = {}
+        for doc, row in enumerate(rows):
+            for token, weight in row[3].items():
+                postings.setdefault(token, []).append((doc, weight))
+        tokens = np.array(sorted(postings), dtype=np.int64)
+        offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+        docs, weights = [], []
+        for t, token in enumerate(tokens.tolist()):
+            docs.extend(d for d, _ in postings[token])
+            weights.extend(w for _, w in postings[token])
+            offsets[t + 1] = len(docs)
+        arrays = {
+            "dense": dense, "sparse_tokens": tokens, "sparse_offsets": offsets,
+            "sparse_docs": np.array(docs, dtype=np.int32), "sparse_weights": np.array(weights, dtype=np.float32),
+        }
+
+        old_version = getattr(self, "version", None)
+        version = (old_version or 0) + 1
+        for name, array in arrays.items():
+            np.save(os.path.join(self.path, f"{name}.{version}.npy"), array)
+        tmp_path = self._meta_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": version, "filenames": [r[0] for r in rows], "texts": [r[1] for r in rows]},
+                      f, ensure_ascii=False)
+        os.replace(tmp_path, self._meta_path())
+        if old_version is not None:
+            # 이미 memory-map한 process는 지워진 파일도 계속 읽을 수 있음 (Linux)
+            for name in self.FILES:
+                try:
+                    os.remove(os.path.join(self.path, f"{name}.{old_version}.npy"))
+                except FileNotFoundError:
+                    pass
+        self._rows = None
+        self._loaded_mtime = None
+        self._load()
+        print(f"💾 {self.collection_name}: {len(rows)} rows -> {self.path}")
+
+    def count(self):
+        return len(self._rows) if self._rows is not None else len(self.filenames)
+
+    # --- 검색 ---
+    def _sparse_scores(self, q_sparse):
+        scores = np.zeros(len(self.filenames), dtype=np.float32)
+        if not len(self.tokens) or not q_sparse:
+            return scores
+        q_tokens = np.array([int(k) for k in q_sparse], dtype=np.int64)
+        q_weights = np.array(list(q_sparse.values()), dtype=np.float32)
+        pos = np.minimum(np.searchsorted(self.tokens, q_tokens), len(self.tokens) - 1)
+        for p, weight in zip(pos[self.tokens[pos] == q_tokens].tolist(), q_weights[self.tokens[pos] == q_tokens]):
+            start, end = self.offsets[p], self.offsets[p + 1]
+            scores[self.docs[start:end]] += weight * self.weights[start:end]
+        return scores
+
+    def hybrid_search(self, q_dense, q_sparse, limit=10, dense_weight=0.3, sparse_weight=0.7):
+        self.refresh()
+        n = len(self.filenames)
+        if n == 0:
+            return []
+        q = np.asarray(q_dense[0], dtype=np.float32)
+        dist = self.norms - 2.0 * (self.dense @ q) + float(q @ q)   # 제곱 L2 거리 (Milvus L2와 같음)
+        ip = self._sparse_scores(q_sparse[0])
+
+        fused = np.zeros(n, dtype=np.float32)
+        k = min(limit, n)
+        top_dense = np.argpartition(dist, k - 1)[:k]
+        fused[top_dense] += dense_weight * (1.0 - 2.0 * np.arctan(np.maximum(dist[top_dense], 0.0)) / np.pi)
+        matched = np.flatnonzero(ip > 0)
+        top_sparse = matched[np.argsort(-ip[matched])[:limit]]
+        fused[top_sparse] += sparse_weight * (0.5 + np.arctan(ip[top_sparse]) / np.pi)
+
+        candidates = np.union1d(top_dense, top_sparse)
+        best = candidates[np.argsort(-fused[candidates])[:limit]]
+        return [{"filename": self.filenames[i], "text": self.texts[i], "score": float(fused[i])} for i in best]
+
+
+def open_catalog(collection_name, backend=None, uri="http://localhost:19530"):
+    """CATALOG_BACKEND(또는 backend)에 맞는 catalog. uri는 Milvus server 주소"""
+    backend = backend or CATALOG_BACKEND
+    if backend == "embedded":
+        return EmbeddedCatalog(collection_name)
+    if backend == "milvus":
+        return MilvusCatalog(collection_name, uri)
+    raise ValueError(f"unknown CATALOG_BACKEND: {backend}")